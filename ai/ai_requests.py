@@ -1,6 +1,8 @@
+from ai import clients
+from ai.completion_cache import cached_chat_completion, cached_chat_completion_stream
 from config import Config
-from openai import AzureOpenAI
 import logging
+from typing import Iterator
 
 logging.basicConfig(
     level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
@@ -14,21 +16,9 @@ except Exception as e:
     logger.error(f"Failed to load config: {str(e)}")
     raise
 
-try:
-    chat_client = AzureOpenAI(
-        api_key=config.api_key,
-        api_version=config.api_version,
-        azure_endpoint=config.api_base,
-    )
-    logger.info("Successfully initialized chatAzure OpenAI client")
-except Exception as e:
-    logger.error(f"Failed to initialize OpenAI client: {str(e)}")
-    raise
 
-
-def ai_story(objects: list[str]) -> str:
-    try:
-        system_prompt = """
+def _story_messages(objects: list[str]) -> list[dict]:
+    system_prompt = """
         You are a storyteller.
         You are given a list of objects.
         You need to create a story about the objects.
@@ -39,18 +29,40 @@ def ai_story(objects: list[str]) -> str:
         Make up names if needed.
         five sentences max.
         """
-        messages = [
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": f"Objects: {objects}"},
-        ]
-        response = chat_client.chat.completions.create(
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": f"Objects: {objects}"},
+    ]
+
+
+def ai_story(objects: list[str]) -> str:
+    try:
+        messages = _story_messages(objects)
+        # Object lists rarely repeat closely enough for semantic hits, so
+        # only identical requests are served from the cache
+        story = cached_chat_completion(
+            clients.get_chat_client(),
             model=config.deployment_name,
             messages=messages,
             temperature=0.3,
             max_tokens=1000,
-        )
-        story = response.choices[0].message.content.strip()
+        ).strip()
         return story
     except Exception as e:
         logger.error(f"Error in AI story generation: {str(e)}")
         raise
+
+
+def ai_story_stream(objects: list[str]) -> Iterator[str]:
+    """Like ai_story, but yields the story piece by piece as it arrives."""
+    try:
+        yield from cached_chat_completion_stream(
+            clients.get_chat_client(),
+            model=config.deployment_name,
+            messages=_story_messages(objects),
+            temperature=0.3,
+            max_tokens=1000,
+        )
+    except Exception as e:
+        logger.error(f"Error in streamed AI story generation: {str(e)}")
+        raise
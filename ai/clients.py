@@ -0,0 +1,314 @@
+import asyncio
+import logging
+import random
+import threading
+import time
+import weakref
+from email.utils import parsedate_to_datetime
+from functools import lru_cache, partial
+from types import SimpleNamespace
+import httpx
+import openai
+from openai import AsyncAzureOpenAI, AzureOpenAI
+from config import Config
+
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+
+
+@lru_cache(maxsize=1)
+def get_config() -> Config:
+    return Config()
+
+
+def _limits() -> dict:
+    config = get_config()
+    return {
+        "max_connections": config.client_max_connections,
+        "max_keepalive_connections": config.client_max_keepalive_connections,
+        "keepalive_expiry": config.client_keepalive_expiry,
+    }
+
+
+@lru_cache(maxsize=1)
+def _http_client():
+    """One keep-alive connection pool shared by all sync clients."""
+    return openai.DefaultHttpxClient(
+        limits=httpx.Limits(**_limits()), timeout=get_config().client_timeout
+    )
+
+
+def _async_http_client():
+    return openai.DefaultAsyncHttpxClient(
+        limits=httpx.Limits(**_limits()), timeout=get_config().client_timeout
+    )
+
+
+# Per-deployment limits on in-flight requests. Async semaphores belong to an
+# event loop, so they are kept per loop.
+_semaphores: dict[str, threading.BoundedSemaphore] = {}
+_async_semaphores = weakref.WeakKeyDictionary()
+_semaphores_lock = threading.Lock()
+
+
+def _semaphore(deployment: str) -> threading.BoundedSemaphore:
+    with _semaphores_lock:
+        if deployment not in _semaphores:
+            _semaphores[deployment] = threading.BoundedSemaphore(
+                get_config().client_max_concurrent_requests
+            )
+        return _semaphores[deployment]
+
+
+def _async_semaphore(deployment: str) -> asyncio.Semaphore:
+    loop_semaphores = _async_semaphores.setdefault(asyncio.get_running_loop(), {})
+    if deployment not in loop_semaphores:
+        loop_semaphores[deployment] = asyncio.Semaphore(
+            get_config().client_max_concurrent_requests
+        )
+    return loop_semaphores[deployment]
+
+
+def is_retryable(error: Exception) -> bool:
+    """Rate limits, timeouts, connection failures and server errors."""
+    if isinstance(error, (openai.APIConnectionError, openai.APITimeoutError)):
+        return True
+    return getattr(error, "status_code", None) in RETRYABLE_STATUS_CODES
+
+
+def retry_after(error: Exception) -> "float | None":
+    """Seconds the server asked us to wait, from the retry-after-ms or
+    retry-after header of the error response."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        if headers.get("retry-after-ms") is not None:
+            return float(headers["retry-after-ms"]) / 1000
+        value = headers.get("retry-after")
+        if value is None:
+            return None
+        try:
+            return float(value)
+        except ValueError:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(error: Exception, attempt: int) -> float:
+    """Retry-After when the server sent one, otherwise exponential backoff
+    with jitter. Capped at ``config.client_retry_max_delay``."""
+    config = get_config()
+    delay = retry_after(error)
+    if delay is None:
+        delay = config.client_retry_base_delay * 2**attempt
+        delay *= random.uniform(0.5, 1.0)
+    return min(delay, config.client_retry_max_delay)
+
+
+class HeldStream:
+    """A streamed response that holds its deployment's semaphore until it
+    has been read to the end, closed or garbage collected, so streams count
+    against ``config.client_max_concurrent_requests`` for as long as they
+    keep a connection open. Anything else is passed on to the stream."""
+
+    def __init__(self, stream, semaphore):
+        self._stream = stream
+        self._semaphore = semaphore
+        self._held = True
+        self._lock = threading.Lock()
+
+    def _release(self) -> None:
+        with self._lock:
+            if not self._held:
+                return
+            self._held = False
+        self._semaphore.release()
+
+    def __iter__(self):
+        try:
+            yield from self._stream
+        finally:
+            self._release()
+
+    def __aiter__(self):
+        return self._aiter()
+
+    async def _aiter(self):
+        try:
+            async for chunk in self._stream:
+                yield chunk
+        finally:
+            self._release()
+
+    def close(self) -> None:
+        try:
+            self._stream.close()
+        finally:
+            self._release()
+
+    async def aclose(self) -> None:
+        try:
+            await self._stream.close()
+        finally:
+            self._release()
+
+    def __enter__(self) -> "HeldStream":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    async def __aenter__(self) -> "HeldStream":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.aclose()
+
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
+
+    def __del__(self):
+        self._release()
+
+
+def call_with_retry(create, **request):
+    """Calls ``create(**request)`` while holding the semaphore of the request's
+    deployment (its ``model``), retrying retryable errors with backoff. With
+    ``stream=True`` the semaphore is held until the stream is done, see
+    HeldStream."""
+    config = get_config()
+    deployment = request.get("model", "")
+    for attempt in range(config.client_max_retries + 1):
+        try:
+            if not request.get("stream"):
+                with _semaphore(deployment):
+                    return create(**request)
+            semaphore = _semaphore(deployment)
+            semaphore.acquire()
+            try:
+                return HeldStream(create(**request), semaphore)
+            except Exception:
+                semaphore.release()
+                raise
+        except Exception as e:
+            if attempt == config.client_max_retries or not is_retryable(e):
+                raise
+            delay = backoff_delay(e, attempt)
+            logger.warning(
+                f"Request to {deployment} failed ({str(e)}), "
+                f"retrying in {delay:.2f}s ({attempt + 1}/{config.client_max_retries})"
+            )
+            time.sleep(delay)
+
+
+async def acall_with_retry(create, **request):
+    """Async counterpart of call_with_retry."""
+    config = get_config()
+    deployment = request.get("model", "")
+    for attempt in range(config.client_max_retries + 1):
+        try:
+            if not request.get("stream"):
+                async with _async_semaphore(deployment):
+                    return await create(**request)
+            semaphore = _async_semaphore(deployment)
+            await semaphore.acquire()
+            try:
+                return HeldStream(await create(**request), semaphore)
+            except Exception:
+                semaphore.release()
+                raise
+        except Exception as e:
+            if attempt == config.client_max_retries or not is_retryable(e):
+                raise
+            delay = backoff_delay(e, attempt)
+            logger.warning(
+                f"Request to {deployment} failed ({str(e)}), "
+                f"retrying in {delay:.2f}s ({attempt + 1}/{config.client_max_retries})"
+            )
+            await asyncio.sleep(delay)
+
+
+class ManagedClient:
+    """Wraps an (Async)AzureOpenAI client so that ``chat.completions.create``
+    and ``embeddings.create`` go through the per-deployment limits and retry
+    policy of this module. The wrapped client is available as ``raw``."""
+
+    def __init__(self, client):
+        self.raw = client
+        call = (
+            acall_with_retry
+            if isinstance(client, AsyncAzureOpenAI)
+            else call_with_retry
+        )
+        self.chat = SimpleNamespace(
+            completions=SimpleNamespace(
+                create=partial(call, client.chat.completions.create)
+            )
+        )
+        self.embeddings = SimpleNamespace(
+            create=partial(call, client.embeddings.create)
+        )
+
+
+def _client_settings(kind: str) -> dict:
+    config = get_config()
+    if kind == "embeddings":
+        return {
+            "api_key": config.embedding_api_key,
+            "api_version": config.embedding_api_version,
+            "azure_endpoint": config.embedding_api_base,
+        }
+    return {
+        "api_key": config.api_key,
+        "api_version": config.api_version,
+        "azure_endpoint": config.api_base,
+    }
+
+
+@lru_cache(maxsize=None)
+def _sync_client(kind: str) -> ManagedClient:
+    # Retries are handled by call_with_retry, not by the SDK
+    client = AzureOpenAI(
+        **_client_settings(kind), max_retries=0, http_client=_http_client()
+    )
+    logger.info(f"Initialized {kind} Azure OpenAI client")
+    return ManagedClient(client)
+
+
+def get_chat_client() -> ManagedClient:
+    """Shared sync client for chat completions."""
+    return _sync_client("chat")
+
+
+def get_embeddings_client() -> ManagedClient:
+    """Shared sync client for embeddings."""
+    return _sync_client("embeddings")
+
+
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def _async_client(kind: str) -> ManagedClient:
+    # Async HTTP pools are bound to the event loop that uses them
+    loop_clients = _async_clients.setdefault(asyncio.get_running_loop(), {})
+    if kind not in loop_clients:
+        client = AsyncAzureOpenAI(
+            **_client_settings(kind), max_retries=0, http_client=_async_http_client()
+        )
+        loop_clients[kind] = ManagedClient(client)
+    return loop_clients[kind]
+
+
+def get_async_chat_client() -> ManagedClient:
+    """Shared async client for chat completions in the running event loop."""
+    return _async_client("chat")
+
+
+def get_async_embeddings_client() -> ManagedClient:
+    """Shared async client for embeddings in the running event loop."""
+    return _async_client("embeddings")
@@ -0,0 +1,335 @@
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from typing import Iterator
+import numpy as np
+from config import Config
+
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS completions (
+    key TEXT PRIMARY KEY,
+    scope TEXT NOT NULL,
+    content TEXT NOT NULL,
+    embedding BLOB,
+    created_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS completions_scope ON completions (scope);
+CREATE INDEX IF NOT EXISTS completions_accessed_at ON completions (accessed_at);
+CREATE TABLE IF NOT EXISTS stats (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO stats (name, value)
+VALUES ('hits', 0), ('semantic_hits', 0), ('misses', 0);
+"""
+
+PROMPT_PLACEHOLDER = "\x00prompt\x00"
+
+
+def _hash(value) -> str:
+    return hashlib.sha256(
+        json.dumps(value, sort_keys=True, ensure_ascii=False).encode("utf-8")
+    ).hexdigest()
+
+
+def request_key(request: dict) -> str:
+    """Exact cache key of a chat request: model, messages, temperature,
+    max_tokens and any other request parameters."""
+    return _hash(request)
+
+
+def request_scope(request: dict, semantic_text: str) -> str:
+    """Key of the request with ``semantic_text`` blanked out of the messages.
+    Requests that differ only in that text share a scope, which is where
+    semantic hits are looked up."""
+    messages = [
+        {**m, "content": m["content"].replace(semantic_text, PROMPT_PLACEHOLDER)}
+        for m in request["messages"]
+    ]
+    return _hash({**request, "messages": messages})
+
+
+class CompletionCache:
+    """Persistent cache of chat completion texts backed by SQLite.
+
+    Exact hits are keyed by the full request. When a semantic text (usually the
+    user prompt) and an embedding function are given, a miss falls back to the
+    most similar cached prompt within the same scope, if its cosine similarity
+    reaches ``semantic_threshold``. Requests sampled above
+    ``max_temperature`` are not cached. Eviction, WAL mode and per-thread
+    connections work as in data.embedding_cache.EmbeddingCache."""
+
+    def __init__(
+        self,
+        path: str,
+        max_entries: int = 5000,
+        ttl_seconds: float = 24 * 3600,
+        max_temperature: float = 0.3,
+        semantic_threshold: float = 0.97,
+        timeout: float = 10.0,
+    ):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_temperature = max_temperature
+        self.semantic_threshold = semantic_threshold
+        self.timeout = timeout
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self._local = threading.local()
+        self._counter_lock = threading.Lock()
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=self.timeout)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def is_cacheable(self, request: dict) -> bool:
+        """Only (near-)deterministic requests are worth caching."""
+        return request.get("temperature", 1.0) <= self.max_temperature
+
+    def _count(self, conn: sqlite3.Connection, name: str) -> None:
+        conn.execute("UPDATE stats SET value = value + 1 WHERE name = ?", (name,))
+        with self._counter_lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def get(
+        self, request: dict, semantic_text: "str | None" = None, embed=None
+    ) -> "str | None":
+        """Returns a cached completion for the request, or None. ``embed`` is
+        only called to embed ``semantic_text`` after an exact miss."""
+        now = time.time()
+        oldest = now - self.ttl_seconds
+        conn = self._connect()
+        with conn:
+            row = conn.execute(
+                "SELECT key, content FROM completions "
+                "WHERE key = ? AND created_at >= ?",
+                (request_key(request), oldest),
+            ).fetchone()
+            counter = "hits"
+
+            if row is None and semantic_text and embed is not None:
+                row = self._semantic_match(
+                    conn, request_scope(request, semantic_text), embed(semantic_text)
+                )
+                counter = "semantic_hits"
+
+            if row is None:
+                self._count(conn, "misses")
+                return None
+            conn.execute(
+                "UPDATE completions SET accessed_at = ? WHERE key = ?", (now, row[0])
+            )
+            self._count(conn, counter)
+            return row[1]
+
+    def _semantic_match(self, conn, scope: str, embedding) -> "tuple | None":
+        rows = conn.execute(
+            "SELECT key, content, embedding FROM completions "
+            "WHERE scope = ? AND embedding IS NOT NULL AND created_at >= ?",
+            (scope, time.time() - self.ttl_seconds),
+        ).fetchall()
+        if not rows:
+            return None
+        matrix = np.stack([np.frombuffer(r[2], dtype=np.float32) for r in rows])
+        query = np.asarray(embedding, dtype=np.float32)
+        scores = (
+            matrix
+            @ query
+            / (np.linalg.norm(matrix, axis=1) * np.linalg.norm(query) + 1e-12)
+        )
+        best = int(np.argmax(scores))
+        if scores[best] < self.semantic_threshold:
+            return None
+        logger.debug(f"Semantic completion cache hit ({scores[best]:.3f})")
+        return rows[best][:2]
+
+    def put(
+        self,
+        request: dict,
+        content: str,
+        semantic_text: "str | None" = None,
+        embed=None,
+    ) -> None:
+        now = time.time()
+        scope = request_scope(request, semantic_text) if semantic_text else ""
+        embedding = None
+        if semantic_text and embed is not None:
+            embedding = np.asarray(embed(semantic_text), dtype=np.float32).tobytes()
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO completions "
+                "(key, scope, content, embedding, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (request_key(request), scope, content, embedding, now, now),
+            )
+            conn.execute(
+                "DELETE FROM completions WHERE created_at < ?",
+                (now - self.ttl_seconds,),
+            )
+            conn.execute(
+                "DELETE FROM completions WHERE rowid IN ("
+                "SELECT rowid FROM completions ORDER BY accessed_at DESC "
+                "LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+
+    def stats(self) -> dict:
+        conn = self._connect()
+        shared = dict(conn.execute("SELECT name, value FROM stats").fetchall())
+        entries = conn.execute("SELECT COUNT(*) FROM completions").fetchone()[0]
+        return {
+            "hits": self.hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "shared_hits": shared["hits"],
+            "shared_semantic_hits": shared["semantic_hits"],
+            "shared_misses": shared["misses"],
+            "entries": entries,
+        }
+
+    def clear(self) -> None:
+        conn = self._connect()
+        with conn:
+            conn.execute("DELETE FROM completions")
+            conn.execute("UPDATE stats SET value = 0")
+
+
+_cache = None
+_cache_configured = False
+_cache_lock = threading.Lock()
+
+
+def get_completion_cache() -> "CompletionCache | None":
+    """The process-wide cache configured in config.json, or None when
+    completion_cache_path is empty."""
+    global _cache, _cache_configured
+    with _cache_lock:
+        if not _cache_configured:
+            config = Config()
+            if config.completion_cache_path:
+                _cache = CompletionCache(
+                    config.completion_cache_path,
+                    max_entries=config.completion_cache_max_entries,
+                    ttl_seconds=config.completion_cache_ttl_seconds,
+                    max_temperature=config.completion_cache_max_temperature,
+                    semantic_threshold=config.completion_cache_semantic_threshold,
+                )
+                logger.info(f"Using completion cache {config.completion_cache_path}")
+            _cache_configured = True
+        return _cache
+
+
+def cached_chat_completion(
+    client,
+    semantic_text: "str | None" = None,
+    embed=None,
+    validate=None,
+    **request,
+) -> str:
+    """Returns the message content of ``client.chat.completions.create(**request)``,
+    served from the completion cache when possible.
+
+    ``semantic_text`` is the part of the messages that may vary between
+    near-duplicate requests (the user prompt) and ``embed`` turns it into an
+    embedding (it should be cached, it may be called twice); without both only
+    exact hits are possible. Only complete answers, non-empty and finished
+    with reason "stop", are cached. ``validate`` is called with the content before
+    it is cached or served from the cache; content it raises on is never
+    cached, and a cached answer it raises on is requested again."""
+    cache = get_completion_cache()
+    if cache is None or not cache.is_cacheable(request):
+        response = client.chat.completions.create(**request)
+        return response.choices[0].message.content
+
+    content = cache.get(request, semantic_text, embed)
+    if content is not None:
+        if _is_valid(content, validate):
+            return content
+        logger.warning("Cached completion is invalid, requesting it again")
+
+    response = client.chat.completions.create(**request)
+    content = response.choices[0].message.content
+    if not _is_complete(content, response.choices[0].finish_reason):
+        logger.warning(
+            f"Not caching an incomplete completion "
+            f"(finish reason {response.choices[0].finish_reason})"
+        )
+    elif _is_valid(content, validate):
+        cache.put(request, content, semantic_text, embed)
+    else:
+        logger.warning("Not caching an invalid completion")
+    return content
+
+
+def _is_complete(content: "str | None", finish_reason: "str | None") -> bool:
+    """Only answers the model finished by itself are worth serving again;
+    not ones cut off by max_tokens or the content filter, or empty ones."""
+    return finish_reason == "stop" and bool(content and content.strip())
+
+
+def _is_valid(content: str, validate) -> bool:
+    if validate is None:
+        return True
+    try:
+        validate(content)
+        return True
+    except Exception:
+        return False
+
+
+def cached_chat_completion_stream(
+    client, semantic_text: "str | None" = None, embed=None, **request
+) -> Iterator[str]:
+    """Streaming counterpart of cached_chat_completion.
+
+    Yields the completion text in pieces as the API sends them. A cache hit is
+    yielded as a single piece. A completion is only cached once the stream
+    has been consumed to the end and finished with reason "stop"."""
+    cache = get_completion_cache()
+    if cache is not None and cache.is_cacheable(request):
+        content = cache.get(request, semantic_text, embed)
+        if content is not None:
+            yield content
+            return
+    else:
+        cache = None
+
+    pieces = []
+    finish_reason = None
+    for chunk in client.chat.completions.create(**request, stream=True):
+        # Azure sends chunks without choices, e.g. for content filter results
+        if not chunk.choices:
+            continue
+        finish_reason = chunk.choices[0].finish_reason or finish_reason
+        piece = chunk.choices[0].delta.content
+        if piece:
+            pieces.append(piece)
+            yield piece
+
+    content = "".join(pieces)
+    if cache is not None:
+        if _is_complete(content, finish_reason):
+            cache.put(request, content, semantic_text, embed)
+        else:
+            logger.warning(
+                f"Not caching an incomplete completion (finish reason {finish_reason})"
+            )
@@ -1,8 +1,14 @@
 import streamlit as st
 import streamlit_effects as sfx
 import data.embeddings as llm
+import data.pipeline as pipeline
 import video.videoEffects as fxs
+import video.pipeline as vpipe
+import video.executor as vexec
+import video.quality as vquality
+import video.streaming as vstream
 import ai.ai_requests as ai
+import startup
 import automations.parking as prk
 import logging
 import time
@@ -34,131 +40,182 @@ def main():
     st.sidebar.title("App Controls")
     sfx.setup_sidebar()
     sfx.kill_app_button()
+    # The catalog, clients and detector load on first use, not at boot
+    with st.sidebar.expander("Startup times"):
+        st.text(startup.report())
 
     user_prompt, submit_button = sfx.setup_input_box()
     frame_name = "normal"
 
     if submit_button:
-        with st.container():
-            sfx.setup_spinner()
-            with st.spinner("🔍 AI is selecting a frame..."):
-                frame_name = llm.ai_frame_selection(user_prompt)
-                with st.spinner("✨ AI is generating explanation..."):
-                    explanation = llm.ai_explanation(frame_name, user_prompt)
-                    with st.spinner("🧪 AI is evaluating suggestion..."):
-                        evaluation = llm.ai_evaluation(
-                            frame_name, explanation, user_prompt
-                        )
-
-        sfx.light_green_blob("AI Suggested Frame", frame_name)
-        sfx.light_green_blob("Description", explanation)
-        sfx.light_green_blob("Evaluation (Is This a Good Fit?)", evaluation)
+        if config.stream_responses:
+            # Show the frame right away and fill in the text as it arrives
+            with st.container():
+                sfx.setup_spinner()
+                with st.spinner("🔍 AI is selecting a frame..."):
+                    frame_name = pipeline.select_frame(user_prompt)
+
+            sfx.light_green_blob("AI Suggested Frame", frame_name)
+            explanation = sfx.light_green_blob_stream(
+                "Description", llm.ai_explanation_stream(frame_name, user_prompt)
+            )
+            sfx.light_green_blob_stream(
+                "Evaluation (Is This a Good Fit?)",
+                llm.ai_evaluation_stream(frame_name, explanation, user_prompt),
+            )
+        else:
+            with st.container():
+                sfx.setup_spinner()
+                with st.spinner(
+                    "🔍 AI is selecting, explaining and evaluating a frame..."
+                ):
+                    result = pipeline.run_frame_pipeline(user_prompt)
+                    frame_name = result["frame"]
+                    explanation = result["explanation"]
+                    evaluation = result["verdict"]
+
+            sfx.light_green_blob("AI Suggested Frame", frame_name)
+            sfx.light_green_blob("Description", explanation)
+            sfx.light_green_blob("Evaluation (Is This a Good Fit?)", evaluation)
 
         video_placeholder = st.empty()
         countdown_placeholder = st.empty()
         detected_objects_placeholder = st.empty()
+        stats_placeholder = st.sidebar.empty()
         start_time = None
-        cap = cv2.VideoCapture(0)
+        stats_time = time.time()
         sfx.initialize_story_state()
 
-        while submit_button:
-            ret, frame = cap.read()
-            if not ret:
-                logger.error("Failed to capture video")
-                st.error("Failed to capture video")
-                break
+        # Effects run on the pipeline's processing thread or in worker processes,
+        # degrading when they can't keep up with config.effect_target_fps
+        quality = vquality.quality_controller(frame_name)
+        # With config.video_output "mjpeg" the browser plays an MJPEG stream
+        # encoded in the background, instead of an st.image per frame
+        streamer = vstream.get_frame_streamer()
+        if streamer is not None:
+            video_placeholder.markdown(streamer.html(), unsafe_allow_html=True)
+        processor = vexec.make_processor(
+            frame_name, trigger=True, rgb=streamer is None, quality=quality
+        )
+        frames = vpipe.FramePipeline(
+            cv2.VideoCapture(0),
+            processor,
+            queue_size=config.video_queue_size,
+            in_flight=processor.in_flight,
+            quality=quality,
+            release=processor.release,
+        )
+        # Also stops the processor's detector thread, which would otherwise
+        # outlive this run of the script
+        with processor, frames:
+            for packet in frames.results():
+                frame_out, detected_objects = packet.result
+
+                if frame_name == "object_detection":
+                    if detected_objects:
+                        if start_time is None:
+                            start_time = time.time()
+
+                        elapsed_time = time.time() - start_time
+                        remaining_time = max(10 - int(elapsed_time), 0)
+                        countdown_placeholder.write(
+                            f"Generating story in: {remaining_time} seconds"
+                        )
 
-            if frame_name == "object_detection":
-                frame, detected_objects = fxs.apply_effect(
-                    frame, frame_name, trigger=True
-                )
+                        detected_objects_placeholder.write("Detected Objects:")
+                        all_objects = []
+                        for obj, conf, _ in detected_objects:
+                            all_objects.append(f"- {obj}: {conf:.2f}")
+                        detected_objects_placeholder.write("\n".join(all_objects))
+
+                        if elapsed_time >= 10 and not st.session_state.story_generated:
+                            if config.stream_responses:
+                                sfx.light_pink_blob_stream(
+                                    "AI Generated Story",
+                                    ai.ai_story_stream(all_objects),
+                                )
+                            else:
+                                sfx.setup_spinner()
+                                with st.spinner("AI is generating a story..."):
+                                    story = ai.ai_story(all_objects)
+                                sfx.light_pink_blob("AI Generated Story", story)
+                            countdown_placeholder.empty()
+                            st.session_state.story_generated = True
+                if frame_name == "ocr":
+                    if "ocr_performed" not in st.session_state:
+                        st.session_state.ocr_performed = False
 
-                if detected_objects:
                     if start_time is None:
                         start_time = time.time()
 
                     elapsed_time = time.time() - start_time
                     remaining_time = max(10 - int(elapsed_time), 0)
                     countdown_placeholder.write(
-                        f"Generating story in: {remaining_time} seconds"
+                        f"Performing OCR in: {remaining_time} seconds"
                     )
 
-                    detected_objects_placeholder.write("Detected Objects:")
-                    all_objects = []
-                    for obj, conf, _ in detected_objects:
-                        all_objects.append(f"- {obj}: {conf:.2f}")
-                    detected_objects_placeholder.write("\n".join(all_objects))
-
-                    if elapsed_time >= 10 and not st.session_state.story_generated:
+                    if elapsed_time >= 10 and not st.session_state.ocr_performed:
                         sfx.setup_spinner()
-                        with st.spinner("AI is generating a story..."):
-                            story = ai.ai_story(all_objects)
-                        sfx.light_pink_blob("AI Generated Story", story)
-                        countdown_placeholder.empty()
-                        st.session_state.story_generated = True
-            if frame_name == "ocr":
-                if "ocr_performed" not in st.session_state:
-                    st.session_state.ocr_performed = False
-
-                frame = fxs.apply_effect(frame, frame_name)
-                if start_time is None:
-                    start_time = time.time()
-
-                elapsed_time = time.time() - start_time
-                remaining_time = max(10 - int(elapsed_time), 0)
-                countdown_placeholder.write(
-                    f"Performing OCR in: {remaining_time} seconds"
-                )
-
-                if elapsed_time >= 10 and not st.session_state.ocr_performed:
-                    sfx.setup_spinner()
-                    try:
-                        ticket_number, ticket_time, ticket_date = fxs.get_ocr_text(
-                            frame, config.ocr_api_key
-                        )
-                        if not all([ticket_number, ticket_time, ticket_date]):
-                            raise ValueError(
-                                "Could not extract all required ticket information"
+                        try:
+                            ticket_number, ticket_time, ticket_date = fxs.get_ocr_text(
+                                packet.frame, config.ocr_api_key
                             )
-
-                        ocr_result = {
-                            "Ticket Number": ticket_number,
-                            "Time": ticket_time,
-                            "Date": ticket_date,
-                        }
-                        sfx.light_pink_blob("OCR Results", str(ocr_result))
-
-                        with st.spinner("Performing OCR analysis..."):
-                            with st.spinner("🚗 🎫 validating parking"):
-
-                                async def run_with_timeout():
-                                    try:
-                                        await asyncio.wait_for(
-                                            prk.navigate_website(
-                                                ticket_number, ticket_date, ticket_time
-                                            ),
-                                            timeout=300,  # 5 minute timeout
-                                        )
-                                    except asyncio.TimeoutError:
-                                        raise TimeoutError(
-                                            "Parking validation timed out after 5 minutes"
-                                        )
-
-                                asyncio.run(run_with_timeout())
-                    except Exception as e:
-                        st.error(f"Error processing ticket: {str(e)}")
-                        return
-                    with st.expander("View Validation Screenshot", expanded=True):
-                        st.image(
-                            "screenshot.png", caption="Parking Validation Screenshot"
-                        )
-                    countdown_placeholder.empty()
-                    st.session_state.ocr_performed = True
-            else:
-                frame = fxs.apply_effect(frame, frame_name)
-
-            frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            video_placeholder.image(frame_rgb, use_container_width=True)
+                            if not all([ticket_number, ticket_time, ticket_date]):
+                                raise ValueError(
+                                    "Could not extract all required ticket information"
+                                )
+
+                            ocr_result = {
+                                "Ticket Number": ticket_number,
+                                "Time": ticket_time,
+                                "Date": ticket_date,
+                            }
+                            sfx.light_pink_blob("OCR Results", str(ocr_result))
+
+                            with st.spinner("Performing OCR analysis..."):
+                                with st.spinner("🚗 🎫 validating parking"):
+
+                                    async def run_with_timeout():
+                                        try:
+                                            await asyncio.wait_for(
+                                                prk.navigate_website(
+                                                    ticket_number,
+                                                    ticket_date,
+                                                    ticket_time,
+                                                ),
+                                                timeout=300,  # 5 minute timeout
+                                            )
+                                        except asyncio.TimeoutError:
+                                            raise TimeoutError(
+                                                "Parking validation timed out after 5 minutes"
+                                            )
+
+                                    asyncio.run(run_with_timeout())
+                        except Exception as e:
+                            st.error(f"Error processing ticket: {str(e)}")
+                            return
+                        with st.expander("View Validation Screenshot", expanded=True):
+                            st.image(
+                                "screenshot.png",
+                                caption="Parking Validation Screenshot",
+                            )
+                        countdown_placeholder.empty()
+                        st.session_state.ocr_performed = True
+
+                if streamer is not None:
+                    streamer.publish(frame_out)
+                else:
+                    video_placeholder.image(frame_out, use_container_width=True)
+                if time.time() - stats_time >= config.video_stats_interval:
+                    stats_time = time.time()
+                    stats = frames.format_stats()
+                    if streamer is not None:
+                        stats += "\n" + streamer.format_stats()
+                    stats_placeholder.text(stats)
+
+            # The capture stage only ends on its own when the camera fails
+            logger.error("Failed to capture video")
+            st.error("Failed to capture video")
 
 
 if __name__ == "__main__":
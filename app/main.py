@@ -1,7 +1,9 @@
 import streamlit as st
 import logging
 import data.embeddings as llm
-import video.videoEffects as fxs
+import video.pipeline as vpipe
+import video.executor as vexec
+import video.streaming as vstream
 import ai.ai_requests as ai
 import cv2
 import os
@@ -98,9 +100,6 @@ def main():
             frame_name = "normal"
             explanation = "Default effect applied"
 
-        # Initialize video capture
-        cap = cv2.VideoCapture(0)
-
         # Create a placeholder in the Streamlit app
         video_placeholder = st.empty()
         with st.spinner("AI frame evaluation..."):
@@ -125,48 +124,52 @@ def main():
         countdown_placeholder = st.empty()
         start_time = None
 
-        while video_run:
-            ret, frame = cap.read()
-            if not ret:
-                logger.error("Failed to capture video")
-                st.error("Failed to capture video")
-                break
-
-            # Apply the effect and convert from BGR to RGB for Streamlit
-            if frame_name == "object_detection":
-                frame, detected_objects = fxs.apply_effect(
-                    frame, frame_name, trigger=True
-                )
-
-                if detected_objects:
-                    if start_time is None:
-                        start_time = time.time()
-
-                    elapsed_time = time.time() - start_time
-                    remaining_time = max(10 - int(elapsed_time), 0)
-                    countdown_placeholder.write(
-                        f"Generating story in: {remaining_time} seconds"
-                    )
-
-                    detected_objects_placeholder.write("Detected Objects:")
-                    all_objects = []
-                    for obj, conf, _ in detected_objects:
-                        all_objects.append(f"- {obj}: {conf:.2f}")
-                    detected_objects_placeholder.write("\n".join(all_objects))
-
-                    if elapsed_time >= 10 and not st.session_state.story_generated:
-                        generate_story(all_objects)
-                        st.session_state.story_generated = True
-                        countdown_placeholder.empty()
-                        break  # Exit the while loop after generating story once
-            else:
-                frame = fxs.apply_effect(frame, frame_name)
-
-            frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            video_placeholder.image(frame_rgb, use_container_width=True)
-
-        # Release the video capture when not running
-        cap.release()
+        if video_run:
+            # Capture, effects and display run as a pipeline
+            streamer = vstream.get_frame_streamer()
+            if streamer is not None:
+                video_placeholder.markdown(streamer.html(), unsafe_allow_html=True)
+            processor = vexec.make_processor(
+                frame_name, trigger=True, rgb=streamer is None
+            )
+            with processor, vpipe.FramePipeline(
+                cv2.VideoCapture(0),
+                processor,
+                in_flight=processor.in_flight,
+                release=processor.release,
+            ) as frames:
+                for packet in frames.results():
+                    frame_out, detected_objects = packet.result
+
+                    if detected_objects:
+                        if start_time is None:
+                            start_time = time.time()
+
+                        elapsed_time = time.time() - start_time
+                        remaining_time = max(10 - int(elapsed_time), 0)
+                        countdown_placeholder.write(
+                            f"Generating story in: {remaining_time} seconds"
+                        )
+
+                        detected_objects_placeholder.write("Detected Objects:")
+                        all_objects = []
+                        for obj, conf, _ in detected_objects:
+                            all_objects.append(f"- {obj}: {conf:.2f}")
+                        detected_objects_placeholder.write("\n".join(all_objects))
+
+                        if elapsed_time >= 10 and not st.session_state.story_generated:
+                            generate_story(all_objects)
+                            st.session_state.story_generated = True
+                            countdown_placeholder.empty()
+                            break  # Exit the loop after generating story once
+
+                    if streamer is not None:
+                        streamer.publish(frame_out)
+                    else:
+                        video_placeholder.image(frame_out, use_container_width=True)
+                else:
+                    logger.error("Failed to capture video")
+                    st.error("Failed to capture video")
 
     except Exception as e:
         logger.error(f"Error in main application: {str(e)}")
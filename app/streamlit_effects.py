@@ -8,6 +8,9 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+GREEN_BLOB = "#F9FFDB"
+PINK_BLOB = "#FFDBDE"
+
 
 def setup_background():
     """Sets up the cyan background for the Streamlit app and header."""
@@ -88,12 +91,10 @@ def setup_spinner():
     )
 
 
-def light_green_blob(bold_text, text):
-    """Sets up the light green blob for the Streamlit app."""
-    st.markdown(
-        f"""
+def _blob_html(bold_text, text, background_color):
+    return f"""
         <div style='
-            background-color: #F9FFDB;
+            background-color: {background_color};
             padding: 15px;
             border-radius: 10px;
             margin: 0 auto 20px auto;
@@ -102,28 +103,45 @@ def light_green_blob(bold_text, text):
         '>
             <strong>{bold_text}:</strong> {text}<br>
         </div>
-        """,
-        unsafe_allow_html=True,
-    )
+        """
 
 
-def light_pink_blob(bold_text, text):
+def light_green_blob(bold_text, text):
     """Sets up the light green blob for the Streamlit app."""
-    st.markdown(
-        f"""
-        <div style='
-            background-color: #FFDBDE;
-            padding: 15px;
-            border-radius: 10px;
-            margin: 0 auto 20px auto;
-            box-shadow: 2px 2px 5px rgba(0,0,0,0.1);
-            text-align: left;
-        '>
-            <strong>{bold_text}:</strong> {text}<br>
-        </div>
-        """,
-        unsafe_allow_html=True,
+    st.markdown(_blob_html(bold_text, text, GREEN_BLOB), unsafe_allow_html=True)
+
+
+def light_pink_blob(bold_text, text):
+    """Sets up the light pink blob for the Streamlit app."""
+    st.markdown(_blob_html(bold_text, text, PINK_BLOB), unsafe_allow_html=True)
+
+
+def stream_blob(bold_text, pieces, background_color=GREEN_BLOB):
+    """Renders a blob and fills it in place as text pieces arrive from the
+    ``pieces`` iterator (e.g. ai_explanation_stream). Returns the full text."""
+    placeholder = st.empty()
+    text = ""
+    for piece in pieces:
+        text += piece
+        placeholder.markdown(
+            _blob_html(bold_text, text + " ▌", background_color),
+            unsafe_allow_html=True,
+        )
+    text = text.strip()
+    placeholder.markdown(
+        _blob_html(bold_text, text, background_color), unsafe_allow_html=True
     )
+    return text
+
+
+def light_green_blob_stream(bold_text, pieces):
+    """Streaming version of light_green_blob."""
+    return stream_blob(bold_text, pieces, GREEN_BLOB)
+
+
+def light_pink_blob_stream(bold_text, pieces):
+    """Streaming version of light_pink_blob."""
+    return stream_blob(bold_text, pieces, PINK_BLOB)
 
 
 def break_loop_button():
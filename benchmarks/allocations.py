@@ -0,0 +1,85 @@
+"""Array memory allocated per frame by each effect, before and after buffer reuse.
+
+"allocating" is how frames used to be processed: the effect returns a new
+array and a second cvtColor makes an RGB copy for display. "buffered" writes
+the RGB result straight into a BufferPool array, and the downscaled frames
+of scaled effects come from the pool too. Allocations are the new
+NumPy arrays seen by tracemalloc, which includes every array OpenCV returns;
+scratch memory OpenCV allocates internally (stylization, the gray image
+inside applyColorMap) is not counted.
+
+Run from the repository root:
+    python -m benchmarks.allocations --width 1920 --height 1080 --fps 30
+"""
+
+import argparse
+import time
+import tracemalloc
+import cv2
+import numpy as np
+from video.buffers import BufferPool
+from video.effects import effects
+
+# Needs the detector weights, and its cost is the network, not the arrays
+SKIPPED = ("object_detection",)
+
+
+def allocating(effect, frame, pool):
+    out = effect(frame).frame
+    return cv2.cvtColor(out, cv2.COLOR_BGR2RGB)
+
+
+def buffered(effect, frame, pool):
+    dst = pool.acquire("out", frame.shape)
+    out = effect(frame, dst=dst, rgb=True, pool=pool).frame
+    # Shown and done with, as the pipeline releases it after rendering
+    pool.release(dst)
+    return out
+
+
+def measure(process, effect, frames, pool) -> tuple:
+    """Mean bytes allocated and milliseconds per frame, after a warm-up
+    frame that fills the pool."""
+    process(effect, frames[0], pool)
+    allocated = 0
+    elapsed = 0.0
+    for frame in frames:
+        before = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        start = time.perf_counter()
+        out = process(effect, frame, pool)
+        elapsed += time.perf_counter() - start
+        allocated += tracemalloc.get_traced_memory()[1] - before
+        del out
+    return allocated / len(frames), elapsed * 1000 / len(frames)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--frames", type=int, default=10)
+    parser.add_argument("--width", type=int, default=1920)
+    parser.add_argument("--height", type=int, default=1080)
+    parser.add_argument("--fps", type=int, default=30)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    frames = [
+        rng.integers(0, 256, (args.height, args.width, 3), dtype=np.uint8)
+        for _ in range(args.frames)
+    ]
+    tracemalloc.start()
+    print(f"{args.width}x{args.height}, MB/s at {args.fps} fps")
+    print(f"{'effect':<14} {'allocating':>18} {'buffered':>18}")
+    for name, effect in effects().items():
+        if name in SKIPPED:
+            continue
+        row = []
+        for process in (allocating, buffered):
+            allocated, ms = measure(process, effect, frames, BufferPool())
+            row.append(f"{allocated * args.fps / 1e6:7.1f} MB/s {ms:5.1f}ms")
+        print(f"{name:<14} {row[0]:>18} {row[1]:>18}")
+    tracemalloc.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""Recall and latency of the IVF index against exact search.
+
+Run from the repository root:
+    python -m benchmarks.ann_recall --size 50000 --n-probe 1 4 8 16
+"""
+
+import argparse
+import time
+import numpy as np
+from data.ann_index import IVFIndex
+from data.search_index import ExactIndex
+
+
+def clustered_vectors(size: int, dimension: int, clusters: int, seed: int):
+    """Synthetic catalog: loose topic clusters in a low-dimensional latent
+    space projected up to ``dimension``. Neighbourhoods overlap across
+    cluster borders, as they do for real text embeddings, so recall below
+    1.0 shows up at low n_probe."""
+    rng = np.random.default_rng(seed)
+    latent_dimension = 32
+    topics = rng.normal(size=(clusters, latent_dimension))
+    latent = topics[rng.integers(clusters, size=size)] + rng.normal(
+        size=(size, latent_dimension)
+    )
+    projection = rng.normal(size=(latent_dimension, dimension))
+    return latent @ projection + rng.normal(scale=0.5, size=(size, dimension))
+
+
+def recall_at_k(expected, actual) -> float:
+    hits = sum(
+        len({label for label, _ in e} & {label for label, _ in a})
+        for e, a in zip(expected, actual)
+    )
+    return hits / sum(len(e) for e in expected)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", type=int, default=20000)
+    parser.add_argument("--dimension", type=int, default=1536)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--n-lists", type=int, default=None)
+    parser.add_argument("--n-probe", type=int, nargs="+", default=[1, 4, 8, 16])
+    parser.add_argument(
+        "--matrix", help="optional .npy catalog to use instead of synthetic data"
+    )
+    args = parser.parse_args()
+
+    if args.matrix:
+        matrix = np.load(args.matrix, mmap_mode="r")
+    else:
+        matrix = clustered_vectors(args.size, args.dimension, 256, seed=0)
+    labels = [str(i) for i in range(len(matrix))]
+    rng = np.random.default_rng(1)
+    queries = matrix[rng.choice(len(matrix), args.queries)] + rng.normal(
+        scale=2.0, size=(args.queries, matrix.shape[1])
+    )
+
+    exact = ExactIndex(labels, matrix)
+    start = time.perf_counter()
+    expected = [exact.top_k(q, args.k) for q in queries]
+    exact_ms = (time.perf_counter() - start) * 1000 / len(queries)
+
+    start = time.perf_counter()
+    ivf = IVFIndex.build(labels, matrix, n_lists=args.n_lists)
+    build_s = time.perf_counter() - start
+
+    print(f"catalog: {len(matrix)} x {matrix.shape[1]}, {ivf.n_lists} lists")
+    print(f"IVF build: {build_s:.2f} s")
+    print(f"exact search: {exact_ms:.3f} ms/query")
+    print(f"{'n_probe':>8} {'recall@' + str(args.k):>10} {'ms/query':>10}")
+    for n_probe in args.n_probe:
+        ivf.n_probe = n_probe
+        start = time.perf_counter()
+        actual = [ivf.top_k(q, args.k) for q in queries]
+        ivf_ms = (time.perf_counter() - start) * 1000 / len(queries)
+        print(f"{n_probe:>8} {recall_at_k(expected, actual):>10.3f} {ivf_ms:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
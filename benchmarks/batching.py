@@ -0,0 +1,51 @@
+"""Per-frame detection time at different batch sizes.
+
+Runs the configured detector on random frames with one forward pass per
+batch, after an untimed warm-up pass at each size. The detector's model has
+to accept a dynamic batch dimension (Darknet models and ONNX exports with a
+dynamic batch axis do).
+
+Run from the repository root:
+    python -m benchmarks.batching --detector yolov3 --sizes 1 2 4 8
+"""
+
+import argparse
+import time
+import numpy as np
+from video.detectors import get_detector
+
+
+def time_per_frame(detector, frames, repeats) -> float:
+    detector.detect_batch(frames)
+    start = time.perf_counter()
+    for _ in range(repeats):
+        detector.detect_batch(frames)
+    return (time.perf_counter() - start) * 1000 / (repeats * len(frames))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--detector", help="configured detector, default config.detector"
+    )
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--repeats", type=int, default=10)
+    parser.add_argument("--width", type=int, default=640)
+    parser.add_argument("--height", type=int, default=480)
+    args = parser.parse_args()
+
+    detector = get_detector(args.detector)
+    rng = np.random.default_rng(0)
+    single_ms = None
+    for size in args.sizes:
+        frames = [
+            rng.integers(0, 256, (args.height, args.width, 3), dtype=np.uint8)
+            for _ in range(size)
+        ]
+        ms = time_per_frame(detector, frames, args.repeats)
+        single_ms = single_ms or ms
+        print(f"batch {size:3d}: {ms:8.2f} ms/frame  {single_ms / ms:5.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""Latency and accuracy of the configured detectors on recorded clips.
+
+Every detector runs on the same frames of each clip, after one untimed warm-up
+frame. Latency is the mean and 95th percentile time of detect(). Accuracy is
+precision, recall and F1 at IoU 0.5, against ground truth in a JSONL file next
+to the clip (street.mp4 -> street.jsonl) or, without one, against the
+--reference detector. Ground truth lines look like
+    {"frame": 12, "detections": [{"label": "person", "box": [x, y, w, h]}]}
+
+Run from the repository root:
+    python -m benchmarks.detectors clips/street.mp4 --detectors yolov3 yolov8n
+"""
+
+import argparse
+import json
+import os
+import time
+import cv2
+import numpy as np
+from video.detectors import Detector, detector_specs
+
+
+def read_frames(path: str, every: int, max_frames: int) -> list:
+    """(frame index, frame) pairs of every ``every``-th frame of the clip."""
+    capture = cv2.VideoCapture(path)
+    frames = []
+    index = 0
+    while len(frames) < max_frames:
+        ok, frame = capture.read()
+        if not ok:
+            break
+        if index % every == 0:
+            frames.append((index, frame))
+        index += 1
+    capture.release()
+    return frames
+
+
+def load_ground_truth(path: str) -> dict:
+    """Frame index -> [(label, (x, y, w, h))] from a JSONL file."""
+    truth = {}
+    with open(path, "r") as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                truth[record["frame"]] = [
+                    (d["label"], tuple(d["box"])) for d in record["detections"]
+                ]
+    return truth
+
+
+def iou(a, b) -> float:
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    w = min(ax + aw, bx + bw) - max(ax, bx)
+    h = min(ay + ah, by + bh) - max(ay, by)
+    if w <= 0 or h <= 0:
+        return 0.0
+    overlap = w * h
+    return overlap / (aw * ah + bw * bh - overlap)
+
+
+def true_positives(found: list, expected: list, threshold: float = 0.5) -> int:
+    """Detections matched one-to-one to expected boxes with the same label,
+    most confident first."""
+    unmatched = list(expected)
+    matched = 0
+    for label, _, box in sorted(found, key=lambda d: -d[1]):
+        candidates = [
+            (iou(box, other), i)
+            for i, (other_label, other) in enumerate(unmatched)
+            if other_label == label
+        ]
+        best = max(candidates, default=(0.0, None))
+        if best[0] >= threshold:
+            unmatched.pop(best[1])
+            matched += 1
+    return matched
+
+
+def run(detector: Detector, frames: list) -> tuple:
+    """Per-frame latencies in ms and detections, keyed by frame index."""
+    detector.detect(frames[0][1])
+    latencies = []
+    detections = {}
+    for index, frame in frames:
+        start = time.perf_counter()
+        detections[index] = detector.detect(frame)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies, detections
+
+
+def accuracy(detections: dict, truth: dict) -> tuple:
+    found = sum(len(d) for d in detections.values())
+    expected = sum(len(truth.get(index, [])) for index in detections)
+    matched = sum(
+        true_positives(d, truth.get(index, [])) for index, d in detections.items()
+    )
+    precision = matched / found if found else 1.0
+    recall = matched / expected if expected else 1.0
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+    return precision, recall, f1
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("clips", nargs="+")
+    parser.add_argument(
+        "--detectors", nargs="*", help="configured detector names, default all"
+    )
+    parser.add_argument(
+        "--reference", help="detector to compare against without ground truth"
+    )
+    parser.add_argument("--every", type=int, default=1)
+    parser.add_argument("--max-frames", type=int, default=200)
+    args = parser.parse_args()
+
+    specs = detector_specs()
+    names = args.detectors or [
+        name for name, spec in specs.items() if os.path.exists(spec.model)
+    ]
+    detectors = {name: Detector(specs[name]) for name in names}
+    reference = args.reference or names[0]
+
+    for clip in args.clips:
+        frames = read_frames(clip, args.every, args.max_frames)
+        if not frames:
+            print(f"{clip}: no frames")
+            continue
+        results = {name: run(d, frames) for name, d in detectors.items()}
+
+        truth_path = os.path.splitext(clip)[0] + ".jsonl"
+        if os.path.exists(truth_path):
+            truth, against = load_ground_truth(truth_path), "ground truth"
+        else:
+            truth = {
+                index: [(label, box) for label, _, box in d]
+                for index, d in results[reference][1].items()
+            }
+            against = reference
+
+        print(f"{clip}: {len(frames)} frames, accuracy against {against}")
+        print(
+            f"{'detector':<16} {'mean ms':>8} {'p95 ms':>8} "
+            f"{'precision':>9} {'recall':>7} {'F1':>6}"
+        )
+        for name, (latencies, detections) in results.items():
+            precision, recall, f1 = accuracy(detections, truth)
+            print(
+                f"{name:<16} {np.mean(latencies):8.1f} "
+                f"{np.percentile(latencies, 95):8.1f} "
+                f"{precision:9.3f} {recall:7.3f} {f1:6.3f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
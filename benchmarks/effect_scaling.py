@@ -0,0 +1,104 @@
+"""Quality/latency curve of every effect with a scale policy.
+
+Each effect runs at each processing scale on the same frames, after an
+untimed warm-up frame. Quality is measured against the effect at full scale:
+PSNR of the output frame for image effects, and precision, recall and F1 at
+IoU 0.5 of the detections for detection effects (which need the configured
+detector's weights). Frames come from --clip, or are smooth synthetic
+frames, since stylizing noise says little about real video.
+
+Run from the repository root:
+    python -m benchmarks.effect_scaling --clip clips/street.mp4 --width 1280 --height 720
+"""
+
+import argparse
+import time
+import cv2
+import numpy as np
+from benchmarks.detectors import accuracy, read_frames
+from video.effects import effects
+
+SCALES = [1.0, 0.75, 0.5, 0.35, 0.25]
+
+
+def synthetic_frames(count: int, width: int, height: int) -> list:
+    """Blurred, upscaled noise: large soft shapes with some edges."""
+    rng = np.random.default_rng(0)
+    frames = []
+    for _ in range(count):
+        small = rng.integers(0, 256, (height // 16, width // 16, 3), dtype=np.uint8)
+        frame = cv2.resize(small, (width, height), interpolation=cv2.INTER_CUBIC)
+        frames.append(cv2.GaussianBlur(frame, (0, 0), 3))
+    return frames
+
+
+def psnr(a: np.ndarray, b: np.ndarray) -> float:
+    error = np.mean((a.astype(np.float32) - b.astype(np.float32)) ** 2)
+    return float("inf") if error == 0 else 10 * np.log10(255**2 / error)
+
+
+def run(effect, frames: list, scale: float) -> tuple:
+    """Milliseconds per frame and the EffectResults at ``scale``."""
+    effect(frames[0].copy(), scale=scale)
+    results = []
+    elapsed = 0.0
+    for frame in frames:
+        # Detection effects draw on the frame they are given
+        frame = frame.copy()
+        start = time.perf_counter()
+        results.append(effect(frame, scale=scale))
+        elapsed += time.perf_counter() - start
+    return elapsed * 1000 / len(frames), results
+
+
+def quality(effect, results: list, reference: list) -> str:
+    if effect.scale_mode == "boxes":
+        found = {i: result.detections for i, result in enumerate(results)}
+        truth = {
+            i: [(label, box) for label, _, box in result.detections]
+            for i, result in enumerate(reference)
+        }
+        precision, recall, f1 = accuracy(found, truth)
+        return f"P {precision:.2f} R {recall:.2f} F1 {f1:.2f}"
+    values = [psnr(r.frame, ref.frame) for r, ref in zip(results, reference)]
+    return f"PSNR {np.mean(values):5.1f} dB"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clip", help="video file, default synthetic frames")
+    parser.add_argument("--frames", type=int, default=10)
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    parser.add_argument("--scales", type=float, nargs="+", default=SCALES)
+    args = parser.parse_args()
+
+    if args.clip:
+        frames = [
+            cv2.resize(frame, (args.width, args.height))
+            for _, frame in read_frames(args.clip, 1, args.frames)
+        ]
+    else:
+        frames = synthetic_frames(args.frames, args.width, args.height)
+    print(f"{len(frames)} frames at {args.width}x{args.height}")
+    for name, effect in effects().items():
+        if effect.scale_mode == "none":
+            continue
+        try:
+            _, reference = run(effect, frames, 1.0)
+        except Exception as e:
+            print(f"{name}: skipped ({type(e).__name__}: {str(e)})")
+            continue
+        print(
+            f"{name} (declared scale {effect.scale}, min {effect.min_scale}, "
+            f"{effect.scale_mode})"
+        )
+        for scale in args.scales:
+            ms, results = run(effect, frames, scale)
+            print(
+                f"  {scale:5.2f}: {ms:8.1f} ms/frame  {quality(effect, results, reference)}"
+            )
+
+
+if __name__ == "__main__":
+    main()
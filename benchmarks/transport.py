@@ -0,0 +1,64 @@
+"""Script-thread cost of showing a frame, st.image against the MJPEG stream.
+
+st.image turns a NumPy frame into a PIL image and saves it as a quality 100
+JPEG on the Streamlit script thread, then sends the bytes over the
+websocket; this runs the same encode. The MJPEG stream only copies the frame
+on the script thread; a background thread encodes it at the configured
+quality. Frames are published as fast as the script thread allows, so the
+encoder shows how many it can keep up with and the rest are skipped.
+
+Run from the repository root:
+    python -m benchmarks.transport --width 1280 --height 720 --quality 80
+"""
+
+import argparse
+import io
+import time
+import numpy as np
+from PIL import Image
+from video.streaming import FrameStreamer
+
+
+def st_image_encode(frame: np.ndarray) -> bytes:
+    """What st.image does with an RGB NumPy frame before sending it."""
+    out = io.BytesIO()
+    Image.fromarray(frame.astype(np.uint8)).save(out, format="JPEG", quality=100)
+    return out.getvalue()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--frames", type=int, default=100)
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    parser.add_argument("--quality", type=int, default=80)
+    args = parser.parse_args()
+
+    # A smooth frame compresses like camera video, noise would not
+    y, x = np.indices((args.height, args.width))
+    frame = np.dstack([x * 255 // args.width, y * 255 // args.height, (x + y) % 256])
+    frame = frame.astype(np.uint8)
+
+    start = time.perf_counter()
+    for _ in range(args.frames):
+        size = len(st_image_encode(frame))
+    ms = (time.perf_counter() - start) * 1000 / args.frames
+    print(f"st.image: {ms:6.2f} ms/frame on the script thread, {size / 1e3:.0f} kB")
+
+    with FrameStreamer(port=0, quality=args.quality) as streamer:
+        start = time.perf_counter()
+        for _ in range(args.frames):
+            streamer.publish(frame)
+        ms = (time.perf_counter() - start) * 1000 / args.frames
+        time.sleep(0.5)
+        stats = streamer.snapshot()
+        size = len(streamer.next_jpeg(0)[0])
+    print(
+        f"mjpeg:    {ms:6.2f} ms/frame on the script thread, {size / 1e3:.0f} kB, "
+        f"{stats['encode_ms']:.2f} ms/frame encoding in the background, "
+        f"{stats['encoded']}/{stats['published']} encoded"
+    )
+
+
+if __name__ == "__main__":
+    main()
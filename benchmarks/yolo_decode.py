@@ -0,0 +1,103 @@
+"""Per-frame time of the YOLO post-processing step, per-row loop vs. vectorized.
+
+Run from the repository root:
+    python -m benchmarks.yolo_decode --frames 200 --objects 5
+"""
+
+import argparse
+import time
+import cv2
+import numpy as np
+from video.detectors import decode_yolo_outputs
+
+# YOLOv3 at 416x416: 13x13, 26x26 and 52x52 grids with 3 anchors each
+YOLOV3_416_ROWS = (507, 2028, 8112)
+
+
+def synthetic_outputs(
+    objects: int, seed: int, classes: int = 80, rows=YOLOV3_416_ROWS
+) -> list:
+    """Output layers shaped like YOLOv3's, with low background scores and a
+    few confident, overlapping detections per object."""
+    rng = np.random.default_rng(seed)
+    outs = []
+    for count in rows:
+        out = np.zeros((count, 5 + classes), dtype=np.float32)
+        out[:, :4] = rng.random((count, 4), dtype=np.float32)
+        out[:, 4] = rng.random(count, dtype=np.float32) * 0.1
+        out[:, 5:] = rng.random((count, classes), dtype=np.float32) * 0.2
+        outs.append(out)
+    for _ in range(objects):
+        layer = outs[rng.integers(len(outs))]
+        center = rng.random(2, dtype=np.float32) * 0.8 + 0.1
+        size = rng.random(2, dtype=np.float32) * 0.3 + 0.05
+        class_id = rng.integers(classes)
+        # Neighbouring cells and anchors fire on the same object
+        for row in rng.choice(len(layer), 4, replace=False):
+            layer[row, :2] = center + rng.normal(0, 0.005, 2)
+            layer[row, 2:4] = size * rng.uniform(0.95, 1.05, 2)
+            layer[row, 5 + class_id] = rng.uniform(0.6, 0.99)
+    return outs
+
+
+def decode_loop(outs, width, height):
+    """The original post-processing: a Python loop over every row, an argmax
+    per row and an ``in`` check against the NMS result for every box."""
+    class_ids = []
+    confidences = []
+    boxes = []
+    for out in outs:
+        for detection in out:
+            scores = detection[5:]
+            class_id = np.argmax(scores)
+            confidence = scores[class_id]
+            if confidence > 0.5:
+                center_x = int(detection[0] * width)
+                center_y = int(detection[1] * height)
+                w = int(detection[2] * width)
+                h = int(detection[3] * height)
+                x = int(center_x - w / 2)
+                y = int(center_y - h / 2)
+                boxes.append([x, y, w, h])
+                confidences.append(float(confidence))
+                class_ids.append(class_id)
+
+    indexes = cv2.dnn.NMSBoxes(boxes, confidences, 0.5, 0.4)
+    return [
+        (int(class_ids[i]), confidences[i], tuple(boxes[i]))
+        for i in range(len(boxes))
+        if i in indexes
+    ]
+
+
+def time_per_frame(decode, frames, width, height) -> float:
+    start = time.perf_counter()
+    for outs in frames:
+        decode(outs, width, height)
+    return (time.perf_counter() - start) * 1000 / len(frames)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--frames", type=int, default=100)
+    parser.add_argument("--objects", type=int, default=5)
+    parser.add_argument("--width", type=int, default=640)
+    parser.add_argument("--height", type=int, default=480)
+    args = parser.parse_args()
+
+    frames = [synthetic_outputs(args.objects, seed) for seed in range(args.frames)]
+    for outs in frames[:10]:
+        assert decode_loop(outs, args.width, args.height) == decode_yolo_outputs(
+            outs, args.width, args.height
+        )
+
+    loop_ms = time_per_frame(decode_loop, frames, args.width, args.height)
+    vectorized_ms = time_per_frame(decode_yolo_outputs, frames, args.width, args.height)
+    print(f"rows per frame: {sum(len(out) for out in frames[0])}")
+    print(f"per-row loop: {loop_ms:8.3f} ms/frame")
+    print(f"vectorized:   {vectorized_ms:8.3f} ms/frame")
+    print(f"speedup:      {loop_ms / vectorized_ms:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,16 @@
 import json
 
+# The YOLOv3 weights the video effects have always used
+DEFAULT_DETECTORS = {
+    "yolov3": {
+        "format": "darknet",
+        "model": "video/yolov3.weights",
+        "config": "video/yolov3.cfg",
+        "classes": "video/coco.names",
+        "input_size": [416, 416],
+    }
+}
+
 
 class Config:
     def __init__(self, config_file: str = "config.json"):
@@ -23,6 +34,80 @@ class Config:
             )
             self.embedding_api_key = config.get("embedding_api_key", "")
             self.embedding_deployment_name = config.get("embedding_deployment_name", "")
+            self.embedding_batch_max_items = config.get(
+                "embedding_batch_max_items", 256
+            )
+            self.embedding_batch_max_tokens = config.get(
+                "embedding_batch_max_tokens", 32000
+            )
+            self.embedding_batch_concurrency = config.get(
+                "embedding_batch_concurrency", 4
+            )
+            self.embedding_cache_path = config.get(
+                "embedding_cache_path", "data/embedding_cache.sqlite3"
+            )
+            self.embedding_cache_max_entries = config.get(
+                "embedding_cache_max_entries", 10000
+            )
+            self.embedding_cache_ttl_seconds = config.get(
+                "embedding_cache_ttl_seconds", 30 * 24 * 3600
+            )
+            self.ann_min_catalog_size = config.get("ann_min_catalog_size", 5000)
+            self.ann_n_probe = config.get("ann_n_probe", 8)
+            self.prompt_context_top_k = config.get("prompt_context_top_k", 0)
+            self.pipeline_mode = config.get("pipeline_mode", "sequential")
+            self.router_enabled = config.get("router_enabled", False)
+            self.stream_responses = config.get("stream_responses", False)
+            self.router_min_score = config.get("router_min_score", 0.7)
+            self.router_min_margin = config.get("router_min_margin", 0.05)
+            self.completion_cache_path = config.get(
+                "completion_cache_path", "data/completion_cache.sqlite3"
+            )
+            self.completion_cache_max_entries = config.get(
+                "completion_cache_max_entries", 5000
+            )
+            self.completion_cache_ttl_seconds = config.get(
+                "completion_cache_ttl_seconds", 24 * 3600
+            )
+            self.completion_cache_max_temperature = config.get(
+                "completion_cache_max_temperature", 0.3
+            )
+            self.completion_cache_semantic_threshold = config.get(
+                "completion_cache_semantic_threshold", 0.97
+            )
+
+            # Shared API client settings
+            self.client_max_connections = config.get("client_max_connections", 20)
+            self.client_max_keepalive_connections = config.get(
+                "client_max_keepalive_connections", 10
+            )
+            self.client_keepalive_expiry = config.get("client_keepalive_expiry", 30.0)
+            self.client_timeout = config.get("client_timeout", 60.0)
+            self.client_max_concurrent_requests = config.get(
+                "client_max_concurrent_requests", 4
+            )
+            self.client_max_retries = config.get("client_max_retries", 5)
+            self.client_retry_base_delay = config.get("client_retry_base_delay", 0.5)
+            self.client_retry_max_delay = config.get("client_retry_max_delay", 30.0)
+
+            # Video pipeline settings
+            self.video_queue_size = config.get("video_queue_size", 1)
+            self.video_stats_interval = config.get("video_stats_interval", 2.0)
+            self.effect_workers = config.get("effect_workers", 0)
+            self.detection_async = config.get("detection_async", False)
+            self.detection_interval = config.get("detection_interval", 0)
+            self.detector = config.get("detector", "yolov3")
+            self.detection_batch_size = config.get("detection_batch_size", 1)
+            self.detection_batch_latency_ms = config.get(
+                "detection_batch_latency_ms", 10
+            )
+            self.detectors = config.get("detectors", DEFAULT_DETECTORS)
+            self.effect_target_fps = config.get("effect_target_fps", 0)
+            self.video_output = config.get("video_output", "image")
+            self.mjpeg_host = config.get("mjpeg_host", "127.0.0.1")
+            self.mjpeg_port = config.get("mjpeg_port", 8765)
+            self.mjpeg_quality = config.get("mjpeg_quality", 80)
+            self.mjpeg_url = config.get("mjpeg_url", "")
 
             # Chat settings
             self.temperature = config.get("temperature", 0.7)
@@ -60,6 +145,48 @@ class Config:
         self.embedding_api_version = "2023-05-15"
         self.embedding_api_key = ""
         self.embedding_deployment_name = ""
+        self.embedding_batch_max_items = 256
+        self.embedding_batch_max_tokens = 32000
+        self.embedding_batch_concurrency = 4
+        self.embedding_cache_path = "data/embedding_cache.sqlite3"
+        self.embedding_cache_max_entries = 10000
+        self.embedding_cache_ttl_seconds = 30 * 24 * 3600
+        self.ann_min_catalog_size = 5000
+        self.ann_n_probe = 8
+        self.prompt_context_top_k = 0
+        self.pipeline_mode = "sequential"
+        self.router_enabled = False
+        self.stream_responses = False
+        self.router_min_score = 0.7
+        self.router_min_margin = 0.05
+        self.completion_cache_path = "data/completion_cache.sqlite3"
+        self.completion_cache_max_entries = 5000
+        self.completion_cache_ttl_seconds = 24 * 3600
+        self.completion_cache_max_temperature = 0.3
+        self.completion_cache_semantic_threshold = 0.97
+        self.client_max_connections = 20
+        self.client_max_keepalive_connections = 10
+        self.client_keepalive_expiry = 30.0
+        self.client_timeout = 60.0
+        self.client_max_concurrent_requests = 4
+        self.client_max_retries = 5
+        self.client_retry_base_delay = 0.5
+        self.client_retry_max_delay = 30.0
+        self.video_queue_size = 1
+        self.video_stats_interval = 2.0
+        self.effect_workers = 0
+        self.detection_async = False
+        self.detection_interval = 0
+        self.detector = "yolov3"
+        self.detection_batch_size = 1
+        self.detection_batch_latency_ms = 10
+        self.detectors = DEFAULT_DETECTORS
+        self.effect_target_fps = 0
+        self.video_output = "image"
+        self.mjpeg_host = "127.0.0.1"
+        self.mjpeg_port = 8765
+        self.mjpeg_quality = 80
+        self.mjpeg_url = ""
         self.temperature = 0.7
         self.max_tokens = 800
         self.system_message = (
@@ -0,0 +1,153 @@
+import logging
+import numpy as np
+from data.search_index import normalize_rows
+
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+
+def spherical_kmeans(
+    matrix: np.ndarray, n_clusters: int, iterations: int = 10, seed: int = 0
+) -> np.ndarray:
+    """Clusters unit-length rows by cosine similarity and returns unit-length
+    centroids. Empty clusters are re-seeded from random rows."""
+    rng = np.random.default_rng(seed)
+    n_clusters = min(n_clusters, len(matrix))
+    centroids = matrix[rng.choice(len(matrix), n_clusters, replace=False)].copy()
+    for _ in range(iterations):
+        assignments = np.argmax(matrix @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignments, matrix)
+        counts = np.bincount(assignments, minlength=n_clusters)
+        empty = counts == 0
+        if empty.any():
+            sums[empty] = matrix[rng.choice(len(matrix), int(empty.sum()))]
+        centroids = normalize_rows(sums)
+    return centroids
+
+
+class IVFIndex:
+    """Approximate cosine similarity search with an inverted file index.
+
+    Vectors are grouped around ``n_lists`` k-means centroids. A query is only
+    compared with the vectors of its ``n_probe`` closest centroids, which
+    trades a little recall for search time that grows with
+    ``n_probe / n_lists`` of the catalog instead of all of it. New vectors can
+    be added without retraining; they join the list of their closest
+    centroid. Exposes the same top_k / top_k_many interface as ExactIndex.
+
+    ``key`` is saved and loaded with the index; callers set it to a hash of
+    the vectors the index was built from to tell whether a saved index is
+    still current."""
+
+    def __init__(self, centroids: np.ndarray, n_probe: int = 8):
+        self.centroids = normalize_rows(centroids)
+        self.n_probe = n_probe
+        self.key = ""
+        self.labels: list[str] = []
+        self.matrix = np.empty((0, self.centroids.shape[1]), dtype=np.float32)
+        self.assignments = np.empty(0, dtype=np.int64)
+        self._lists = [np.empty(0, dtype=np.int64) for _ in range(self.n_lists)]
+
+    @classmethod
+    def build(
+        cls,
+        labels: list[str],
+        matrix,
+        n_lists: "int | None" = None,
+        n_probe: int = 8,
+        iterations: int = 10,
+        training_size: int = 50000,
+        seed: int = 0,
+    ) -> "IVFIndex":
+        """Trains centroids on (a sample of) ``matrix`` and adds all rows.
+        ``n_lists`` defaults to about the square root of the catalog size."""
+        matrix = normalize_rows(matrix)
+        if n_lists is None:
+            n_lists = max(1, int(np.sqrt(len(matrix))))
+        rng = np.random.default_rng(seed)
+        sample = matrix
+        if len(matrix) > training_size:
+            sample = matrix[rng.choice(len(matrix), training_size, replace=False)]
+        index = cls(spherical_kmeans(sample, n_lists, iterations, seed), n_probe)
+        index.add(labels, matrix)
+        logger.info(f"Built IVF index with {len(index)} vectors in {n_lists} lists")
+        return index
+
+    @property
+    def n_lists(self) -> int:
+        return int(self.centroids.shape[0])
+
+    @property
+    def dimension(self) -> int:
+        return int(self.centroids.shape[1])
+
+    def __len__(self) -> int:
+        return len(self.labels)
+
+    def add(self, labels: list[str], matrix) -> None:
+        """Inserts vectors into the lists of their closest centroids."""
+        matrix = normalize_rows(matrix)
+        if matrix.shape[0] != len(labels):
+            raise ValueError(f"Got {len(labels)} labels for {matrix.shape[0]} vectors")
+        start = len(self.labels)
+        assignments = np.argmax(matrix @ self.centroids.T, axis=1)
+
+        self.labels.extend(labels)
+        self.matrix = np.concatenate([self.matrix, matrix])
+        self.assignments = np.concatenate([self.assignments, assignments])
+        for list_id in np.unique(assignments):
+            new_rows = start + np.flatnonzero(assignments == list_id)
+            self._lists[list_id] = np.concatenate([self._lists[list_id], new_rows])
+
+    def top_k(self, query, k: int = 1) -> list[tuple[str, float]]:
+        return self.top_k_many([query], k)[0]
+
+    def top_k_many(self, queries, k: int = 1) -> list[list[tuple[str, float]]]:
+        queries = normalize_rows(queries)
+        n_probe = min(self.n_probe, self.n_lists)
+        coarse = queries @ self.centroids.T
+        probes = np.argpartition(-coarse, n_probe - 1, axis=1)[:, :n_probe]
+
+        results = []
+        for query, lists in zip(queries, probes):
+            candidates = np.concatenate([self._lists[i] for i in lists])
+            scores = self.matrix[candidates] @ query
+            count = min(k, len(candidates))
+            if count < len(candidates):
+                best = np.argpartition(-scores, count - 1)[:count]
+            else:
+                best = np.arange(len(candidates))
+            best = best[np.argsort(-scores[best], kind="stable")]
+            results.append(
+                [(self.labels[candidates[i]], float(scores[i])) for i in best]
+            )
+        return results
+
+    def save(self, path) -> None:
+        """Writes the index to a single ``.npz`` file (a path or an open
+        binary file)."""
+        np.savez(
+            path,
+            centroids=self.centroids,
+            n_probe=self.n_probe,
+            key=self.key,
+            labels=np.array(self.labels, dtype=str),
+            matrix=self.matrix,
+            assignments=self.assignments,
+        )
+
+    @classmethod
+    def load(cls, path: str) -> "IVFIndex":
+        with np.load(path, allow_pickle=False) as data:
+            index = cls(data["centroids"], int(data["n_probe"]))
+            if "key" in data:
+                index.key = str(data["key"])
+            index.labels = data["labels"].tolist()
+            index.matrix = data["matrix"]
+            index.assignments = data["assignments"]
+        for list_id in range(index.n_lists):
+            index._lists[list_id] = np.flatnonzero(index.assignments == list_id)
+        return index
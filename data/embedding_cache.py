@@ -0,0 +1,177 @@
+import logging
+import sqlite3
+import threading
+import time
+import numpy as np
+
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+# Keeps "IN (...)" lookups below SQLite's bound-parameter limit
+SQLITE_MAX_VARIABLES = 500
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS embeddings (
+    text TEXT NOT NULL,
+    deployment TEXT NOT NULL,
+    vector BLOB NOT NULL,
+    created_at REAL NOT NULL,
+    accessed_at REAL NOT NULL,
+    PRIMARY KEY (text, deployment)
+);
+CREATE INDEX IF NOT EXISTS embeddings_accessed_at ON embeddings (accessed_at);
+CREATE TABLE IF NOT EXISTS stats (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO stats (name, value) VALUES ('hits', 0), ('misses', 0);
+"""
+
+
+def normalize_text(text: str) -> str:
+    """Normalizes a query so trivial case and whitespace differences share
+    one cache entry."""
+    return " ".join(text.split()).casefold()
+
+
+class EmbeddingCache:
+    """Persistent embedding cache backed by SQLite.
+
+    Entries are keyed by (normalized text, deployment name) and evicted when
+    older than ``ttl_seconds`` or, least recently used first, once the cache
+    holds more than ``max_entries``. The database runs in WAL mode with a busy
+    timeout so several processes on one host can share the same file. Each
+    thread gets its own connection."""
+
+    def __init__(
+        self,
+        path: str,
+        max_entries: int = 10000,
+        ttl_seconds: float = 30 * 24 * 3600,
+        timeout: float = 10.0,
+    ):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.timeout = timeout
+        self.hits = 0
+        self.misses = 0
+        self._local = threading.local()
+        self._counter_lock = threading.Lock()
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=self.timeout)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, text: str, deployment: str) -> "tuple | None":
+        """Returns the cached embedding or None."""
+        return self.get_many([text], deployment).get(text)
+
+    def get_many(self, texts: list[str], deployment: str) -> dict[str, tuple]:
+        """Looks up several texts at once. The result maps each original text
+        that was found to its embedding."""
+        keys = {text: normalize_text(text) for text in texts}
+        unique_keys = list(set(keys.values()))
+        now = time.time()
+        found = {}
+
+        conn = self._connect()
+        with conn:
+            for start in range(0, len(unique_keys), SQLITE_MAX_VARIABLES):
+                end = start + SQLITE_MAX_VARIABLES
+                batch = unique_keys[start:end]
+                placeholders = ",".join("?" * len(batch))
+                rows = conn.execute(
+                    f"SELECT text, vector FROM embeddings WHERE deployment = ? "
+                    f"AND created_at >= ? AND text IN ({placeholders})",
+                    [deployment, now - self.ttl_seconds, *batch],
+                ).fetchall()
+                found.update(
+                    (key, tuple(np.frombuffer(vector, dtype=np.float32).tolist()))
+                    for key, vector in rows
+                )
+
+            if found:
+                conn.executemany(
+                    "UPDATE embeddings SET accessed_at = ? "
+                    "WHERE text = ? AND deployment = ?",
+                    [(now, key, deployment) for key in found],
+                )
+            hits = sum(1 for key in keys.values() if key in found)
+            misses = len(keys) - hits
+            conn.execute(
+                "UPDATE stats SET value = value + CASE name "
+                "WHEN 'hits' THEN ? WHEN 'misses' THEN ? ELSE 0 END",
+                (hits, misses),
+            )
+
+        with self._counter_lock:
+            self.hits += hits
+            self.misses += misses
+        return {text: found[key] for text, key in keys.items() if key in found}
+
+    def put(self, text: str, deployment: str, embedding) -> None:
+        self.put_many({text: embedding}, deployment)
+
+    def put_many(self, embeddings: dict, deployment: str) -> None:
+        """Stores embeddings for several texts and applies eviction."""
+        now = time.time()
+        rows = [
+            (
+                normalize_text(text),
+                deployment,
+                np.asarray(embedding, dtype=np.float32).tobytes(),
+                now,
+                now,
+            )
+            for text, embedding in embeddings.items()
+        ]
+        conn = self._connect()
+        with conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO embeddings "
+                "(text, deployment, vector, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                rows,
+            )
+            self._evict(conn, now)
+
+    def _evict(self, conn: sqlite3.Connection, now: float) -> None:
+        conn.execute(
+            "DELETE FROM embeddings WHERE created_at < ?", (now - self.ttl_seconds,)
+        )
+        conn.execute(
+            "DELETE FROM embeddings WHERE rowid IN ("
+            "SELECT rowid FROM embeddings ORDER BY accessed_at DESC "
+            "LIMIT -1 OFFSET ?)",
+            (self.max_entries,),
+        )
+
+    def stats(self) -> dict:
+        """Hit/miss counters for this process and for all processes sharing
+        the cache file, plus the current number of entries."""
+        conn = self._connect()
+        shared = dict(conn.execute("SELECT name, value FROM stats").fetchall())
+        entries = conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "shared_hits": shared["hits"],
+            "shared_misses": shared["misses"],
+            "entries": entries,
+        }
+
+    def clear(self) -> None:
+        conn = self._connect()
+        with conn:
+            conn.execute("DELETE FROM embeddings")
+            conn.execute("UPDATE stats SET value = 0")
@@ -0,0 +1,318 @@
+import argparse
+import contextlib
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import numpy as np
+import pandas as pd
+from ast import literal_eval
+from typing import Callable, Sequence
+from data.ann_index import IVFIndex
+
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+MATRIX_PATH = "data/frame_embeddings.npy"
+MANIFEST_PATH = "data/frame_embeddings.json"
+INDEX_PATH = "data/frame_index.npz"
+MANIFEST_VERSION = 1
+
+
+def description_hash(description: str, model: str) -> str:
+    """Returns a stable content hash for a frame description embedded with
+    ``model``, so a changed text or a changed deployment both invalidate it."""
+    return hashlib.sha256(f"{model}\n{description}".encode("utf-8")).hexdigest()
+
+
+class EmbeddingStore:
+    """Frame embeddings stored as a float32 matrix plus a JSON manifest.
+
+    The matrix is written as a plain ``.npy`` file so it can be opened with
+    ``mmap_mode="r"``; row ``i`` belongs to ``frame_names[i]``. The manifest
+    names the matrix file and keeps the frame names, description hashes,
+    model name and dimension so a loader can tell whether the stored vectors
+    are still usable."""
+
+    def __init__(
+        self,
+        frame_names: list[str],
+        description_hashes: list[str],
+        matrix: np.ndarray,
+        model: str,
+    ):
+        if matrix.ndim != 2 or matrix.shape[0] != len(frame_names):
+            raise ValueError(
+                f"Embedding matrix shape {matrix.shape} does not match "
+                f"{len(frame_names)} frames"
+            )
+        if len(description_hashes) != len(frame_names):
+            raise ValueError("Expected one description hash per frame")
+        self.frame_names = list(frame_names)
+        self.description_hashes = list(description_hashes)
+        self.matrix = matrix
+        self.model = model
+
+    @property
+    def dimension(self) -> int:
+        return int(self.matrix.shape[1])
+
+    def __len__(self) -> int:
+        return len(self.frame_names)
+
+    @property
+    def content_hash(self) -> str:
+        """Hash of the frame names and description hashes, in order. It
+        changes whenever any stored vector or its position would."""
+        content = json.dumps([self.frame_names, self.description_hashes])
+        return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+    def matrix_for(self, frame_names: list[str]) -> np.ndarray:
+        """Returns the embedding rows for ``frame_names`` in that order.
+
+        When the order already matches the stored order the (memory-mapped)
+        matrix is returned as is, without copying."""
+        if list(frame_names) == self.frame_names:
+            return self.matrix
+        positions = {name: i for i, name in enumerate(self.frame_names)}
+        return self.matrix[[positions[name] for name in frame_names]]
+
+    def save(self, matrix_path: str = MATRIX_PATH, manifest_path: str = MANIFEST_PATH):
+        """Writes the matrix and the manifest.
+
+        The matrix goes to a new file named after its content, next to
+        ``matrix_path``, and the manifest names that file. Replacing the
+        manifest is the only step readers can observe, so they see either the
+        old store or the new one, never a mix, and a crash part way leaves
+        the old store in place. Concurrent writers each use their own
+        temporary files."""
+        matrix = np.ascontiguousarray(self.matrix, dtype=np.float32)
+        digest = hashlib.sha256(matrix.tobytes()).hexdigest()[:16]
+        root, ext = os.path.splitext(matrix_path)
+        versioned_path = f"{root}.{digest}{ext}"
+        manifest = {
+            "version": MANIFEST_VERSION,
+            "model": self.model,
+            "dimension": self.dimension,
+            "dtype": "float32",
+            "matrix": os.path.basename(versioned_path),
+            "frame_names": self.frame_names,
+            "description_hashes": self.description_hashes,
+        }
+        previous = _manifest_matrix_path(manifest_path, matrix_path)
+
+        with _temporary_file(versioned_path) as f:
+            np.save(f, matrix)
+        with _temporary_file(manifest_path, "w") as f:
+            json.dump(manifest, f, indent=2)
+        if previous != versioned_path and previous != matrix_path:
+            # Readers that already mapped it keep their mapping
+            try:
+                os.remove(previous)
+            except OSError:
+                pass
+        logger.info(f"Saved {len(self)} embeddings to {versioned_path}")
+
+    @classmethod
+    def load(
+        cls, matrix_path: str = MATRIX_PATH, manifest_path: str = MANIFEST_PATH
+    ) -> "EmbeddingStore | None":
+        """Memory-maps a saved store. Returns None when no store exists or
+        the files are unusable; the store is rebuilt from the descriptions
+        then. ``matrix_path`` is only read for manifests that don't name
+        their matrix file."""
+        if not os.path.exists(manifest_path):
+            return None
+        try:
+            with open(manifest_path, "r") as f:
+                manifest = json.load(f)
+            if manifest.get("version") != MANIFEST_VERSION:
+                logger.warning(
+                    f"Ignoring embedding store with version {manifest.get('version')}"
+                )
+                return None
+
+            path = _manifest_matrix_path(manifest_path, matrix_path, manifest)
+            if not os.path.exists(path):
+                return None
+            matrix = np.load(path, mmap_mode="r")
+            if matrix.dtype != np.float32 or matrix.shape != (
+                len(manifest["frame_names"]),
+                manifest["dimension"],
+            ):
+                raise ValueError(
+                    f"Embedding matrix {path} ({matrix.dtype}, {matrix.shape}) "
+                    f"does not match manifest {manifest_path}"
+                )
+            return cls(
+                manifest["frame_names"],
+                manifest["description_hashes"],
+                matrix,
+                manifest["model"],
+            )
+        except Exception as e:
+            logger.warning(f"Ignoring unusable embedding store: {str(e)}")
+            return None
+
+
+def save_index(index: IVFIndex, path: str = INDEX_PATH) -> None:
+    """Writes a search index next to the store, replacing ``path`` in one
+    step like the manifest."""
+    with _temporary_file(path) as f:
+        index.save(f)
+    logger.info(f"Saved search index over {len(index)} embeddings to {path}")
+
+
+def load_index(key: str, path: str = INDEX_PATH) -> "IVFIndex | None":
+    """Loads the index saved at ``path`` if it was built for the store with
+    content hash ``key``. Returns None when it is missing, outdated or
+    unusable; the index is rebuilt then."""
+    if not os.path.exists(path):
+        return None
+    try:
+        index = IVFIndex.load(path)
+    except Exception as e:
+        logger.warning(f"Ignoring unusable search index: {str(e)}")
+        return None
+    if index.key != key:
+        logger.info("Saved search index is outdated - rebuilding")
+        return None
+    return index
+
+
+@contextlib.contextmanager
+def _temporary_file(path: str, mode: str = "wb"):
+    """Yields a new file in the directory of ``path`` that replaces ``path``
+    once written, or is removed if writing fails."""
+    fd, tmp = tempfile.mkstemp(
+        dir=os.path.dirname(path) or ".", prefix=os.path.basename(path) + "."
+    )
+    try:
+        with os.fdopen(fd, mode) as f:
+            yield f
+        os.replace(tmp, path)
+    except BaseException:
+        os.remove(tmp)
+        raise
+
+
+def _manifest_matrix_path(
+    manifest_path: str, matrix_path: str, manifest: "dict | None" = None
+) -> str:
+    """The matrix file the manifest at ``manifest_path`` refers to."""
+    if manifest is None:
+        try:
+            with open(manifest_path, "r") as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return matrix_path
+    if not manifest.get("matrix"):
+        return matrix_path
+    return os.path.join(os.path.dirname(manifest_path), manifest["matrix"])
+
+
+def update_store(
+    store: "EmbeddingStore | None",
+    frame_names: list[str],
+    descriptions: list[str],
+    model: str,
+    embed: Callable[[list[str]], list[Sequence[float]]],
+) -> tuple[EmbeddingStore, dict]:
+    """Brings ``store`` in line with the current descriptions.
+
+    Rows whose description hash is already stored are reused, only new or
+    changed descriptions are passed to ``embed`` and rows that are no longer
+    listed are dropped. Returns the resulting store and a summary of what
+    changed; the store is the input object when nothing changed."""
+    hashes = [description_hash(d, model) for d in descriptions]
+    if (
+        store is not None
+        and store.frame_names == list(frame_names)
+        and store.description_hashes == hashes
+    ):
+        return store, {"reused": len(hashes), "embedded": 0, "dropped": 0}
+
+    known = {}
+    if store is not None:
+        known = {h: i for i, h in enumerate(store.description_hashes)}
+
+    missing = [i for i, h in enumerate(hashes) if h not in known]
+    new_vectors = embed([descriptions[i] for i in missing]) if missing else []
+
+    if missing:
+        dimension = len(new_vectors[0])
+    else:
+        # An empty catalog without a previous store has no dimension yet
+        dimension = store.dimension if store is not None else 0
+    matrix = np.empty((len(hashes), dimension), dtype=np.float32)
+    for i, h in enumerate(hashes):
+        if h in known:
+            matrix[i] = store.matrix[known[h]]
+    for i, vector in zip(missing, new_vectors):
+        matrix[i] = vector
+
+    dropped = len(set(known) - set(hashes))
+    summary = {
+        "reused": len(hashes) - len(missing),
+        "embedded": len(missing),
+        "dropped": dropped,
+    }
+    return EmbeddingStore(frame_names, hashes, matrix, model), summary
+
+
+def import_csv(csv_path: str, model: str) -> EmbeddingStore:
+    """Builds a store from a CSV with frame_name, description and embedding
+    columns, where embeddings are stringified Python lists."""
+    df = pd.read_csv(csv_path)
+    matrix = np.array(
+        [literal_eval(e) if isinstance(e, str) else e for e in df["embedding"]],
+        dtype=np.float32,
+    )
+    return EmbeddingStore(
+        df["frame_name"].tolist(),
+        [description_hash(d, model) for d in df["description"]],
+        matrix,
+        model,
+    )
+
+
+def export_csv(store: EmbeddingStore, descriptions: pd.DataFrame, csv_path: str):
+    """Writes the store back out in the frame_name, description, embedding CSV
+    format, taking the description text from ``descriptions``."""
+    df = descriptions[["frame_name", "description"]].copy()
+    df["embedding"] = [
+        list(map(float, row)) for row in store.matrix_for(df["frame_name"].tolist())
+    ]
+    df.to_csv(csv_path, index=False)
+    logger.info(f"Exported {len(df)} embeddings to {csv_path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Import or export frame embeddings as CSV."
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    import_parser = subparsers.add_parser("import", help="CSV -> binary store")
+    import_parser.add_argument("csv_path")
+    import_parser.add_argument("--model", required=True)
+
+    export_parser = subparsers.add_parser("export", help="binary store -> CSV")
+    export_parser.add_argument("csv_path")
+    export_parser.add_argument("--descriptions", default="data/frame_descriptions.csv")
+
+    args = parser.parse_args()
+    if args.command == "import":
+        import_csv(args.csv_path, args.model).save()
+    else:
+        store = EmbeddingStore.load()
+        if store is None:
+            raise SystemExit(f"No embedding store found at {MATRIX_PATH}")
+        export_csv(store, pd.read_csv(args.descriptions), args.csv_path)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,21 @@
+import json
 import logging
+import threading
 import numpy as np
 import pandas as pd
-import os
-from ast import literal_eval
+import startup
+from ai import clients
+from ai.completion_cache import cached_chat_completion, cached_chat_completion_stream
 from config import Config
-from openai import AzureOpenAI
-from sklearn.metrics.pairwise import cosine_similarity
+from data.embedding_cache import EmbeddingCache
+from data.embedding_store import EmbeddingStore, load_index, save_index, update_store
+from data.ann_index import IVFIndex
+from data.prompt_context import PromptContext, estimate_tokens, log_token_budget
+from data.search_index import ExactIndex
 from functools import lru_cache
+from typing import Iterator
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 
 logging.basicConfig(
     level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
@@ -20,119 +29,303 @@ except Exception as e:
     logger.error(f"Failed to load config: {str(e)}")
     raise
 
-try:
-    df = pd.read_csv("data/frame_descriptions.csv")
-    logger.info("Successfully loaded frame descriptions data")
-except Exception as e:
-    logger.error(f"Error loading frame descriptions data: {str(e)}")
-    raise
-
-try:
-    embeddings_client = AzureOpenAI(
-        api_key=config.embedding_api_key,
-        api_version=config.embedding_api_version,
-        azure_endpoint=config.embedding_api_base,
-    )
-    logger.info("Successfully initialized embeddings Azure OpenAI client")
-except Exception as e:
-    logger.error(f"Failed to initialize embeddings Azure OpenAI client: {str(e)}")
-    raise
-
-try:
-    chat_client = AzureOpenAI(
-        api_key=config.api_key,
-        api_version=config.api_version,
-        azure_endpoint=config.api_base,
-    )
-    logger.info("Successfully initialized chatAzure OpenAI client")
-except Exception as e:
-    logger.error(f"Failed to initialize OpenAI client: {str(e)}")
-    raise
+# Everything below that needs the network, the catalog files or the API clients
+# is loaded on first use (or by warmup()), so importing this module is cheap
+_query_cache = None
+_query_cache_loaded = False
+_query_cache_lock = threading.Lock()
+
+
+def get_query_cache() -> "EmbeddingCache | None":
+    """The persistent query-embedding cache, or None when
+    ``config.embedding_cache_path`` is empty."""
+    global _query_cache, _query_cache_loaded
+    with _query_cache_lock:
+        if not _query_cache_loaded:
+            try:
+                if config.embedding_cache_path:
+                    with startup.timed_load("embedding cache"):
+                        _query_cache = EmbeddingCache(
+                            config.embedding_cache_path,
+                            max_entries=config.embedding_cache_max_entries,
+                            ttl_seconds=config.embedding_cache_ttl_seconds,
+                        )
+                    logger.info(
+                        f"Using persistent embedding cache {config.embedding_cache_path}"
+                    )
+            except Exception as e:
+                logger.error(f"Failed to open embedding cache: {str(e)}")
+                raise
+            _query_cache_loaded = True
+        return _query_cache
+
+
+# Results fetched by get_embeddings_batch, handed to get_embeddings so they
+# end up in its lru_cache. Per thread, so a batch running in another thread
+# can't take them.
+_prefetched = threading.local()
 
 
 @lru_cache(maxsize=1000)
 def get_embeddings(text: str) -> tuple:
+    prefetched = getattr(_prefetched, "embeddings", None)
+    if prefetched is not None and text in prefetched:
+        return prefetched[text]
+
     try:
-        response = embeddings_client.embeddings.create(
+        query_cache = get_query_cache()
+        if query_cache is not None:
+            cached = query_cache.get(text, config.embedding_deployment_name)
+            if cached is not None:
+                return cached
+
+        response = clients.get_embeddings_client().embeddings.create(
             input=text, model=config.embedding_deployment_name
         )
-        return tuple(response.data[0].embedding)
+        embedding = tuple(response.data[0].embedding)
+        if query_cache is not None:
+            query_cache.put(text, config.embedding_deployment_name, embedding)
+        return embedding
     except Exception as e:
         logger.error(f"Error getting embeddings: {str(e)}")
         raise
 
 
-def load_and_generate_embeddings() -> pd.DataFrame:
+def chunk_texts(texts: list[str], max_items: int, max_tokens: int) -> list[list[str]]:
+    """Splits texts into consecutive chunks that stay within both the item and
+    the estimated token limit. A single oversized text gets its own chunk."""
+    chunks = []
+    current = []
+    current_tokens = 0
+    for text in texts:
+        tokens = estimate_tokens(text)
+        if current and (
+            len(current) >= max_items or current_tokens + tokens > max_tokens
+        ):
+            chunks.append(current)
+            current = []
+            current_tokens = 0
+        current.append(text)
+        current_tokens += tokens
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def _embed_chunk(chunk: list[str]) -> list[tuple]:
+    response = clients.get_embeddings_client().embeddings.create(
+        input=chunk, model=config.embedding_deployment_name
+    )
+    # The API reports each result's position in the input list
+    return [
+        tuple(item.embedding) for item in sorted(response.data, key=lambda d: d.index)
+    ]
+
+
+def get_embeddings_batch(texts: list[str]) -> list[tuple]:
+    """Embeds many texts with as few requests as possible.
+
+    Texts found in the persistent cache are not sent, duplicates are sent
+    once, chunks are limited by
+    ``config.embedding_batch_max_items`` and
+    ``config.embedding_batch_max_tokens`` and at most
+    ``config.embedding_batch_concurrency`` requests run at the same time.
+    Results are passed through get_embeddings so later single lookups are
+    served from its cache."""
     try:
-        # Load current descriptions
-        df_current = pd.read_csv("data/frame_descriptions.csv")
+        unique_texts = list(dict.fromkeys(texts))
+        query_cache = get_query_cache()
+        cached = {}
+        if query_cache is not None:
+            cached = query_cache.get_many(
+                unique_texts, config.embedding_deployment_name
+            )
+        embeddings = dict(cached)
 
-        # Load temp file if exists
-        df_temp = None
-        if os.path.exists("data/frame_descriptions_temp.csv"):
-            df_temp = pd.read_csv("data/frame_descriptions_temp.csv")
+        missing = [text for text in unique_texts if text not in cached]
+        chunks = chunk_texts(
+            missing,
+            config.embedding_batch_max_items,
+            config.embedding_batch_max_tokens,
+        )
+        logger.info(
+            f"Embedding {len(missing)} texts in {len(chunks)} requests "
+            f"({len(cached)} cached)"
+        )
 
-        # Check if files are different or temp doesn't exist
-        if df_temp is None or not df_current.equals(df_temp):
-            logger.info("Changes detected in descriptions - regenerating embeddings")
+        with ThreadPoolExecutor(
+            max_workers=config.embedding_batch_concurrency
+        ) as executor:
+            for chunk, vectors in zip(chunks, executor.map(_embed_chunk, chunks)):
+                embeddings.update(zip(chunk, vectors))
+                if query_cache is not None:
+                    query_cache.put_many(
+                        dict(zip(chunk, vectors)), config.embedding_deployment_name
+                    )
+
+        _prefetched.embeddings = embeddings
+        try:
+            return [get_embeddings(text) for text in texts]
+        finally:
+            _prefetched.embeddings = None
+    except Exception as e:
+        logger.error(f"Error getting batch embeddings: {str(e)}")
+        raise
 
-            # Generate embeddings
-            df_current["embedding"] = df_current["description"].apply(
-                lambda x: list(get_embeddings(x))
-            )
 
-            # Save embeddings file
-            df_current.to_csv("data/frame_descriptions_embeddings.csv", index=False)
+def load_and_generate_embeddings() -> pd.DataFrame:
+    try:
+        # Load current descriptions
+        df_current = pd.read_csv("data/frame_descriptions.csv")
 
-            # Update temp file with current descriptions
-            df_current[["frame_name", "description"]].to_csv(
-                "data/frame_descriptions_temp.csv", index=False
+        # Only new or changed descriptions are embedded, keyed by content hash
+        saved_store = EmbeddingStore.load()
+        store, summary = update_store(
+            saved_store,
+            df_current["frame_name"].tolist(),
+            df_current["description"].tolist(),
+            config.embedding_deployment_name,
+            get_embeddings_batch,
+        )
+        if store is not saved_store:
+            logger.info(
+                f"Changes detected in descriptions - {summary['embedded']} embedded, "
+                f"{summary['reused']} reused, {summary['dropped']} dropped"
             )
-
-            return df_current
+            store.save()
+            # Memory-mapped from now on; keep the one in memory if another
+            # process replaced the files in between and they are unusable
+            store = EmbeddingStore.load() or store
         else:
-            # Load existing embeddings if no changes
-            df = pd.read_csv("data/frame_descriptions_embeddings.csv")
             logger.info(
                 "Using existing embeddings - no changes detected in descriptions"
             )
-            return df
+
+        # Rows of the memory-mapped matrix, no per-row parsing or copying
+        df_current["embedding"] = list(
+            store.matrix_for(df_current["frame_name"].tolist())
+        )
+        # Keys the saved search index, see build_index
+        df_current.attrs["content_hash"] = store.content_hash
+        return df_current
 
     except Exception as e:
         logger.error(f"Error in embeddings generation process: {str(e)}")
         raise
 
 
-# Load embeddings
-df = load_and_generate_embeddings()
+def build_index(labels: list[str], matrix, key: str = "") -> "ExactIndex | IVFIndex":
+    """Exact search for small catalogs, IVF approximate search once the catalog
+    reaches ``config.ann_min_catalog_size`` entries.
+
+    With a ``key`` (the embedding store's content hash) the IVF index is saved
+    next to the store and loaded from there while the key matches, so k-means
+    only runs again after the descriptions change."""
+    if len(labels) < config.ann_min_catalog_size:
+        return ExactIndex(labels, matrix)
+    index = load_index(key) if key else None
+    if index is not None and index.labels == list(labels):
+        index.n_probe = config.ann_n_probe
+        return index
+
+    index = IVFIndex.build(labels, matrix, n_probe=config.ann_n_probe)
+    if key:
+        index.key = key
+        try:
+            save_index(index)
+        except Exception as e:
+            logger.warning(f"Could not save the search index: {str(e)}")
+    return index
+
+
+@dataclass
+class FrameCatalog:
+    """Frame descriptions with their embeddings, the search index over them
+    and the listing rendered for chat prompts."""
+
+    df: pd.DataFrame
+    index: "ExactIndex | IVFIndex"
+    prompt_context: PromptContext
+
+
+_catalog = None
+_catalog_lock = threading.Lock()
+
+
+def get_catalog() -> FrameCatalog:
+    """Loads the frame catalog on first use, embedding new or changed
+    descriptions over the network if needed."""
+    global _catalog
+    with _catalog_lock:
+        if _catalog is None:
+            with startup.timed_load("frame catalog"):
+                df = load_and_generate_embeddings()
+                if len(df):
+                    matrix = np.stack(df["embedding"])
+                else:
+                    matrix = np.empty((0, 0), dtype=np.float32)
+                index = build_index(
+                    df["frame_name"].tolist(),
+                    matrix,
+                    df.attrs.get("content_hash", ""),
+                )
+                prompt_context = PromptContext(
+                    df["frame_name"].tolist(), df["description"].tolist()
+                )
+            logger.info(
+                f"Prompt context: {len(prompt_context.lines)} frames, "
+                f"~{prompt_context.full_tokens} tokens"
+            )
+            _catalog = FrameCatalog(df, index, prompt_context)
+        return _catalog
 
 
-def find_most_similar_frame(query_text: str) -> tuple[str, float]:
+def warmup() -> None:
+    """Loads the API clients, the embedding cache and the frame catalog now
+    rather than on the first request."""
     try:
-        query_embedding = list(get_embeddings(query_text))
+        with startup.timed_load("chat and embeddings clients"):
+            clients.get_chat_client()
+            clients.get_embeddings_client()
+        get_query_cache()
+        get_catalog()
+    except Exception as e:
+        logger.error(f"Failed to warm up embeddings: {str(e)}")
+        raise
 
-        if isinstance(df["embedding"].iloc[0], str):
-            df["embedding"] = df["embedding"].apply(literal_eval)
 
-        similarities = cosine_similarity([query_embedding], df["embedding"].tolist())[0]
-        most_similar_idx = np.argmax(similarities)
-        return df["frame_name"].iloc[most_similar_idx], similarities[most_similar_idx]
+def find_most_similar_frame(query_text: str) -> tuple[str, float]:
+    try:
+        query_embedding = get_embeddings(query_text)
+        matches = get_catalog().index.top_k(query_embedding, 1)
+        # Nothing to match in an empty catalog
+        return matches[0] if matches else ("normal", 0.0)
 
     except Exception as e:
         logger.error(f"Error finding most similar frame: {str(e)}")
         raise
 
 
+def frame_context(user_prompt: str, include: "list[str] | None" = None) -> str:
+    """Frame listing for chat prompts.
+
+    With ``config.prompt_context_top_k`` set, only the frames closest to the
+    user prompt by embedding similarity (plus ``include`` and the 'normal'
+    fallback) are listed; otherwise the whole catalog is."""
+    catalog = get_catalog()
+    top_k = config.prompt_context_top_k
+    if not top_k or top_k >= len(catalog.prompt_context.lines):
+        return catalog.prompt_context.full
+    candidates = [
+        name for name, _ in catalog.index.top_k(get_embeddings(user_prompt), top_k)
+    ]
+    return catalog.prompt_context.render((include or []) + candidates + ["normal"])
+
+
 def ai_frame_selection(user_prompt: str) -> str:
     try:
-        # Get frame descriptions and embeddings as context
-        frame_data = df[["frame_name", "description", "embedding"]].to_dict("records")
-        context = "\n".join(
-            [
-                f"{f['frame_name']}: {f['description']} (embedding: {f['embedding']})"
-                for f in frame_data
-            ]
-        )
+        # Get frame names and descriptions as context
+        context = frame_context(user_prompt)
 
         system_prompt = """
         You are a video effects assistant.
@@ -154,31 +347,28 @@ def ai_frame_selection(user_prompt: str) -> str:
             },
         ]
 
-        response = chat_client.chat.completions.create(
+        log_token_budget("ai_frame_selection", messages, 1000)
+        content = cached_chat_completion(
+            clients.get_chat_client(),
+            semantic_text=user_prompt,
+            embed=get_embeddings,
             model=config.deployment_name,
             messages=messages,
             temperature=0.1,
             max_tokens=1000,
         )
 
-        selected_frame = response.choices[0].message.content.strip().lower()
+        selected_frame = content.strip().lower()
         return selected_frame
 
     except Exception as e:
         logger.error(f"Error in LLM frame selection: {str(e)}")
 
 
-def ai_explanation(frame_name: str, user_prompt: str) -> str:
-    try:
-        frame_data = df[["frame_name", "description", "embedding"]].to_dict("records")
-        context = "\n".join(
-            [
-                f"{f['frame_name']}: {f['description']} (embedding: {f['embedding']})"
-                for f in frame_data
-            ]
-        )
+def _explanation_messages(frame_name: str, user_prompt: str) -> list[dict]:
+    context = frame_context(user_prompt, include=[frame_name])
 
-        system_prompt = f"""
+    system_prompt = f"""
         You are a video effects assistant.
         Your task is to help users select the most appropriate video frame effect based on their request.
         You returned {frame_name} as frame name, please explain why you made this choice based on {context}.
@@ -187,24 +377,58 @@ def ai_explanation(frame_name: str, user_prompt: str) -> str:
         Be concise.
         Warn users about limitations based on what you know from the description of the frame."""
 
-        messages = [
-            {"role": "system", "content": system_prompt},
-            {
-                "role": "user",
-                "content": f"""
+    return [
+        {"role": "system", "content": system_prompt},
+        {
+            "role": "user",
+            "content": f"""
             User request: {user_prompt}
             """,
-            },
-        ]
+        },
+    ]
+
+
+def _evaluation_messages(
+    frame_name: str, explanation: "str | None", user_prompt: str
+) -> list[dict]:
+    context = frame_context(user_prompt, include=[frame_name])
+    reasoning = f" with this explanation: {explanation}" if explanation else ""
+
+    system_prompt = f"""
+        You are a video effects assistant.
+        Judge the frame selection based on the user's prompt.
+        You returned {frame_name} as frame name based on {context}{reasoning}.
+        start your response with 'YES:' or 'NO:' and then explain your reasoning. Be concise.
+        if NO then suggest user to enter a new prompt and give users a summary of the frames from the context.
+        """
 
-        response = chat_client.chat.completions.create(
+    return [
+        {"role": "system", "content": system_prompt},
+        {
+            "role": "user",
+            "content": f"""
+            User request: {user_prompt}
+            """,
+        },
+    ]
+
+
+def ai_explanation(frame_name: str, user_prompt: str) -> str:
+    try:
+        messages = _explanation_messages(frame_name, user_prompt)
+
+        log_token_budget("ai_explanation", messages, 1000)
+        content = cached_chat_completion(
+            clients.get_chat_client(),
+            semantic_text=user_prompt,
+            embed=get_embeddings,
             model=config.deployment_name,
             messages=messages,
             temperature=0.3,
             max_tokens=1000,
         )
 
-        explanation = response.choices[0].message.content.strip()
+        explanation = content.strip()
         return explanation
 
     except Exception as e:
@@ -212,46 +436,139 @@ def ai_explanation(frame_name: str, user_prompt: str) -> str:
         raise
 
 
-def ai_evaluation(frame_name: str, explanation: str, user_prompt: str) -> str:
+def ai_explanation_stream(frame_name: str, user_prompt: str) -> Iterator[str]:
+    """Like ai_explanation, but yields the text piece by piece as it arrives."""
+    try:
+        messages = _explanation_messages(frame_name, user_prompt)
+
+        log_token_budget("ai_explanation_stream", messages, 1000)
+        yield from cached_chat_completion_stream(
+            clients.get_chat_client(),
+            semantic_text=user_prompt,
+            embed=get_embeddings,
+            model=config.deployment_name,
+            messages=messages,
+            temperature=0.3,
+            max_tokens=1000,
+        )
+
+    except Exception as e:
+        logger.error(f"Error in streamed LLM frame explanation: {str(e)}")
+        raise
+
+
+def ai_evaluation(frame_name: str, explanation: "str | None", user_prompt: str) -> str:
+    """Judges a frame selection. ``explanation`` may be None so the evaluation
+    can run at the same time as ai_explanation."""
+    try:
+        messages = _evaluation_messages(frame_name, explanation, user_prompt)
+
+        log_token_budget("ai_evaluation", messages, 1000)
+        content = cached_chat_completion(
+            clients.get_chat_client(),
+            semantic_text=user_prompt,
+            embed=get_embeddings,
+            model=config.deployment_name,
+            messages=messages,
+            temperature=0.3,
+            max_tokens=1000,
+        )
+
+        evaluation = content.strip()
+        return evaluation
+
+    except Exception as e:
+        logger.error(f"Error in LLM frame evaluation: {str(e)}")
+        raise
+
+
+def ai_evaluation_stream(
+    frame_name: str, explanation: "str | None", user_prompt: str
+) -> Iterator[str]:
+    """Like ai_evaluation, but yields the text piece by piece as it arrives."""
     try:
-        frame_data = df[["frame_name", "description", "embedding"]].to_dict("records")
-        context = "\n".join(
-            [
-                f"{f['frame_name']}: {f['description']} (embedding: {f['embedding']})"
-                for f in frame_data
-            ]
+        messages = _evaluation_messages(frame_name, explanation, user_prompt)
+
+        log_token_budget("ai_evaluation_stream", messages, 1000)
+        yield from cached_chat_completion_stream(
+            clients.get_chat_client(),
+            semantic_text=user_prompt,
+            embed=get_embeddings,
+            model=config.deployment_name,
+            messages=messages,
+            temperature=0.3,
+            max_tokens=1000,
         )
 
-        system_prompt = f"""
+    except Exception as e:
+        logger.error(f"Error in streamed LLM frame evaluation: {str(e)}")
+        raise
+
+
+def _parse_pipeline_answer(content: str) -> dict:
+    """The JSON object ai_frame_pipeline asks for; raises ValueError for
+    anything else."""
+    result = json.loads(content)
+    if not isinstance(result, dict):
+        raise ValueError(f"Expected a JSON object, got {type(result).__name__}")
+    return result
+
+
+def ai_frame_pipeline(user_prompt: str) -> dict:
+    """Selects, explains and evaluates a frame in a single JSON completion.
+
+    Returns a dict with 'frame', 'explanation' and 'verdict' keys. A frame
+    name that is not in the catalog is replaced by 'normal'."""
+    try:
+        context = frame_context(user_prompt)
+
+        system_prompt = """
         You are a video effects assistant.
-        Judge the frame selection based on the user's prompt.
-        You returned {frame_name} as frame name based on {context} with this explanation: {explanation}.
-        start your response with 'YES:' or 'NO:' and then explain your reasoning. Be concise.
-        if NO then suggest user to enter a new prompt and give users a summary of the frames from the context.
-        """
+        Select the most appropriate video frame effect for the user's request from the available frame effects.
+        If you cannot find a suitable frame, select 'normal'.
+        Explain why you made this choice and warn users about limitations based on the description of the frame.
+        Do not give any other information about any other topic other than video effects.
+        Then judge your own selection: the verdict starts with 'YES:' or 'NO:' followed by your reasoning.
+        If NO then suggest the user to enter a new prompt and give a summary of the available frames.
+        Be concise.
+        Respond with a JSON object with the keys "frame", "explanation" and "verdict"."""
 
         messages = [
             {"role": "system", "content": system_prompt},
             {
                 "role": "user",
                 "content": f"""
-            User request: {user_prompt}
-            """,
+            Available frame effects: {context}
+            User request: {user_prompt}""",
             },
         ]
 
-        response = chat_client.chat.completions.create(
+        log_token_budget("ai_frame_pipeline", messages, 1000)
+        content = cached_chat_completion(
+            clients.get_chat_client(),
+            semantic_text=user_prompt,
+            embed=get_embeddings,
             model=config.deployment_name,
             messages=messages,
-            temperature=0.3,
+            temperature=0.1,
             max_tokens=1000,
+            response_format={"type": "json_object"},
+            validate=_parse_pipeline_answer,
         )
 
-        evaluation = response.choices[0].message.content.strip()
-        return evaluation
+        result = _parse_pipeline_answer(content)
+        frame_name = str(result.get("frame", "")).strip().lower()
+        if frame_name not in get_catalog().prompt_context.lines:
+            logger.warning(f"LLM selected unknown frame '{frame_name}'")
+            frame_name = "normal"
+        return {
+            "frame": frame_name,
+            "explanation": str(result.get("explanation", "")).strip(),
+            "verdict": str(result.get("verdict", "")).strip(),
+        }
 
     except Exception as e:
-        logger.error(f"Error in LLM frame evaluation: {str(e)}")
+        logger.error(f"Error in combined LLM frame pipeline: {str(e)}")
         raise
 
 
@@ -259,6 +576,7 @@ def explain_frame_selection(
     query_text: str, frame_name: str, similarity_score: float
 ) -> str:
     try:
+        df = get_catalog().df
         frame_description = df[df["frame_name"] == frame_name]["description"].iloc[0]
         explanation = (
             f"Based on your request '{query_text}', I selected the {frame_name} frame. "
@@ -0,0 +1,155 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+import data.embeddings as llm
+
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+PIPELINE_MODES = ("sequential", "combined", "concurrent")
+
+# Number of routed prompts and total seconds spent per routing path
+route_stats = {
+    "embedding": {"count": 0, "seconds": 0.0},
+    "llm": {"count": 0, "seconds": 0.0},
+}
+_route_stats_lock = threading.Lock()
+
+
+@dataclass
+class RouteDecision:
+    """Outcome of route_frame_selection.
+
+    ``path`` is "embedding" when the nearest frame was accepted directly and
+    "llm" when the prompt was ambiguous. ``frame`` is None when the LLM was
+    needed but not called. ``latencies`` holds seconds per step taken."""
+
+    frame: "str | None"
+    path: str
+    score: float
+    margin: float
+    latencies: dict = field(default_factory=dict)
+
+
+def route_frame_selection(user_prompt: str, use_llm: bool = True) -> RouteDecision:
+    """Picks a frame by embedding similarity when the match is clear.
+
+    The top match is accepted when its score reaches
+    ``config.router_min_score`` and it beats the runner-up by at least
+    ``config.router_min_margin``. Otherwise the chat model decides, unless
+    ``use_llm`` is False, in which case the decision is returned without a
+    frame so the caller can make its own LLM call."""
+    config = llm.config
+    index = llm.get_catalog().index
+    start = time.perf_counter()
+    matches = index.top_k(llm.get_embeddings(user_prompt), 2)
+    # An empty catalog matches nothing, which leaves the choice to the LLM
+    score = matches[0][1] if matches else 0.0
+    margin = score - matches[1][1] if len(matches) > 1 else score
+    latencies = {"embedding": time.perf_counter() - start}
+
+    if (
+        matches
+        and score >= config.router_min_score
+        and margin >= config.router_min_margin
+    ):
+        decision = RouteDecision(matches[0][0], "embedding", score, margin, latencies)
+    elif use_llm:
+        start = time.perf_counter()
+        frame_name = llm.ai_frame_selection(user_prompt) or "normal"
+        latencies["llm"] = time.perf_counter() - start
+        decision = RouteDecision(frame_name, "llm", score, margin, latencies)
+    else:
+        decision = RouteDecision(None, "llm", score, margin, latencies)
+
+    with _route_stats_lock:
+        route_stats[decision.path]["count"] += 1
+        route_stats[decision.path]["seconds"] += sum(latencies.values())
+    logger.info(
+        f"Routed prompt via {decision.path} to '{decision.frame or 'caller LLM'}' "
+        f"(score {score:.3f}, margin {margin:.3f}, "
+        + ", ".join(f"{step} {seconds:.3f}s" for step, seconds in latencies.items())
+        + ")"
+    )
+    return decision
+
+
+def select_frame(user_prompt: str) -> str:
+    """Selects a frame only, through the router when it is enabled."""
+    if llm.config.router_enabled:
+        return route_frame_selection(user_prompt).frame
+    return llm.ai_frame_selection(user_prompt) or "normal"
+
+
+def run_frame_pipeline(user_prompt: str, mode: "str | None" = None) -> dict:
+    """Selects a frame for the prompt, explains it and evaluates the choice.
+
+    Modes:
+    - "sequential": selection, explanation and evaluation as three chat calls,
+      each one waiting for the previous.
+    - "combined": one structured JSON completion returns all three.
+    - "concurrent": selection first, then explanation and evaluation run at the
+      same time (the evaluation does not see the explanation).
+
+    With ``config.router_enabled`` the frame is first looked up by embedding
+    similarity (see route_frame_selection) and the LLM only selects it for
+    ambiguous prompts; "combined" then falls back to concurrent explanation and
+    evaluation for clear matches.
+
+    Returns a dict with 'frame', 'explanation' and 'verdict' keys. ``mode``
+    defaults to ``config.pipeline_mode``."""
+    mode = mode or llm.config.pipeline_mode
+    if mode not in PIPELINE_MODES:
+        raise ValueError(
+            f"Unknown pipeline mode '{mode}', expected one of {PIPELINE_MODES}"
+        )
+
+    start = time.perf_counter()
+    frame_name = None
+    if llm.config.router_enabled:
+        # The combined call selects the frame itself, so skip a separate LLM
+        # selection when the embedding match is not clear enough
+        frame_name = route_frame_selection(
+            user_prompt, use_llm=mode != "combined"
+        ).frame
+
+    if mode == "combined" and frame_name is None:
+        llm_start = time.perf_counter()
+        result = llm.ai_frame_pipeline(user_prompt)
+        if llm.config.router_enabled:
+            with _route_stats_lock:
+                route_stats["llm"]["seconds"] += time.perf_counter() - llm_start
+    else:
+        if frame_name is None:
+            frame_name = llm.ai_frame_selection(user_prompt) or "normal"
+        if mode == "sequential":
+            explanation = llm.ai_explanation(frame_name, user_prompt)
+            result = {
+                "frame": frame_name,
+                "explanation": explanation,
+                "verdict": llm.ai_evaluation(frame_name, explanation, user_prompt),
+            }
+        else:
+            # Frame already known: explanation and evaluation run side by side
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                explanation = executor.submit(
+                    llm.ai_explanation, frame_name, user_prompt
+                )
+                verdict = executor.submit(
+                    llm.ai_evaluation, frame_name, None, user_prompt
+                )
+                result = {
+                    "frame": frame_name,
+                    "explanation": explanation.result(),
+                    "verdict": verdict.result(),
+                }
+
+    logger.info(
+        f"Frame pipeline ({mode}) selected '{result['frame']}' "
+        f"in {time.perf_counter() - start:.2f}s"
+    )
+    return result
@@ -0,0 +1,54 @@
+import logging
+
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about four characters per token for English text)."""
+    return len(text) // 4 + 1
+
+
+def estimate_message_tokens(messages: list[dict]) -> int:
+    """Rough prompt size of a chat request, including a few tokens of
+    per-message overhead."""
+    return sum(estimate_tokens(m["content"]) + 4 for m in messages)
+
+
+def log_token_budget(name: str, messages: list[dict], max_tokens: int) -> int:
+    """Logs the estimated prompt size and completion limit of a chat call and
+    returns the prompt estimate."""
+    prompt_tokens = estimate_message_tokens(messages)
+    logger.info(
+        f"{name}: ~{prompt_tokens} prompt tokens, up to {max_tokens} completion tokens"
+    )
+    return prompt_tokens
+
+
+class PromptContext:
+    """The frame catalog rendered for chat prompts.
+
+    Only the frame name and description are included; embedding vectors mean
+    nothing to the chat model and would dominate the prompt. Lines and the
+    full listing are rendered once when the catalog is loaded."""
+
+    def __init__(self, frame_names: list[str], descriptions: list[str]):
+        self.lines = {
+            name: f"{name}: {description}"
+            for name, description in zip(frame_names, descriptions)
+        }
+        self.full = "\n".join(self.lines.values())
+        self.full_tokens = estimate_tokens(self.full)
+
+    def render(self, frame_names: "list[str] | None" = None) -> str:
+        """Returns the listing for ``frame_names`` (in that order), or for the
+        whole catalog when no names are given. Unknown names are skipped."""
+        if frame_names is None:
+            return self.full
+        return "\n".join(
+            self.lines[name]
+            for name in dict.fromkeys(frame_names)
+            if name in self.lines
+        )
@@ -0,0 +1,57 @@
+import numpy as np
+
+
+def normalize_rows(matrix) -> np.ndarray:
+    """Returns a C-contiguous float32 copy of ``matrix`` with unit-length rows.
+    All-zero rows stay zero instead of turning into NaNs."""
+    matrix = np.array(matrix, dtype=np.float32, ndmin=2, order="C")
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    np.maximum(norms, np.finfo(np.float32).tiny, out=norms)
+    matrix /= norms
+    return matrix
+
+
+class ExactIndex:
+    """Brute-force cosine similarity search over a fixed set of labelled
+    vectors.
+
+    Vectors are L2-normalized once when the index is built, so a query only
+    costs one matrix-vector product (one matrix-matrix product for a batch of
+    queries) plus a partial sort of the scores."""
+
+    def __init__(self, labels: list[str], matrix):
+        self.labels = list(labels)
+        self.matrix = normalize_rows(matrix)
+        if self.matrix.shape[0] != len(self.labels):
+            raise ValueError(
+                f"Got {len(self.labels)} labels for {self.matrix.shape[0]} vectors"
+            )
+
+    def __len__(self) -> int:
+        return len(self.labels)
+
+    @property
+    def dimension(self) -> int:
+        return int(self.matrix.shape[1])
+
+    def top_k(self, query, k: int = 1) -> list[tuple[str, float]]:
+        """Returns the ``k`` most similar labels with their cosine similarity,
+        best match first."""
+        return self.top_k_many([query], k)[0]
+
+    def top_k_many(self, queries, k: int = 1) -> list[list[tuple[str, float]]]:
+        """Runs top_k for a batch of queries with a single matrix product.
+        An empty index matches nothing."""
+        if not self.labels:
+            return [[] for _ in queries]
+        scores = normalize_rows(queries) @ self.matrix.T
+        return [self._best(row, k) for row in scores]
+
+    def _best(self, scores: np.ndarray, k: int) -> list[tuple[str, float]]:
+        k = min(k, len(scores))
+        if k < len(scores):
+            candidates = np.argpartition(-scores, k - 1)[:k]
+        else:
+            candidates = np.arange(len(scores))
+        order = candidates[np.argsort(-scores[candidates], kind="stable")]
+        return [(self.labels[i], float(scores[i])) for i in order]
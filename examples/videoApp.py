@@ -6,7 +6,6 @@ import logging
 import sys
 from pathlib import Path
 import streamlit as st
-from openai import AzureOpenAI
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
@@ -31,6 +30,7 @@ sys.path.insert(0, str(root_dir))
 
 try:
     import config
+    from ai import clients
 
     config_instance = config.Config()
     logger.info("Config loaded successfully!")
@@ -44,9 +44,7 @@ except Exception as e:
 
 config = config.Config()
 
-# Initialize OpenAI API
-AZURE_OPENAI_ENDPOINT = config.api_base
-AZURE_OPENAI_KEY = config.api_key
+# The shared clients in ai.clients read the endpoint and key from config
 API_TYPE = config.api_type
 API_VERSION = config.api_version
 
@@ -74,11 +72,7 @@ def apply_default_effect(frame):
 
 # Interpret the user's prompt using OpenAI
 def interpret_prompt(prompt):
-    client = AzureOpenAI(
-        azure_endpoint=AZURE_OPENAI_ENDPOINT,
-        api_key=AZURE_OPENAI_KEY,
-        api_version=API_VERSION,
-    )
+    client = clients.get_chat_client()
 
     # Describe available effects with their descriptions
     effect_descriptions = {
@@ -1,11 +1,5 @@
 import cv2
-from video.videoEffects import (
-    apply_grayscale_effect,
-    apply_water_color_effect,
-    apply_heat_map_effect,
-    apply_default_effect,
-    apply_object_detection_theme,
-)
+from video.effects import effects
 import time
 
 
@@ -13,16 +7,8 @@ def main():
     # Initialize webcam
     cap = cv2.VideoCapture(0)
 
-    # Dictionary of effects and their corresponding functions
-    effects = {
-        "normal": apply_default_effect,
-        "grayscale": apply_grayscale_effect,
-        "water_color": apply_water_color_effect,
-        "heat_map": apply_heat_map_effect,
-        "object_detection": apply_object_detection_theme,
-        "ocr": apply_default_effect,
-        # Add more effects here as you create them
-    }
+    # Every registered effect, see video/effects.py to add more
+    available = effects()
 
     current_effect = "normal"
 
@@ -38,10 +24,7 @@ def main():
             break
 
         # Apply current effect
-        if current_effect == "object_detection":
-            processed_frame, _ = effects[current_effect](frame)  # Unpack only the frame
-        else:
-            processed_frame = effects[current_effect](frame)
+        processed_frame = available[current_effect](frame).frame
 
         # Display effect name on frame
         cv2.putText(
@@ -65,7 +48,7 @@ def main():
             break
         elif key == ord("n"):
             # Cycle through effects
-            effect_list = list(effects.keys())
+            effect_list = list(available)
             current_index = effect_list.index(current_effect)
             current_effect = effect_list[(current_index + 1) % len(effect_list)]
             print(f"Switching to effect: {current_effect}")
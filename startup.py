@@ -0,0 +1,65 @@
+"""Load-time bookkeeping for the lazily initialized parts of the app.
+
+data.embeddings and video.videoEffects load their heavy state (frame catalog,
+embeddings, API clients, detector weights) on first use. Each load is timed
+here, and warmup() loads everything up front for callers that would rather
+pay at boot than on the first request. Run ``python -m startup`` for a
+startup-time report."""
+
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+# Seconds spent loading each component, in load order
+startup_times: dict[str, float] = {}
+_startup_times_lock = threading.Lock()
+
+
+@contextmanager
+def timed_load(name: str):
+    """Records how long the enclosed load of ``name`` takes."""
+    start = time.perf_counter()
+    yield
+    seconds = time.perf_counter() - start
+    with _startup_times_lock:
+        startup_times[name] = seconds
+    logger.info(f"Loaded {name} in {seconds:.2f}s")
+
+
+def report() -> str:
+    """Startup-time report of everything loaded so far."""
+    with _startup_times_lock:
+        times = dict(startup_times)
+    if not times:
+        return "Nothing loaded yet"
+    width = max(len(name) for name in times)
+    lines = [f"{name:<{width}}  {seconds:8.3f}s" for name, seconds in times.items()]
+    lines.append(f"{'total':<{width}}  {sum(times.values()):8.3f}s")
+    return "\n".join(lines)
+
+
+def warmup(embeddings: bool = True, detector: bool = True) -> dict[str, float]:
+    """Loads the frame catalog and API clients and/or the object detector now
+    instead of on first use. Returns the load times recorded so far."""
+    if embeddings:
+        import data.embeddings
+
+        data.embeddings.warmup()
+    if detector:
+        import video.videoEffects
+
+        video.videoEffects.warmup()
+    logger.info(f"Startup times:\n{report()}")
+    with _startup_times_lock:
+        return dict(startup_times)
+
+
+if __name__ == "__main__":
+    warmup()
+    print(report())
@@ -0,0 +1,94 @@
+import numpy as np
+import pytest
+import data.embeddings as llm
+from data.ann_index import IVFIndex
+from data.embedding_store import load_index
+from data.search_index import ExactIndex
+
+
+@pytest.fixture(scope="module")
+def catalog():
+    rng = np.random.default_rng(0)
+    topics = rng.normal(size=(20, 8))
+    latent = topics[rng.integers(20, size=2000)] + rng.normal(size=(2000, 8))
+    matrix = latent @ rng.normal(size=(8, 64))
+    return [f"entry_{i}" for i in range(len(matrix))], matrix
+
+
+def labels_of(results):
+    return [label for label, _ in results]
+
+
+def test_full_probe_matches_exact_search(catalog):
+    """Test that probing every list degenerates to exact search"""
+    labels, matrix = catalog
+    ivf = IVFIndex.build(labels, matrix, n_lists=16)
+    ivf.n_probe = ivf.n_lists
+    exact = ExactIndex(labels, matrix)
+    for query in matrix[:20]:
+        assert labels_of(ivf.top_k(query, 5)) == labels_of(exact.top_k(query, 5))
+
+
+def test_recall_against_exact_search(catalog):
+    labels, matrix = catalog
+    ivf = IVFIndex.build(labels, matrix, n_lists=32, n_probe=8)
+    exact = ExactIndex(labels, matrix)
+    queries = matrix[::50] + np.random.default_rng(1).normal(size=(40, 64))
+
+    hits = sum(
+        len(set(labels_of(a)) & set(labels_of(e)))
+        for a, e in zip(ivf.top_k_many(queries, 10), exact.top_k_many(queries, 10))
+    )
+    assert hits / (len(queries) * 10) > 0.8
+
+
+def test_incremental_insert(catalog):
+    labels, matrix = catalog
+    ivf = IVFIndex.build(labels[:1000], matrix[:1000], n_lists=16)
+    ivf.add(labels[1000:], matrix[1000:])
+    assert len(ivf) == 2000
+    assert ivf.top_k(matrix[1500], 1)[0][0] == "entry_1500"
+
+
+def test_save_and_load(tmp_path, catalog):
+    labels, matrix = catalog
+    ivf = IVFIndex.build(labels, matrix, n_lists=16, n_probe=4)
+    path = str(tmp_path / "index.npz")
+    ivf.save(path)
+
+    loaded = IVFIndex.load(path)
+    assert loaded.n_probe == 4
+    assert loaded.labels == ivf.labels
+    queries = matrix[:10]
+    assert [labels_of(r) for r in loaded.top_k_many(queries, 3)] == [
+        labels_of(r) for r in ivf.top_k_many(queries, 3)
+    ]
+
+
+def test_saved_index_is_reused_until_the_key_changes(tmp_path, monkeypatch, catalog):
+    """Test that build_index runs k-means once per catalog content"""
+    labels, matrix = catalog
+    (tmp_path / "data").mkdir()
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(llm.config, "ann_min_catalog_size", 100)
+    builds = []
+    build = IVFIndex.build
+
+    def counting_build(*args, **kwargs):
+        builds.append(1)
+        return build(*args, **kwargs)
+
+    monkeypatch.setattr(IVFIndex, "build", counting_build)
+
+    first = llm.build_index(labels, matrix, "content-a")
+    again = llm.build_index(labels, matrix, "content-a")
+    assert len(builds) == 1
+    assert again.key == "content-a" and again.labels == first.labels
+    assert labels_of(again.top_k(matrix[7], 3)) == labels_of(first.top_k(matrix[7], 3))
+
+    llm.build_index(labels, matrix, "content-b")
+    assert len(builds) == 2
+    # Without a key nothing is read or written
+    llm.build_index(labels, matrix)
+    assert len(builds) == 3
+    assert load_index("content-b", str(tmp_path / "data" / "frame_index.npz"))
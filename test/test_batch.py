@@ -0,0 +1,74 @@
+import json
+import cv2
+import numpy as np
+import pytest
+import video.videoEffects as fxs
+from video.batch import ImageDirectory, process_frames, run
+
+
+def frames(count=4):
+    rng = np.random.default_rng(0)
+    return [rng.integers(0, 256, (48, 64, 3), dtype=np.uint8) for _ in range(count)]
+
+
+@pytest.fixture
+def clip(tmp_path):
+    path = str(tmp_path / "clip.avi")
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), 10, (64, 48))
+    for frame in frames():
+        writer.write(frame)
+    writer.release()
+    return path
+
+
+def read_video(path):
+    capture = cv2.VideoCapture(path)
+    count = 0
+    while capture.read()[0]:
+        count += 1
+    capture.release()
+    return count
+
+
+def test_video_to_video_and_detections(monkeypatch, tmp_path, clip):
+    monkeypatch.setattr(
+        fxs, "detect_objects", lambda frame: [("cup", np.float32(0.9), (1, 2, 3, 4))]
+    )
+    output = str(tmp_path / "out.mp4")
+    detections = str(tmp_path / "out.jsonl")
+    stats = run(clip, ("grayscale", "object_detection"), output, detections)
+    assert stats["frames"] == 4 and stats["source_fps"] == 10
+    assert read_video(output) == 4
+    with open(detections) as f:
+        records = [json.loads(line) for line in f]
+    assert [r["frame"] for r in records] == [0, 1, 2, 3]
+    assert records[0]["detections"] == [
+        {"label": "cup", "confidence": 0.9, "box": [1, 2, 3, 4]}
+    ]
+
+
+def test_image_directory_in_name_order(tmp_path):
+    for i, frame in enumerate(frames(3)):
+        cv2.imwrite(str(tmp_path / f"{i:03d}.png"), frame)
+    (tmp_path / "notes.txt").write_text("not an image")
+    source = ImageDirectory(str(tmp_path))
+    assert [p[-7:] for p in source.paths] == ["000.png", "001.png", "002.png"]
+    output = str(tmp_path / "out.mp4")
+    assert run(str(tmp_path), ("heat_map",), output, max_frames=2)["frames"] == 2
+    assert read_video(output) == 2
+
+
+def test_workers_match_in_process():
+    chain = ("grayscale", "heat_map")
+    local = list(process_frames(iter(frames()), chain))
+    pooled = list(process_frames(iter(frames()), chain, workers=2))
+    assert len(pooled) == 4
+    for a, b in zip(local, pooled):
+        np.testing.assert_array_equal(a.frame, b.frame)
+
+
+def test_rejects_unknown_effects(clip):
+    with pytest.raises(ValueError):
+        run(clip, ("van_gogh",))
+    with pytest.raises(ValueError):
+        run("no/such/clip.mp4", ("normal",))
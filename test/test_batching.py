@@ -0,0 +1,102 @@
+import threading
+import time
+import numpy as np
+import pytest
+from video.batching import InferenceBatcher
+
+
+class FakeDetector:
+    """Returns the frame's fill value as its detection, so every stream can
+    check it got its own result back."""
+
+    def __init__(self):
+        self.batch_sizes = []
+        self.release = threading.Event()
+        self.release.set()
+
+    def detect_batch(self, frames):
+        self.release.wait(5)
+        self.batch_sizes.append(len(frames))
+        return [[("value", float(frame[0, 0, 0]), (0, 0, 1, 1))] for frame in frames]
+
+
+def frame(value):
+    return np.full((4, 4, 3), value, dtype=np.uint8)
+
+
+def test_frames_from_concurrent_streams_share_a_batch():
+    detector = FakeDetector()
+    # The batch is sent once every stream has a frame in it, before the
+    # deadline
+    batcher = InferenceBatcher(detector, max_batch=8, max_latency=0.5)
+    results = {}
+    # The first frames make the streams known to the batcher
+    warmed_up = threading.Barrier(6)
+
+    def stream(value):
+        batcher.detect(frame(value))
+        warmed_up.wait(5)
+        results[value] = batcher.detect(frame(value))
+
+    threads = [threading.Thread(target=stream, args=(value,)) for value in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+
+    assert {value: r[0][1] for value, r in results.items()} == {
+        value: float(value) for value in range(6)
+    }
+    assert detector.batch_sizes[-1] == 6
+    assert sum(detector.batch_sizes) == 12
+    batcher.close()
+
+
+def test_batch_size_is_capped():
+    detector = FakeDetector()
+    detector.release.clear()
+    batcher = InferenceBatcher(detector, max_batch=2, max_latency=0.05)
+    futures = [batcher.submit(frame(value)) for value in range(5)]
+    detector.release.set()
+    for future in futures:
+        future.result()
+    assert max(detector.batch_sizes) <= 2
+    assert sum(detector.batch_sizes) == 5
+    batcher.close()
+
+
+def test_lone_stream_does_not_wait_for_a_batch():
+    detector = FakeDetector()
+    batcher = InferenceBatcher(detector, max_batch=8, max_latency=5.0)
+    start = time.perf_counter()
+    for value in range(3):
+        assert batcher.detect(frame(value))[0][1] == float(value)
+    assert time.perf_counter() - start < 1.0
+    assert detector.batch_sizes == [1, 1, 1]
+    batcher.close()
+
+
+def test_idle_callers_are_not_waited_for():
+    detector = FakeDetector()
+    batcher = InferenceBatcher(detector, max_batch=8, max_latency=5.0, idle=0.05)
+    other = threading.Thread(target=batcher.detect, args=(frame(1),))
+    other.start()
+    other.join(5)
+    time.sleep(0.1)
+    start = time.perf_counter()
+    batcher.detect(frame(2))
+    assert time.perf_counter() - start < 1.0
+    batcher.close()
+
+
+def test_errors_reach_every_stream_in_the_batch():
+    class BrokenDetector:
+        def detect_batch(self, frames):
+            raise ValueError("bad blob")
+
+    batcher = InferenceBatcher(BrokenDetector(), max_latency=0.01)
+    with pytest.raises(ValueError, match="bad blob"):
+        batcher.detect(frame(1))
+    batcher.close()
+    with pytest.raises(RuntimeError):
+        batcher.submit(frame(1))
@@ -0,0 +1,114 @@
+import tracemalloc
+import numpy as np
+import pytest
+import video.videoEffects as fxs
+from video.buffers import BufferPool
+from video.effects import get_effect
+
+CHEAP = ["normal", "grayscale", "heat_map", "ocr"]
+
+
+@pytest.fixture
+def frame():
+    return np.random.default_rng(0).integers(0, 256, (48, 64, 3), dtype=np.uint8)
+
+
+def test_pool_reuses_only_released_buffers():
+    pool = BufferPool()
+    first = pool.acquire("out", (4, 4, 3))
+    second = pool.acquire("out", (4, 4, 3))
+    assert first is not second
+    assert pool.in_use == 2
+    pool.release(first)
+    assert pool.acquire("out", (4, 4, 3)) is first
+    assert pool.acquire("out", (4, 4, 3)) is not second
+    assert pool.allocations == 3
+
+
+def test_pool_ignores_foreign_and_repeated_releases():
+    pool = BufferPool()
+    buffer = pool.acquire("out", (4, 4, 3))
+    pool.release(np.empty((4, 4, 3), dtype=np.uint8))
+    pool.release(None)
+    pool.release(buffer)
+    pool.release(buffer)
+    assert pool.acquire("out", (4, 4, 3)) is buffer
+    assert pool.acquire("out", (4, 4, 3)) is not buffer
+
+
+def test_pool_keeps_a_bounded_number_of_free_buffers():
+    pool = BufferPool(keep=1)
+    buffers = [pool.acquire("out", (4, 4, 3)) for _ in range(3)]
+    for buffer in buffers:
+        pool.release(buffer)
+    assert pool.in_use == 0
+    assert pool.acquire("out", (4, 4, 3)) is buffers[0]
+    assert pool.acquire("out", (4, 4, 3)) is not buffers[1]
+
+
+def test_pool_forgets_buffers_that_are_never_released():
+    pool = BufferPool()
+    pool.acquire("out", (4, 4, 3))
+    assert pool.in_use == 0
+
+
+def test_pool_reallocates_on_size_change():
+    pool = BufferPool(keep=1)
+    small = pool.acquire("out", (4, 4, 3))
+    pool.release(small)
+    large = pool.acquire("out", (8, 8, 3))
+    assert large.shape == (8, 8, 3) and large is not small
+    pool.release(large)
+    assert pool.acquire("other", (4, 4, 3)) is not large
+    assert pool.allocations == 3
+
+
+@pytest.mark.parametrize("name", ["grayscale", "heat_map", "water_color"])
+def test_effects_write_into_dst(name, frame):
+    dst = np.empty_like(frame)
+    out = get_effect(name)(frame, dst=dst).frame
+    assert np.shares_memory(out, dst)
+    np.testing.assert_array_equal(out, get_effect(name)(frame).frame)
+
+
+@pytest.mark.parametrize("name", CHEAP + ["water_color"])
+def test_rgb_is_fused_into_the_effect(name, frame):
+    bgr = get_effect(name)(frame).frame
+    rgb = get_effect(name)(frame, dst=np.empty_like(frame), rgb=True).frame
+    np.testing.assert_array_equal(rgb, bgr[..., ::-1])
+
+
+def test_object_detection_rgb(frame, monkeypatch):
+    monkeypatch.setattr(fxs, "detect_objects", lambda frame: [])
+    dst = np.empty_like(frame)
+    out, _ = get_effect("object_detection")(frame, dst=dst, rgb=True)
+    assert np.shares_memory(out, dst)
+    np.testing.assert_array_equal(out, frame[..., ::-1])
+
+
+@pytest.mark.parametrize("name", CHEAP + ["water_color", "object_detection"])
+def test_steady_state_allocates_no_frames(name, frame, monkeypatch):
+    monkeypatch.setattr(fxs, "detect_objects", lambda frame: [])
+    effect = get_effect(name)
+    pool = BufferPool()
+
+    def render():
+        dst = pool.acquire("out", frame.shape)
+        # Scaled effects take their downscaled frames from the pool too
+        effect(frame, dst=dst, rgb=True, scale=0.5, pool=pool)
+        pool.release(dst)
+
+    render()
+
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        for _ in range(5):
+            render()
+        allocated = tracemalloc.get_traced_memory()[1] - before
+    finally:
+        tracemalloc.stop()
+    assert allocated < frame.nbytes
+    scratch = {"image": 2, "boxes": 1}.get(effect.scale_mode, 0)
+    assert pool.allocations == 1 + scratch
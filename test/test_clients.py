@@ -0,0 +1,116 @@
+import types
+import pytest
+import ai.clients as clients
+from ai.clients import backoff_delay, call_with_retry, is_retryable, retry_after
+
+
+class FakeAPIError(Exception):
+    def __init__(self, status_code, headers=None):
+        super().__init__(f"status {status_code}")
+        self.status_code = status_code
+        self.response = types.SimpleNamespace(headers=headers or {})
+
+
+@pytest.fixture(autouse=True)
+def no_sleep(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(clients.time, "sleep", sleeps.append)
+    return sleeps
+
+
+def test_is_retryable():
+    assert is_retryable(FakeAPIError(429))
+    assert is_retryable(FakeAPIError(503))
+    assert not is_retryable(FakeAPIError(400))
+    assert not is_retryable(ValueError("bad request"))
+
+
+def test_retry_after_headers():
+    assert retry_after(FakeAPIError(429, {"retry-after-ms": "250"})) == 0.25
+    assert retry_after(FakeAPIError(429, {"retry-after": "3"})) == 3.0
+    assert retry_after(FakeAPIError(429, {"retry-after": "soon"})) is None
+    assert retry_after(FakeAPIError(429)) is None
+
+
+def test_backoff_delay_prefers_retry_after_and_is_capped():
+    config = clients.get_config()
+    assert backoff_delay(FakeAPIError(429, {"retry-after": "2"}), 5) == 2.0
+    assert backoff_delay(FakeAPIError(429, {"retry-after": "9999"}), 0) == (
+        config.client_retry_max_delay
+    )
+    delay = backoff_delay(FakeAPIError(503), 2)
+    assert (
+        config.client_retry_base_delay * 2
+        <= delay
+        <= (config.client_retry_base_delay * 4)
+    )
+
+
+def test_call_with_retry_retries_then_succeeds(no_sleep):
+    calls = []
+
+    def create(**request):
+        calls.append(request)
+        if len(calls) < 3:
+            raise FakeAPIError(429, {"retry-after": "1"})
+        return "ok"
+
+    assert call_with_retry(create, model="gpt-4o", messages=[]) == "ok"
+    assert len(calls) == 3
+    assert no_sleep == [1.0, 1.0]
+
+
+def test_call_with_retry_gives_up(no_sleep):
+    def create(**request):
+        raise FakeAPIError(500)
+
+    with pytest.raises(FakeAPIError):
+        call_with_retry(create, model="gpt-4o")
+    assert len(no_sleep) == clients.get_config().client_max_retries
+
+    def bad_request(**request):
+        raise FakeAPIError(400)
+
+    no_sleep.clear()
+    with pytest.raises(FakeAPIError):
+        call_with_retry(bad_request, model="gpt-4o")
+    assert no_sleep == []
+
+
+def test_stream_holds_the_semaphore_until_it_is_read(monkeypatch):
+    semaphore = clients.threading.BoundedSemaphore(1)
+    monkeypatch.setattr(clients, "_semaphore", lambda deployment: semaphore)
+
+    stream = call_with_retry(lambda **request: iter(["a", "b"]), stream=True)
+    assert not semaphore.acquire(blocking=False)
+    assert list(stream) == ["a", "b"]
+    assert semaphore.acquire(blocking=False)
+    semaphore.release()
+
+
+def test_closed_or_failed_stream_gives_the_semaphore_back(monkeypatch):
+    semaphore = clients.threading.BoundedSemaphore(1)
+    monkeypatch.setattr(clients, "_semaphore", lambda deployment: semaphore)
+
+    class Stream:
+        closed = False
+
+        def __iter__(self):
+            yield "a"
+
+        def close(self):
+            self.closed = True
+
+    raw = Stream()
+    with call_with_retry(lambda **request: raw, stream=True):
+        assert not semaphore.acquire(blocking=False)
+    assert raw.closed and semaphore.acquire(blocking=False)
+    semaphore.release()
+
+    def bad_request(**request):
+        raise FakeAPIError(400)
+
+    with pytest.raises(FakeAPIError):
+        call_with_retry(bad_request, stream=True)
+    assert semaphore.acquire(blocking=False)
+    semaphore.release()
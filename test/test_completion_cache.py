@@ -0,0 +1,241 @@
+import types
+import pytest
+import ai.completion_cache as completion_cache
+from ai.completion_cache import (
+    CompletionCache,
+    cached_chat_completion,
+    cached_chat_completion_stream,
+)
+
+
+def make_request(prompt, temperature=0.1):
+    return {
+        "model": "gpt-4o",
+        "messages": [
+            {"role": "system", "content": "You are a video effects assistant."},
+            {"role": "user", "content": f"User request: {prompt}"},
+        ],
+        "temperature": temperature,
+        "max_tokens": 1000,
+    }
+
+
+# Stand-in embeddings: prompts sharing a "topic" word are near-duplicates
+EMBEDDINGS = {
+    "make it black and white": [1.0, 0.0, 0.0],
+    "make it black & white": [0.99, 0.05, 0.0],
+    "make it look painted": [0.0, 1.0, 0.0],
+}
+
+
+def embed(text):
+    return EMBEDDINGS[text]
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return CompletionCache(str(tmp_path / "completions.sqlite3"))
+
+
+def test_exact_hit(cache):
+    request = make_request("make it black and white")
+    assert cache.get(request) is None
+    cache.put(request, "grayscale")
+    assert cache.get(request) == "grayscale"
+    assert cache.get({**request, "max_tokens": 10}) is None
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+def test_semantic_hit_for_near_duplicate_prompt(cache):
+    """Test that a near-duplicate prompt reuses the cached answer"""
+    cache.put(
+        make_request("make it black and white"),
+        "grayscale",
+        "make it black and white",
+        embed,
+    )
+    assert (
+        cache.get(make_request("make it black & white"), "make it black & white", embed)
+        == "grayscale"
+    )
+    assert (
+        cache.get(make_request("make it look painted"), "make it look painted", embed)
+        is None
+    )
+    assert cache.semantic_hits == 1
+
+
+def test_semantic_hit_requires_same_scope(cache):
+    cache.put(
+        make_request("make it black and white"),
+        "grayscale",
+        "make it black and white",
+        embed,
+    )
+    other_scope = make_request("make it black & white")
+    other_scope["messages"][0]["content"] = "You are a storyteller."
+    assert cache.get(other_scope, "make it black & white", embed) is None
+
+
+def test_ttl_and_size_eviction(tmp_path):
+    cache = CompletionCache(str(tmp_path / "c.sqlite3"), max_entries=1)
+    cache.put(make_request("a"), "first")
+    cache.put(make_request("b"), "second")
+    assert cache.get(make_request("a")) is None
+    assert cache.get(make_request("b")) == "second"
+
+    cache = CompletionCache(str(tmp_path / "ttl.sqlite3"), ttl_seconds=0)
+    cache.put(make_request("a"), "first")
+    assert cache.get(make_request("a")) is None
+
+
+def use_cache(monkeypatch, cache):
+    """Makes ``cache`` the process-wide completion cache."""
+    monkeypatch.setattr(completion_cache, "_cache", cache)
+    monkeypatch.setattr(completion_cache, "_cache_configured", True)
+
+
+class FakeClient:
+    def __init__(self, finish_reason="stop", content="answer {calls}"):
+        self.calls = 0
+        self.finish_reason = finish_reason
+        self.content = content
+        self.chat = types.SimpleNamespace(completions=self)
+
+    def create(self, **request):
+        self.calls += 1
+        message = types.SimpleNamespace(content=self.content.format(calls=self.calls))
+        choice = types.SimpleNamespace(
+            message=message, finish_reason=self.finish_reason
+        )
+        return types.SimpleNamespace(choices=[choice])
+
+
+def test_cached_chat_completion_skips_high_temperature(cache, monkeypatch):
+    use_cache(monkeypatch, cache)
+    client = FakeClient()
+
+    request = make_request("make it black and white")
+    assert cached_chat_completion(client, **request) == "answer 1"
+    assert cached_chat_completion(client, **request) == "answer 1"
+    assert client.calls == 1
+
+    hot = make_request("make it black and white", temperature=0.9)
+    assert cached_chat_completion(client, **hot) == "answer 2"
+    assert cached_chat_completion(client, **hot) == "answer 3"
+
+
+class FakeStreamClient:
+    def __init__(self, pieces, finish_reason="stop"):
+        self.pieces = pieces
+        self.finish_reason = finish_reason
+        self.calls = 0
+        self.chat = types.SimpleNamespace(completions=self)
+
+    def create(self, stream=False, **request):
+        assert stream
+        self.calls += 1
+        yield types.SimpleNamespace(choices=[])
+        for piece in self.pieces:
+            delta = types.SimpleNamespace(content=piece)
+            choice = types.SimpleNamespace(delta=delta, finish_reason=None)
+            yield types.SimpleNamespace(choices=[choice])
+        # The last chunk carries the finish reason and no content
+        delta = types.SimpleNamespace(content=None)
+        choice = types.SimpleNamespace(delta=delta, finish_reason=self.finish_reason)
+        yield types.SimpleNamespace(choices=[choice])
+
+
+def test_stream_yields_pieces_then_serves_from_cache(cache, monkeypatch):
+    use_cache(monkeypatch, cache)
+    client = FakeStreamClient(["YES:", " looks", " good"])
+    request = make_request("make it black and white")
+
+    assert list(cached_chat_completion_stream(client, **request)) == [
+        "YES:",
+        " looks",
+        " good",
+    ]
+    assert list(cached_chat_completion_stream(client, **request)) == ["YES: looks good"]
+    assert cached_chat_completion(client, **request) == "YES: looks good"
+    assert client.calls == 1
+
+
+def test_abandoned_stream_is_not_cached(cache, monkeypatch):
+    use_cache(monkeypatch, cache)
+    client = FakeStreamClient(["partial", " answer"])
+    request = make_request("make it black and white")
+
+    stream = cached_chat_completion_stream(client, **request)
+    next(stream)
+    stream.close()
+    assert cache.get(request) is None
+
+
+def test_invalid_completions_are_not_cached(cache, monkeypatch):
+    use_cache(monkeypatch, cache)
+    client = FakeClient()
+    request = make_request("make it black and white")
+
+    def validate(content):
+        if content == "answer 1":
+            raise ValueError("not an answer")
+
+    assert cached_chat_completion(client, validate=validate, **request) == "answer 1"
+    assert cache.get(request) is None
+    assert cached_chat_completion(client, validate=validate, **request) == "answer 2"
+    assert cached_chat_completion(client, validate=validate, **request) == "answer 2"
+    assert client.calls == 2
+
+
+def test_invalid_cached_completion_is_requested_again(cache, monkeypatch):
+    use_cache(monkeypatch, cache)
+    client = FakeClient()
+    request = make_request("make it black and white")
+    cache.put(request, "garbage")
+
+    def validate(content):
+        if content == "garbage":
+            raise ValueError("not an answer")
+
+    assert cached_chat_completion(client, validate=validate, **request) == "answer 1"
+    assert cache.get(request) == "answer 1"
+
+
+@pytest.mark.parametrize(
+    "finish_reason, content",
+    [("length", "answer {calls}"), ("content_filter", ""), ("stop", "  ")],
+)
+def test_incomplete_completions_are_not_cached(
+    cache, monkeypatch, finish_reason, content
+):
+    use_cache(monkeypatch, cache)
+    client = FakeClient(finish_reason, content)
+    request = make_request("make it black and white")
+    cached_chat_completion(client, **request)
+    cached_chat_completion(client, **request)
+    assert client.calls == 2
+    assert cache.get(request) is None
+
+
+def test_truncated_stream_is_not_cached(cache, monkeypatch):
+    use_cache(monkeypatch, cache)
+    client = FakeStreamClient(["YES:", " looks"], finish_reason="length")
+    request = make_request("make it black and white")
+    assert list(cached_chat_completion_stream(client, **request)) == ["YES:", " looks"]
+    assert cache.get(request) is None
+
+
+def test_disabled_cache_reads_the_config_once(monkeypatch):
+    reads = []
+
+    def config():
+        reads.append(1)
+        return types.SimpleNamespace(completion_cache_path="")
+
+    monkeypatch.setattr(completion_cache, "Config", config)
+    monkeypatch.setattr(completion_cache, "_cache", None)
+    monkeypatch.setattr(completion_cache, "_cache_configured", False)
+    assert completion_cache.get_completion_cache() is None
+    assert completion_cache.get_completion_cache() is None
+    assert len(reads) == 1
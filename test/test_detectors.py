@@ -0,0 +1,258 @@
+import os
+import cv2
+import numpy as np
+import pytest
+from config import DEFAULT_DETECTORS
+from video import detectors
+from video.detectors import Detector, DetectorSpec
+
+CLASSES = ["person", "dog", "cat"]
+INPUT_SIZE = (320, 320)
+
+# Two overlapping dogs, one cat and a row below every threshold, as
+# fractions of the frame: (class_id, confidence, (cx, cy, w, h))
+OBJECTS = [
+    (1, 0.9, (0.5, 0.5, 0.25, 0.5)),
+    (1, 0.8, (0.5 + 1 / 64, 0.5, 0.25, 0.5)),
+    (2, 0.7, (0.25, 0.25, 0.125, 0.25)),
+    (0, 0.2, (0.75, 0.75, 0.125, 0.125)),
+]
+
+
+def expected_detections(width, height):
+    return [
+        (
+            "dog",
+            pytest.approx(0.9),
+            (width * 3 // 8, height // 4, width // 4, height // 2),
+        ),
+        (
+            "cat",
+            pytest.approx(0.7),
+            (width * 3 // 16, height // 8, width // 8, height // 4),
+        ),
+    ]
+
+
+def yolo_rows(pixels: bool, objectness: bool) -> np.ndarray:
+    rows = np.zeros((len(OBJECTS), 4 + objectness + len(CLASSES)), dtype=np.float32)
+    for row, (class_id, confidence, box) in zip(rows, OBJECTS):
+        row[:4] = box
+        if pixels:
+            row[[0, 2]] *= INPUT_SIZE[0]
+            row[[1, 3]] *= INPUT_SIZE[1]
+        if objectness:
+            row[4] = 1.0
+        row[4 + objectness + class_id] = confidence
+    return rows
+
+
+def ssd_rows() -> np.ndarray:
+    rows = []
+    for class_id, confidence, (cx, cy, w, h) in OBJECTS:
+        rows.append(
+            [0, class_id, confidence, cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2]
+        )
+    return np.array(rows, dtype=np.float32)
+
+
+OUTPUTS = {
+    "yolo": lambda: yolo_rows(pixels=False, objectness=True)[None],
+    "yolov5": lambda: yolo_rows(pixels=True, objectness=True)[None],
+    "yolov8": lambda: yolo_rows(pixels=True, objectness=False).T[None],
+    "ssd": lambda: ssd_rows()[None, None],
+}
+
+
+def constant_model(path, output: np.ndarray) -> str:
+    """An ONNX network that ignores its input and outputs ``output`` for
+    every image in the batch, so decoding can be checked against known
+    boxes."""
+    onnx = pytest.importorskip("onnx")
+    from onnx import TensorProto, helper, numpy_helper
+
+    width, height = INPUT_SIZE
+    graph = helper.make_graph(
+        [
+            helper.make_node(
+                "ReduceMean", ["images"], ["mean"], axes=[1, 2, 3], keepdims=1
+            ),
+            helper.make_node("Mul", ["mean", "zero"], ["nothing"]),
+            helper.make_node("Reshape", ["nothing", "shape"], ["flat"]),
+            helper.make_node("Add", ["flat", "prediction"], ["output"]),
+        ],
+        "constant",
+        [
+            helper.make_tensor_value_info(
+                "images", TensorProto.FLOAT, ["batch", 3, height, width]
+            )
+        ],
+        [
+            helper.make_tensor_value_info(
+                "output", TensorProto.FLOAT, ["batch"] + list(output.shape[1:])
+            )
+        ],
+        [
+            numpy_helper.from_array(np.zeros(1, dtype=np.float32), "zero"),
+            numpy_helper.from_array(
+                np.array([-1] + [1] * (output.ndim - 1), dtype=np.int64), "shape"
+            ),
+            numpy_helper.from_array(output, "prediction"),
+        ],
+    )
+    model = helper.make_model(graph, opset_imports=[helper.make_opsetid("", 13)])
+    model.ir_version = 8
+    onnx.save(model, str(path))
+    return str(path)
+
+
+@pytest.fixture
+def classes_file(tmp_path):
+    path = tmp_path / "classes.names"
+    path.write_text("\n".join(CLASSES) + "\n")
+    return str(path)
+
+
+def make_spec(tmp_path, classes_file, output, **settings):
+    # "dnn" lets OpenCV pick the importer from the extension, "onnx" forces it
+    fmt = "dnn" if output == "ssd" else "onnx"
+    model = constant_model(tmp_path / f"{output}.onnx", OUTPUTS[output]())
+    return DetectorSpec.from_dict(
+        output,
+        dict(
+            format=fmt,
+            model=model,
+            classes=classes_file,
+            output=output,
+            input_size=list(INPUT_SIZE),
+            **settings,
+        ),
+    )
+
+
+def check_detections(detections, width, height, spec):
+    """What every detector must return, whatever the model."""
+    assert isinstance(detections, list)
+    for label, confidence, box in detections:
+        assert isinstance(label, str)
+        assert isinstance(confidence, float)
+        assert confidence > spec.confidence_threshold
+        assert len(box) == 4 and all(isinstance(v, int) for v in box)
+        x, y, w, h = box
+        assert w >= 0 and h >= 0
+        assert x < width and y < height
+
+
+BACKENDS = [
+    "opencv",
+    "auto",
+    pytest.param(
+        "openvino",
+        marks=pytest.mark.skipif(
+            not detectors.openvino_available(), reason="OpenCV built without OpenVINO"
+        ),
+    ),
+]
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+@pytest.mark.parametrize("output", sorted(OUTPUTS))
+@pytest.mark.parametrize("size", [(640, 480), (320, 240), (1280, 720)])
+def test_conformance(tmp_path, classes_file, output, backend, size):
+    spec = make_spec(tmp_path, classes_file, output, backend=backend)
+    detector = Detector(spec)
+    assert detector.input_size == INPUT_SIZE
+
+    width, height = size
+    frame = np.zeros((height, width, 3), dtype=np.uint8)
+    detections = detector.detect(frame)
+    check_detections(detections, width, height, spec)
+    assert detections == expected_detections(width, height)
+
+
+@pytest.mark.parametrize("output", sorted(OUTPUTS))
+def test_thresholds(tmp_path, classes_file, output):
+    frame = np.zeros((480, 640, 3), dtype=np.uint8)
+
+    strict = Detector(
+        make_spec(tmp_path, classes_file, output, confidence_threshold=0.95)
+    )
+    assert strict.detect(frame) == []
+
+    loose = Detector(
+        make_spec(tmp_path, classes_file, output, confidence_threshold=0.1)
+    )
+    assert [label for label, _, _ in loose.detect(frame)] == ["dog", "cat", "person"]
+
+    # Without suppression the overlapping dog is kept too
+    overlapping = Detector(make_spec(tmp_path, classes_file, output, nms_threshold=1.0))
+    assert [label for label, _, _ in overlapping.detect(frame)] == ["dog", "dog", "cat"]
+
+
+@pytest.mark.parametrize("output", ["yolo", "yolov5", "yolov8"])
+def test_detect_batch(tmp_path, classes_file, output):
+    detector = Detector(make_spec(tmp_path, classes_file, output))
+    sizes = [(640, 480), (320, 240), (1280, 720)]
+    frames = [np.zeros((height, width, 3), dtype=np.uint8) for width, height in sizes]
+    assert detector.detect_batch(frames) == [
+        expected_detections(width, height) for width, height in sizes
+    ]
+
+
+def test_split_ssd_batch_by_image_id():
+    rows = ssd_rows()
+    first, second = rows.copy(), rows.copy()
+    second[:, 0] = 1
+    out = np.concatenate([first, second[:1]])[None, None]
+    per_image = detectors.split_batch([out], 2, "ssd")
+    assert len(per_image[0][0]) == len(OBJECTS)
+    assert len(per_image[1][0]) == 1
+
+
+def test_split_darknet_batch():
+    outs = [np.arange(2 * 3 * 4, dtype=np.float32).reshape(6, 4)]
+    per_image = detectors.split_batch(outs, 2, "yolo")
+    np.testing.assert_array_equal(per_image[1][0], outs[0][3:])
+
+
+@pytest.mark.skipif(
+    not hasattr(cv2.dnn, "readNetFromDarknet")
+    or not os.path.exists("video/yolov3.weights"),
+    reason="Darknet importer or YOLOv3 weights not available",
+)
+def test_darknet_conformance():
+    spec = DetectorSpec.from_dict("yolov3", dict(DEFAULT_DETECTORS["yolov3"]))
+    detector = Detector(spec)
+    frame = np.random.default_rng(0).integers(0, 256, (480, 640, 3), dtype=np.uint8)
+    check_detections(detector.detect(frame), 640, 480, spec)
+
+
+def test_spec_validation():
+    with pytest.raises(ValueError, match="Unknown format"):
+        DetectorSpec.from_dict("x", {"format": "caffe2", "model": "x"})
+    with pytest.raises(ValueError, match="Unknown output"):
+        DetectorSpec.from_dict("x", {"format": "onnx", "model": "x", "output": "rcnn"})
+    with pytest.raises(ValueError, match="Unknown settings"):
+        DetectorSpec.from_dict("x", {"format": "onnx", "model": "x", "thresh": 0.5})
+
+
+def test_backend_resolution(monkeypatch):
+    monkeypatch.setattr(detectors, "openvino_available", lambda: False)
+    assert detectors.resolve_backend("auto") == "opencv"
+    assert detectors.resolve_backend("openvino") == "opencv"
+    monkeypatch.setattr(detectors, "openvino_available", lambda: True)
+    assert detectors.resolve_backend("auto") == "openvino"
+    with pytest.raises(ValueError):
+        detectors.resolve_backend("cuda")
+
+
+def test_get_detector_is_cached(tmp_path, classes_file, monkeypatch):
+    spec = make_spec(tmp_path, classes_file, "yolov8")
+    monkeypatch.setattr(detectors, "_detectors", {})
+    monkeypatch.setattr(
+        detectors, "detector_specs", lambda config=None: {"small": spec}
+    )
+    detector = detectors.get_detector("small")
+    assert detectors.get_detector("small") is detector
+    with pytest.raises(ValueError, match="Unknown detector"):
+        detectors.get_detector("large")
@@ -0,0 +1,113 @@
+import threading
+import time
+import numpy as np
+import pytest
+import video.executor as vexec
+import video.videoEffects as fxs
+from config import Config
+from video.executor import EffectExecutor, run_effect
+from video.pipeline import FramePipeline
+
+
+@pytest.fixture(scope="module")
+def executor():
+    with EffectExecutor(workers=2, slots=3) as executor:
+        yield executor
+
+
+def make_frames(count, shape=(48, 64, 3)):
+    rng = np.random.default_rng(0)
+    return [rng.integers(0, 256, shape, dtype=np.uint8) for _ in range(count)]
+
+
+@pytest.mark.parametrize("effect_name", ["normal", "grayscale", "heat_map"])
+def test_matches_inline_effect(executor, effect_name):
+    frame = make_frames(1)[0]
+    out, detections = executor.submit(frame, effect_name).result(timeout=30)
+    expected, _ = run_effect(frame.copy(), effect_name)
+    np.testing.assert_array_equal(out, expected)
+    assert detections == []
+
+
+def test_map_keeps_input_order(executor):
+    frames = make_frames(10)
+    results = list(executor.map(frames, "normal"))
+    assert len(results) == 10
+    for frame, (out, _) in zip(frames, results):
+        np.testing.assert_array_equal(out, frame)
+
+
+def test_output_larger_than_input(executor):
+    """Test that an output that does not fit the shared block still arrives"""
+    gray = make_frames(1, shape=(48, 64))[0]
+    out, _ = executor.submit(gray, "normal", rgb=True).result(timeout=30)
+    assert out.shape == (48, 64, 3)
+    np.testing.assert_array_equal(out[..., 0], gray)
+
+
+def test_frame_size_change(executor):
+    small, large = make_frames(1, (10, 10, 3))[0], make_frames(1, (96, 128, 3))[0]
+    assert executor.submit(small, "normal").result(timeout=30)[0].shape == (10, 10, 3)
+    out, _ = executor.submit(large, "normal").result(timeout=30)
+    np.testing.assert_array_equal(out, large)
+
+
+def test_worker_errors_are_raised(executor):
+    bad = np.zeros((4, 4, 3), dtype=np.float64)
+    with pytest.raises(Exception):
+        executor.submit(bad, "heat_map").result(timeout=30)
+    # The slot is released and the executor keeps working
+    frame = make_frames(1)[0]
+    np.testing.assert_array_equal(
+        executor.submit(frame, "normal").result(timeout=30)[0], frame
+    )
+
+
+class ListCapture:
+    def __init__(self, frames):
+        self.frames = list(frames)
+
+    def read(self):
+        if not self.frames:
+            return False, None
+        return True, self.frames.pop(0)
+
+
+def test_pipeline_with_frames_in_flight(executor):
+    frames = make_frames(8)
+
+    def submit(frame):
+        return executor.submit(frame, "normal")
+
+    with FramePipeline(ListCapture(frames), submit, in_flight=3) as pipeline:
+        indexes = [packet.index for packet in pipeline.results()]
+    assert indexes == sorted(indexes)
+    assert indexes[-1] == 7
+
+
+def test_result_is_copied_into_dst(executor):
+    frame = make_frames(1)[0]
+    dst = np.empty_like(frame)
+    out, _ = executor.submit(frame, "heat_map", dst=dst).result(timeout=30)
+    assert out is dst
+    expected, _ = run_effect(frame.copy(), "heat_map")
+    np.testing.assert_array_equal(out, expected)
+
+
+def test_processor_close_stops_the_detector_thread(monkeypatch):
+    config = Config()
+    config.detection_async = True
+    config.effect_target_fps = 0
+    monkeypatch.setattr(vexec, "Config", lambda: config)
+    monkeypatch.setattr(fxs, "detect_objects", lambda frame: [])
+
+    def detector_threads():
+        return [t for t in threading.enumerate() if t.name.startswith("detect_")]
+
+    with vexec.make_processor("object_detection") as processor:
+        processor(make_frames(1)[0])
+        assert detector_threads()
+    deadline = time.monotonic() + 5
+    while detector_threads() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert not detector_threads()
@@ -0,0 +1,78 @@
+import numpy as np
+import pandas as pd
+import pytest
+import video.executor as vexec
+import video.videoEffects as fxs
+from video.effects import EffectResult, effects, get_effect, register_effect
+
+BUILTIN = ["normal", "grayscale", "water_color", "heat_map", "object_detection", "ocr"]
+
+
+@pytest.fixture
+def frame():
+    return np.random.default_rng(0).integers(0, 256, (48, 64, 3), dtype=np.uint8)
+
+
+@pytest.fixture
+def fake_detections(monkeypatch):
+    detections = [("cup", 0.9, (5, 5, 10, 10))]
+    monkeypatch.setattr(fxs, "detect_objects", lambda frame: detections)
+    return detections
+
+
+def test_builtin_effects_are_registered():
+    registered = effects()
+    assert list(registered)[: len(BUILTIN)] == BUILTIN
+    assert all(effect.output == "bgr" for effect in registered.values())
+    assert registered["object_detection"].cost == "expensive"
+    assert registered["normal"].cost == "cheap"
+
+
+@pytest.mark.parametrize("name", BUILTIN)
+def test_uniform_result(name, frame, fake_detections):
+    result = get_effect(name)(frame.copy())
+    assert isinstance(result, EffectResult)
+    assert result.frame.shape == frame.shape
+    assert result.frame.dtype == np.uint8
+    expected = fake_detections if name == "object_detection" else []
+    assert result.detections == expected
+
+
+def test_grayscale_is_three_channel(frame):
+    out, _ = fxs.apply_effect(frame, "grayscale")
+    assert out.shape == frame.shape
+    np.testing.assert_array_equal(out[..., 0], out[..., 2])
+
+
+def test_unknown_effect_leaves_frame_alone(frame):
+    assert get_effect("van_gogh").name == "normal"
+    np.testing.assert_array_equal(fxs.apply_effect(frame, "van_gogh").frame, frame)
+
+
+def test_descriptions_csv_matches_registry():
+    """Test that data/frame_descriptions.csv was exported from the registry
+    (python -m video.effects --export data/frame_descriptions.csv)"""
+    df = pd.read_csv("data/frame_descriptions.csv")
+    assert dict(zip(df["frame_name"], df["description"])) == {
+        effect.name: effect.description for effect in effects().values()
+    }
+
+
+def test_register_rejects_unknown_metadata():
+    with pytest.raises(ValueError):
+        register_effect("sepia", "Old photo.", cost="free")
+    with pytest.raises(ValueError):
+        register_effect("sepia", "Old photo.", output="rgba")
+
+
+def test_cheap_effects_skip_the_process_pool(monkeypatch, frame):
+    def no_pool():
+        raise AssertionError("cheap effects should run in the calling thread")
+
+    monkeypatch.setattr(vexec, "get_effect_executor", no_pool)
+    processor = vexec.make_processor("heat_map", rgb=True)
+    assert processor.in_flight == 1
+    result = processor(frame)
+    assert result.frame.shape == frame.shape and result.detections == []
+    processor.release(result)
+    assert processor(frame).frame is result.frame
@@ -0,0 +1,108 @@
+import random
+import threading
+import types
+import pytest
+import data.embeddings as llm
+from ai import clients
+from data.embedding_cache import EmbeddingCache
+from data.embeddings import chunk_texts, get_embeddings, get_embeddings_batch
+
+
+def vector(text):
+    return (float(len(text)), float(sum(map(ord, text)) % 97))
+
+
+class FakeEmbeddingsClient:
+    """Embeds each text as vector(text) and, like the API, may list the
+    results in any order, each with its position in the input."""
+
+    def __init__(self):
+        self.inputs = []
+        self._lock = threading.Lock()
+        self.embeddings = types.SimpleNamespace(create=self.create)
+
+    def create(self, input, model):
+        texts = [input] if isinstance(input, str) else list(input)
+        with self._lock:
+            self.inputs.append(texts)
+        data = [
+            types.SimpleNamespace(index=i, embedding=list(vector(text)))
+            for i, text in enumerate(texts)
+        ]
+        random.Random(len(self.inputs)).shuffle(data)
+        return types.SimpleNamespace(data=data)
+
+    def sent(self) -> list:
+        return [text for texts in self.inputs for text in texts]
+
+
+@pytest.fixture
+def client(monkeypatch, tmp_path):
+    client = FakeEmbeddingsClient()
+    cache = EmbeddingCache(str(tmp_path / "embeddings.sqlite3"))
+    monkeypatch.setattr(clients, "get_embeddings_client", lambda: client)
+    monkeypatch.setattr(llm, "get_query_cache", lambda: cache)
+    monkeypatch.setattr(llm.config, "embedding_batch_max_items", 3)
+    monkeypatch.setattr(llm.config, "embedding_batch_max_tokens", 1000)
+    monkeypatch.setattr(llm.config, "embedding_batch_concurrency", 2)
+    get_embeddings.cache_clear()
+    yield client
+    get_embeddings.cache_clear()
+
+
+def test_chunks_respect_the_item_limit():
+    texts = [f"text {i}" for i in range(7)]
+    chunks = chunk_texts(texts, max_items=3, max_tokens=1000)
+    assert [len(chunk) for chunk in chunks] == [3, 3, 1]
+    assert [text for chunk in chunks for text in chunk] == texts
+
+
+def test_chunks_respect_the_token_limit():
+    # estimate_tokens: 40 characters are 11 tokens
+    texts = ["a" * 40, "b" * 40, "c" * 40, "d" * 400]
+    chunks = chunk_texts(texts, max_items=10, max_tokens=25)
+    assert chunks == [["a" * 40, "b" * 40], ["c" * 40], ["d" * 400]]
+
+
+def test_batch_results_follow_the_input_order(client):
+    texts = [f"frame effect number {i}" for i in range(8)]
+    assert get_embeddings_batch(texts) == [vector(text) for text in texts]
+    assert [len(texts) for texts in client.inputs] == [3, 3, 2]
+
+
+def test_duplicates_are_sent_once(client):
+    texts = ["grayscale", "water color", "grayscale", "heat map", "water color"]
+    assert get_embeddings_batch(texts) == [vector(text) for text in texts]
+    assert sorted(client.sent()) == ["grayscale", "heat map", "water color"]
+
+
+def test_cached_texts_are_not_sent(client):
+    llm.get_query_cache().put_many(
+        {"grayscale": vector("grayscale")}, llm.config.embedding_deployment_name
+    )
+    texts = ["heat map", "grayscale"]
+    assert get_embeddings_batch(texts) == [vector(text) for text in texts]
+    assert client.sent() == ["heat map"]
+
+
+def test_batch_results_are_served_to_single_lookups(client):
+    get_embeddings_batch(["grayscale", "heat map"])
+    assert get_embeddings("heat map") == vector("heat map")
+    assert len(client.inputs) == 1
+
+
+def test_concurrent_batches_each_get_their_own_results(client):
+    texts = [f"shared text {i}" for i in range(6)]
+    results = {}
+
+    def batch(name):
+        results[name] = get_embeddings_batch(texts)
+
+    threads = [threading.Thread(target=batch, args=(name,)) for name in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+    assert results == {name: [vector(text) for text in texts] for name in range(4)}
+    # No single-text requests: nothing a batch fetched was lost to another
+    assert all(len(inputs) > 1 for inputs in client.inputs)
@@ -0,0 +1,83 @@
+import threading
+import time
+import pytest
+from data.embedding_cache import EmbeddingCache, normalize_text
+
+
+@pytest.fixture
+def cache_path(tmp_path):
+    return str(tmp_path / "cache.sqlite3")
+
+
+def test_normalize_text():
+    assert normalize_text("  Make it   Black and WHITE \n") == "make it black and white"
+
+
+def test_hit_after_put_survives_reopen(cache_path):
+    """Test that entries persist across cache instances (process restarts)"""
+    EmbeddingCache(cache_path).put("make it black and white", "small", [0.5, 0.25])
+
+    cache = EmbeddingCache(cache_path)
+    assert cache.get("Make it black and white ", "small") == (0.5, 0.25)
+    assert cache.get("make it black and white", "large") is None
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_shared_counters(cache_path):
+    first = EmbeddingCache(cache_path)
+    second = EmbeddingCache(cache_path)
+    first.put("a", "small", [1.0])
+    first.get("a", "small")
+    second.get("a", "small")
+    second.get("b", "small")
+
+    stats = second.stats()
+    assert (stats["hits"], stats["misses"]) == (1, 1)
+    assert (stats["shared_hits"], stats["shared_misses"]) == (2, 1)
+
+
+def test_lru_eviction_keeps_recently_used(cache_path):
+    cache = EmbeddingCache(cache_path, max_entries=2)
+    cache.put("a", "small", [1.0])
+    time.sleep(0.01)
+    cache.put("b", "small", [2.0])
+    time.sleep(0.01)
+    cache.get("a", "small")
+    time.sleep(0.01)
+    cache.put("c", "small", [3.0])
+
+    assert cache.get("a", "small") == (1.0,)
+    assert cache.get("b", "small") is None
+    assert cache.get("c", "small") == (3.0,)
+    assert cache.stats()["entries"] == 2
+
+
+def test_ttl_expiry(cache_path):
+    cache = EmbeddingCache(cache_path, ttl_seconds=0.05)
+    cache.put("a", "small", [1.0])
+    assert cache.get("a", "small") == (1.0,)
+    time.sleep(0.1)
+    assert cache.get("a", "small") is None
+
+
+def test_concurrent_writers(cache_path):
+    """Test that several writers sharing one file do not lose entries"""
+    caches = [EmbeddingCache(cache_path) for _ in range(4)]
+
+    def write(cache, worker):
+        for i in range(25):
+            cache.put(f"text {worker} {i}", "small", [float(i)])
+
+    threads = [
+        threading.Thread(target=write, args=(cache, worker))
+        for worker, cache in enumerate(caches)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert caches[0].stats()["entries"] == 100
+    found = caches[1].get_many([f"text 3 {i}" for i in range(25)], "small")
+    assert len(found) == 25
@@ -0,0 +1,210 @@
+import json
+import os
+import numpy as np
+import pandas as pd
+import pytest
+from data.embedding_store import (
+    EmbeddingStore,
+    description_hash,
+    export_csv,
+    import_csv,
+    update_store,
+)
+
+
+@pytest.fixture
+def store():
+    matrix = np.arange(12, dtype=np.float32).reshape(3, 4)
+    return EmbeddingStore(
+        ["normal", "grayscale", "heat_map"],
+        [description_hash(d, "text-embedding-3-small") for d in ["a", "b", "c"]],
+        matrix,
+        "text-embedding-3-small",
+    )
+
+
+def test_save_and_load_round_trip(tmp_path, store):
+    """Test that a saved store loads back memory-mapped with its manifest"""
+    matrix_path = str(tmp_path / "emb.npy")
+    manifest_path = str(tmp_path / "emb.json")
+    store.save(matrix_path, manifest_path)
+
+    loaded = EmbeddingStore.load(matrix_path, manifest_path)
+    assert isinstance(loaded.matrix, np.memmap)
+    assert loaded.frame_names == store.frame_names
+    assert loaded.description_hashes == store.description_hashes
+    assert loaded.model == "text-embedding-3-small"
+    assert loaded.dimension == 4
+    np.testing.assert_array_equal(loaded.matrix, store.matrix)
+
+
+def test_load_missing_store_returns_none(tmp_path):
+    assert (
+        EmbeddingStore.load(str(tmp_path / "x.npy"), str(tmp_path / "x.json")) is None
+    )
+
+
+def test_mismatched_matrix_is_ignored(tmp_path, store):
+    matrix_path = str(tmp_path / "emb.npy")
+    manifest_path = str(tmp_path / "emb.json")
+    store.save(matrix_path, manifest_path)
+    np.save(os.path.join(tmp_path, saved_matrix_name(manifest_path)), np.zeros((2, 4)))
+    assert EmbeddingStore.load(matrix_path, manifest_path) is None
+
+
+def test_failed_save_keeps_the_previous_store(tmp_path, store, monkeypatch):
+    matrix_path = str(tmp_path / "emb.npy")
+    manifest_path = str(tmp_path / "emb.json")
+    store.save(matrix_path, manifest_path)
+
+    changed = EmbeddingStore(
+        store.frame_names, store.description_hashes, store.matrix + 1, store.model
+    )
+
+    def crash(*args, **kwargs):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(json, "dump", crash)
+    with pytest.raises(OSError):
+        changed.save(matrix_path, manifest_path)
+    monkeypatch.undo()
+
+    loaded = EmbeddingStore.load(matrix_path, manifest_path)
+    np.testing.assert_array_equal(loaded.matrix, store.matrix)
+    assert not [name for name in os.listdir(tmp_path) if name.startswith("emb.json.")]
+
+
+def test_saving_a_new_store_replaces_the_old_matrix(tmp_path, store):
+    matrix_path = str(tmp_path / "emb.npy")
+    manifest_path = str(tmp_path / "emb.json")
+    store.save(matrix_path, manifest_path)
+    first = saved_matrix_name(manifest_path)
+    EmbeddingStore(
+        store.frame_names, store.description_hashes, store.matrix + 1, store.model
+    ).save(matrix_path, manifest_path)
+    assert saved_matrix_name(manifest_path) != first
+    assert sorted(os.listdir(tmp_path)) == sorted(
+        ["emb.json", saved_matrix_name(manifest_path)]
+    )
+    loaded = EmbeddingStore.load(matrix_path, manifest_path)
+    np.testing.assert_array_equal(loaded.matrix, store.matrix + 1)
+
+
+def test_manifest_without_matrix_name_uses_matrix_path(tmp_path, store):
+    matrix_path = str(tmp_path / "emb.npy")
+    manifest_path = str(tmp_path / "emb.json")
+    store.save(matrix_path, manifest_path)
+    with open(manifest_path) as f:
+        manifest = json.load(f)
+    os.replace(tmp_path / manifest.pop("matrix"), matrix_path)
+    with open(manifest_path, "w") as f:
+        json.dump(manifest, f)
+    loaded = EmbeddingStore.load(matrix_path, manifest_path)
+    np.testing.assert_array_equal(loaded.matrix, store.matrix)
+
+
+def saved_matrix_name(manifest_path):
+    with open(manifest_path) as f:
+        return json.load(f)["matrix"]
+
+
+def test_matrix_for_reorders_rows(store):
+    assert store.matrix_for(store.frame_names) is store.matrix
+    reordered = store.matrix_for(["heat_map", "normal"])
+    np.testing.assert_array_equal(reordered, store.matrix[[2, 0]])
+
+
+def test_csv_export_import_round_trip(tmp_path, store):
+    """Test that CSV stays usable as an interchange format"""
+    descriptions = pd.DataFrame(
+        {"frame_name": store.frame_names, "description": ["a", "b", "c"]}
+    )
+    csv_path = str(tmp_path / "emb.csv")
+    export_csv(store, descriptions, csv_path)
+
+    imported = import_csv(csv_path, store.model)
+    assert imported.frame_names == store.frame_names
+    assert imported.description_hashes == store.description_hashes
+    np.testing.assert_array_equal(imported.matrix, store.matrix)
+
+
+class FakeEmbedder:
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, texts):
+        self.calls.append(list(texts))
+        return [[float(len(t)), 1.0, 0.0, 0.0] for t in texts]
+
+
+def test_update_store_unchanged_is_noop(store):
+    embed = FakeEmbedder()
+    updated, summary = update_store(
+        store, store.frame_names, ["a", "b", "c"], store.model, embed
+    )
+    assert updated is store
+    assert embed.calls == []
+    assert summary == {"reused": 3, "embedded": 0, "dropped": 0}
+
+
+def test_update_store_embeds_only_changed_rows(store):
+    """Test that new and edited descriptions are embedded and deleted ones dropped"""
+    embed = FakeEmbedder()
+    updated, summary = update_store(
+        store,
+        ["normal", "heat_map", "water_color"],
+        ["a", "c edited", "new effect"],
+        store.model,
+        embed,
+    )
+    assert embed.calls == [["c edited", "new effect"]]
+    assert summary == {"reused": 1, "embedded": 2, "dropped": 2}
+    np.testing.assert_array_equal(updated.matrix[0], store.matrix[0])
+    assert updated.matrix[1][0] == len("c edited")
+    assert updated.description_hashes[0] == store.description_hashes[0]
+
+
+def test_update_store_new_model_reembeds_everything(store):
+    embed = FakeEmbedder()
+    _, summary = update_store(
+        store, store.frame_names, ["a", "b", "c"], "another-deployment", embed
+    )
+    assert embed.calls == [["a", "b", "c"]]
+    assert summary["embedded"] == 3
+
+
+def test_update_store_reorder_needs_no_embeddings(store):
+    embed = FakeEmbedder()
+    updated, summary = update_store(
+        store, ["heat_map", "normal", "grayscale"], ["c", "a", "b"], store.model, embed
+    )
+    assert embed.calls == []
+    assert updated is not store
+    np.testing.assert_array_equal(updated.matrix, store.matrix[[2, 0, 1]])
+
+
+def test_update_store_with_an_empty_catalog(tmp_path):
+    def embed(texts):
+        raise AssertionError("nothing to embed")
+
+    store, summary = update_store(None, [], [], "text-embedding-3-small", embed)
+    assert len(store) == 0 and store.matrix.shape == (0, 0)
+    assert summary == {"reused": 0, "embedded": 0, "dropped": 0}
+    store.save(str(tmp_path / "emb.npy"), str(tmp_path / "emb.json"))
+    loaded = EmbeddingStore.load(str(tmp_path / "emb.npy"), str(tmp_path / "emb.json"))
+    assert len(loaded) == 0
+
+
+def test_content_hash_follows_names_and_descriptions(store):
+    same = EmbeddingStore(
+        store.frame_names, store.description_hashes, store.matrix * 2, store.model
+    )
+    assert same.content_hash == store.content_hash
+    changed, _ = update_store(
+        store,
+        store.frame_names,
+        ["a", "b", "changed"],
+        store.model,
+        lambda texts: [[0.0] * 4 for _ in texts],
+    )
+    assert changed.content_hash != store.content_hash
@@ -1,11 +1,52 @@
 import pytest
-from data.embeddings import find_most_similar_frame, get_embeddings
+from data.embeddings import (
+    find_most_similar_frame,
+    get_embeddings,
+    get_embeddings_batch,
+)
 from unittest.mock import patch
-from openai import AzureOpenAI
+from ai import clients
 from config import Config
 
 config = Config()
 
+# Every query used below, embedded up front in a few batched requests
+WARMUP_QUERIES = [
+    "make it black and white",
+    "show me what objects are in the video",
+    "make it look painted",
+    "show temperature visualization",
+    "make this look like a painting",
+    "transform this into artwork",
+    "apply a painted effect",
+    "give it an artistic look",
+    "show me how hot everything is",
+    "display temperature visualization",
+    "make it look like thermal vision",
+    "heat vision effect",
+    "make this black and white",
+    "detect objects in the scene",
+    "show heat vision",
+    "what's the weather like today",
+    "tell me a joke",
+    "what time is it",
+    "how do I make coffee",
+    "test query",
+    "make this look like a watercolor painting",
+    "show me what objects are in this scene",
+    "convert this to black and white",
+    "show me the heat signature",
+    "make it look artistic but also show the temperature",
+    "detect objects and make them black and white",
+    "I want to see both heat signatures and painted effects",
+]
+
+
+@pytest.fixture(scope="module")
+def warm_embeddings():
+    """Embeds the queries of the live tests that request it in one go."""
+    get_embeddings_batch(WARMUP_QUERIES)
+
 
 @pytest.mark.parametrize(
     "query,expected_frame",
@@ -16,14 +57,14 @@ config = Config()
         ("show temperature visualization", "heat_map"),
     ],
 )
-def test_specific_mappings(query, expected_frame):
+def test_specific_mappings(warm_embeddings, query, expected_frame):
     """Test that specific queries map to expected frames"""
     frame_name, similarity = find_most_similar_frame(query)
     assert frame_name == expected_frame
     assert similarity > 0.5
 
 
-def test_semantic_similarity_painting():
+def test_semantic_similarity_painting(warm_embeddings):
     """Test that semantically similar painting-related queries return consistent results"""
     painting_queries = [
         "make this look like a painting",
@@ -38,7 +79,7 @@ def test_semantic_similarity_painting():
     ), "All painting-related queries should map to water_color effect"
 
 
-def test_semantic_similarity_thermal():
+def test_semantic_similarity_thermal(warm_embeddings):
     """Test that semantically similar thermal/heat-related queries return consistent results"""
     thermal_queries = [
         "show me how hot everything is",
@@ -62,14 +103,14 @@ def test_semantic_similarity_thermal():
         ("show heat vision", "heat_map"),
     ],
 )
-def test_confidence_scores(query, expected_frame):
+def test_confidence_scores(warm_embeddings, query, expected_frame):
     """Test that relevant queries have high confidence scores"""
     frame_name, similarity = find_most_similar_frame(query)
     assert frame_name == expected_frame
     assert similarity > 0.7, f"Low confidence ({similarity}) for query: {query}"
 
 
-def test_irrelevant_queries():
+def test_irrelevant_queries(warm_embeddings):
     """Test that unrelated queries return lower confidence scores"""
     irrelevant_queries = [
         "what's the weather like today",
@@ -97,13 +138,13 @@ def test_with_mock_embeddings():
         assert 0 <= similarity <= 1
 
 
-def test_embedding_shape():
+def test_embedding_shape(warm_embeddings):
     """Test that embeddings have the correct shape"""
     embedding = get_embeddings("test query")
     assert len(embedding) == 1536, "OpenAI embeddings should be 1536-dimensional"
 
 
-def test_llm_judge_validation():
+def test_llm_judge_validation(warm_embeddings):
     """Use LLM to validate if the frame selections make sense"""
     test_cases = [
         "make this look like a watercolor painting",
@@ -112,11 +153,7 @@ def test_llm_judge_validation():
         "show me the heat signature",
     ]
 
-    client = AzureOpenAI(
-        api_key=config.api_key,
-        api_version=config.api_version,
-        azure_endpoint=config.api_base,
-    )
+    client = clients.get_chat_client()
 
     for query in test_cases:
         frame_name, similarity = find_most_similar_frame(query)
@@ -161,11 +198,7 @@ def test_llm_judge_validation():
 )
 def test_llm_judge_negative_cases(query, invalid_frame):
     """Test that LLM correctly identifies inappropriate effect selections"""
-    client = AzureOpenAI(
-        api_key=config.api_key,
-        api_version=config.api_version,
-        azure_endpoint=config.api_base,
-    )
+    client = clients.get_chat_client()
 
     prompt = f"""You are an expert judge evaluating video effect selections.
 
@@ -196,7 +229,7 @@ def test_llm_judge_negative_cases(query, invalid_frame):
 
 
 @pytest.mark.optional
-def test_llm_judge_edge_cases():
+def test_llm_judge_edge_cases(warm_embeddings):
     """Test how the system handles ambiguous or complex requests"""
     edge_cases = [
         "make it look artistic but also show the temperature",
@@ -204,11 +237,7 @@ def test_llm_judge_edge_cases():
         "I want to see both heat signatures and painted effects",
     ]
 
-    client = AzureOpenAI(
-        api_key=config.api_key,
-        api_version=config.api_version,
-        azure_endpoint=config.api_base,
-    )
+    client = clients.get_chat_client()
 
     for query in edge_cases:
         frame_name, similarity = find_most_similar_frame(query)
@@ -0,0 +1,147 @@
+import json
+import threading
+import types
+import pytest
+import ai.completion_cache as completion_cache
+import data.embeddings as llm
+import data.pipeline as pipeline
+from ai import clients
+from ai.completion_cache import CompletionCache
+from data.prompt_context import PromptContext
+
+FRAMES = {
+    "normal": "The camera image as it is.",
+    "grayscale": "Black and white video.",
+    "water_color": "Looks like a water color painting.",
+}
+
+
+class FakeChatClient:
+    """Answers each kind of frame prompt with a canned reply."""
+
+    def __init__(self, combined="{}"):
+        self.combined = combined
+        self.requests = []
+        self._lock = threading.Lock()
+        self.chat = types.SimpleNamespace(completions=self)
+
+    def create(self, **request):
+        with self._lock:
+            self.requests.append(request)
+        system = request["messages"][0]["content"]
+        if "response_format" in request:
+            content = self.combined
+        elif "Judge the frame selection" in system:
+            content = " YES: grayscale fits. "
+        elif "please explain why" in system:
+            content = " Grayscale removes the colors. "
+        else:
+            content = " Grayscale\n"
+        message = types.SimpleNamespace(content=content)
+        return types.SimpleNamespace(
+            choices=[types.SimpleNamespace(message=message, finish_reason="stop")]
+        )
+
+    def kinds(self) -> list:
+        kinds = []
+        for request in self.requests:
+            system = request["messages"][0]["content"]
+            if "response_format" in request:
+                kinds.append("combined")
+            elif "Judge the frame selection" in system:
+                kinds.append("evaluation")
+            elif "please explain why" in system:
+                kinds.append("explanation")
+            else:
+                kinds.append("selection")
+        return kinds
+
+
+@pytest.fixture
+def client(monkeypatch, tmp_path):
+    client = FakeChatClient()
+    catalog = types.SimpleNamespace(
+        prompt_context=PromptContext(list(FRAMES), list(FRAMES.values()))
+    )
+    monkeypatch.setattr(clients, "get_chat_client", lambda: client)
+    monkeypatch.setattr(llm, "get_catalog", lambda: catalog)
+    monkeypatch.setattr(llm, "get_embeddings", lambda text: (1.0, 0.0))
+    monkeypatch.setattr(llm.config, "router_enabled", False)
+    monkeypatch.setattr(llm.config, "prompt_context_top_k", 0)
+    monkeypatch.setattr(
+        completion_cache,
+        "_cache",
+        CompletionCache(str(tmp_path / "completions.sqlite3")),
+    )
+    monkeypatch.setattr(completion_cache, "_cache_configured", True)
+    return client
+
+
+def test_sequential_mode_chains_three_calls(client):
+    result = pipeline.run_frame_pipeline("make it black and white", "sequential")
+    assert result == {
+        "frame": "grayscale",
+        "explanation": "Grayscale removes the colors.",
+        "verdict": "YES: grayscale fits.",
+    }
+    assert client.kinds() == ["selection", "explanation", "evaluation"]
+    # The evaluation judges the explanation it was given
+    assert (
+        "Grayscale removes the colors." in client.requests[2]["messages"][0]["content"]
+    )
+
+
+def test_concurrent_mode_evaluates_without_the_explanation(client):
+    result = pipeline.run_frame_pipeline("make it black and white", "concurrent")
+    assert result["frame"] == "grayscale"
+    assert result["explanation"] == "Grayscale removes the colors."
+    assert result["verdict"] == "YES: grayscale fits."
+    assert client.kinds()[0] == "selection"
+    assert sorted(client.kinds()[1:]) == ["evaluation", "explanation"]
+    evaluation = client.requests[client.kinds().index("evaluation")]
+    assert "with this explanation" not in evaluation["messages"][0]["content"]
+
+
+def test_combined_mode_parses_one_json_answer(client):
+    client.combined = json.dumps(
+        {
+            "frame": " Water_Color ",
+            "explanation": " Soft painted look. ",
+            "verdict": "YES: it fits.",
+        }
+    )
+    result = pipeline.run_frame_pipeline("make it look painted", "combined")
+    assert result == {
+        "frame": "water_color",
+        "explanation": "Soft painted look.",
+        "verdict": "YES: it fits.",
+    }
+    assert client.kinds() == ["combined"]
+
+
+def test_combined_mode_replaces_unknown_frames_with_normal(client):
+    client.combined = json.dumps({"frame": "sepia", "verdict": "YES: old photo"})
+    result = pipeline.run_frame_pipeline("make it look old", "combined")
+    assert result == {"frame": "normal", "explanation": "", "verdict": "YES: old photo"}
+
+
+def test_malformed_combined_answer_is_not_cached(client):
+    client.combined = "Sorry, I can't answer in JSON."
+    with pytest.raises(ValueError):
+        pipeline.run_frame_pipeline("make it look painted", "combined")
+
+    client.combined = json.dumps({"frame": "water_color"})
+    result = pipeline.run_frame_pipeline("make it look painted", "combined")
+    assert result["frame"] == "water_color"
+    assert client.kinds() == ["combined", "combined"]
+
+
+def test_json_that_is_not_an_object_is_rejected(client):
+    client.combined = json.dumps(["water_color"])
+    with pytest.raises(ValueError):
+        llm.ai_frame_pipeline("make it look painted")
+
+
+def test_unknown_mode_is_rejected(client):
+    with pytest.raises(ValueError):
+        pipeline.run_frame_pipeline("make it black and white", "parallel")
@@ -0,0 +1,37 @@
+from data.prompt_context import (
+    PromptContext,
+    estimate_message_tokens,
+    estimate_tokens,
+)
+
+
+def make_context():
+    return PromptContext(
+        ["normal", "grayscale", "heat_map"],
+        ["No effect.", "Black and white.", "Thermal colors."],
+    )
+
+
+def test_full_listing_has_no_embeddings():
+    context = make_context()
+    assert context.full == (
+        "normal: No effect.\ngrayscale: Black and white.\nheat_map: Thermal colors."
+    )
+    assert "embedding" not in context.full
+    assert context.full_tokens == estimate_tokens(context.full)
+
+
+def test_render_candidates_in_order_without_duplicates():
+    context = make_context()
+    assert context.render(["heat_map", "unknown", "normal", "heat_map"]) == (
+        "heat_map: Thermal colors.\nnormal: No effect."
+    )
+    assert context.render() is context.full
+
+
+def test_estimate_message_tokens():
+    messages = [
+        {"role": "system", "content": "a" * 40},
+        {"role": "user", "content": "b" * 8},
+    ]
+    assert estimate_message_tokens(messages) == (11 + 4) + (3 + 4)
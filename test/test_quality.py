@@ -0,0 +1,76 @@
+from types import SimpleNamespace
+import numpy as np
+import video.executor as vexec
+from video.effects import Effect, get_effect
+from video.quality import QualityController, quality_controller
+
+
+def scalable_effect():
+    return Effect(
+        "sketch",
+        "Pencil lines.",
+        lambda frame, dst=None, rgb=False, detail="full": frame,
+        scale_mode="image",
+        scale=1.0,
+        min_scale=0.5,
+        quality_levels=({"detail": "draft"},),
+    )
+
+
+def feed(controller, seconds, frames=300):
+    for _ in range(frames):
+        controller.record(seconds)
+
+
+def test_degrades_one_knob_at_a_time_in_order():
+    controller = QualityController(scalable_effect(), target_fps=25, max_interval=4)
+    detector = SimpleNamespace(interval=0)
+    controller.track_detector(detector)
+    # Never fast enough, whatever the settings
+    feed(controller, 1.0)
+    knobs = [decision["knob"] for decision in controller.decisions]
+    assert knobs[0] == "scale" and knobs[-1] == "interval"
+    assert knobs.index("quality") > max(i for i, k in enumerate(knobs) if k == "scale")
+    assert controller.scale == 0.5
+    assert controller.quality == 1
+    assert detector.interval == 4
+    assert controller.over_budget == controller.frames
+
+
+def test_improves_back_to_full_quality():
+    controller = QualityController(scalable_effect(), target_fps=25, max_interval=4)
+    detector = SimpleNamespace(interval=1)
+    controller.track_detector(detector)
+    feed(controller, 1.0)
+    feed(controller, 0.001)
+    assert (controller.scale, controller.quality, detector.interval) == (1.0, 0, 1)
+    knobs = [decision["knob"] for decision in controller.decisions]
+    assert knobs[-1] == "scale"
+
+
+def test_within_budget_changes_nothing():
+    controller = QualityController(scalable_effect(), target_fps=25)
+    feed(controller, 0.04)
+    assert controller.changes == 0
+    assert "40.0 ms/frame for 25 fps" in controller.format_stats()
+
+
+def test_no_controller_without_target():
+    assert quality_controller("water_color", 0) is None
+    controller = quality_controller("heat_map", 30)
+    assert controller.scale is None and controller.snapshot()["interval"] is None
+
+
+def test_water_color_draft_level():
+    frame = np.random.default_rng(0).integers(0, 256, (48, 64, 3), dtype=np.uint8)
+    out, _ = get_effect("water_color")(frame, scale=1.0, quality=1)
+    assert out.shape == frame.shape and out.dtype == np.uint8
+
+
+def test_processor_reports_frame_times():
+    controller = QualityController(get_effect("water_color"), target_fps=1000)
+    process = vexec.make_processor("water_color", quality=controller)
+    frame = np.zeros((32, 32, 3), dtype=np.uint8)
+    for _ in range(3):
+        assert process(frame).frame.shape == frame.shape
+    assert controller.frames == 3
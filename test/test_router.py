@@ -0,0 +1,112 @@
+import types
+import pytest
+import data.embeddings as llm
+import data.pipeline as pipeline
+from data.search_index import ExactIndex
+
+# The router fixture stubs the catalog, tests going through the real one
+# put this back
+get_catalog = llm.get_catalog
+
+FRAMES = ["grayscale", "water_color", "heat_map"]
+
+# Stand-in embeddings: each prompt points somewhere between the frames
+EMBEDDINGS = {
+    "make it black and white": [1.0, 0.05, 0.0],
+    "paint it or heat it": [0.0, 1.0, 0.95],
+    "something vague": [0.5, 0.5, 0.5],
+}
+
+
+def catalog(labels=FRAMES, vectors=((1, 0, 0), (0, 1, 0), (0, 0, 1))):
+    return types.SimpleNamespace(index=ExactIndex(labels, vectors))
+
+
+@pytest.fixture
+def router(monkeypatch):
+    """Routes against the stub catalog; returns the prompts the LLM saw."""
+    asked = []
+
+    def select(prompt):
+        asked.append(prompt)
+        return "water_color"
+
+    monkeypatch.setattr(llm, "get_catalog", catalog)
+    monkeypatch.setattr(llm, "get_embeddings", lambda text: EMBEDDINGS[text])
+    monkeypatch.setattr(llm, "ai_frame_selection", select)
+    monkeypatch.setattr(llm.config, "router_min_score", 0.7)
+    monkeypatch.setattr(llm.config, "router_min_margin", 0.05)
+    monkeypatch.setattr(
+        pipeline,
+        "route_stats",
+        {path: {"count": 0, "seconds": 0.0} for path in ("embedding", "llm")},
+    )
+    return asked
+
+
+def test_clear_match_is_accepted_without_the_llm(router):
+    decision = pipeline.route_frame_selection("make it black and white")
+    assert decision.frame == "grayscale" and decision.path == "embedding"
+    assert decision.score > 0.7 and decision.margin > 0.05
+    assert router == []
+    assert "llm" not in decision.latencies
+
+
+def test_ambiguous_prompt_falls_back_to_the_llm(router):
+    # Close to two frames at once: a high score but no margin
+    decision = pipeline.route_frame_selection("paint it or heat it")
+    assert decision.path == "llm" and decision.frame == "water_color"
+    assert decision.margin < 0.05
+    assert router == ["paint it or heat it"]
+    assert "llm" in decision.latencies
+
+
+def test_low_score_falls_back_to_the_llm(router):
+    decision = pipeline.route_frame_selection("something vague")
+    assert decision.path == "llm" and decision.score < 0.7
+    assert router == ["something vague"]
+
+
+def test_without_llm_the_caller_decides(router):
+    decision = pipeline.route_frame_selection("something vague", use_llm=False)
+    assert decision.path == "llm" and decision.frame is None
+    assert router == []
+
+
+def test_empty_catalog_leaves_the_choice_to_the_llm(router, monkeypatch):
+    empty = types.SimpleNamespace(
+        index=types.SimpleNamespace(top_k=lambda query, k: [])
+    )
+    monkeypatch.setattr(llm, "get_catalog", lambda: empty)
+    decision = pipeline.route_frame_selection("make it black and white")
+    assert decision.path == "llm" and decision.frame == "water_color"
+    assert decision.score == 0.0 and decision.margin == 0.0
+
+
+def test_route_stats_count_each_path(router):
+    pipeline.route_frame_selection("make it black and white")
+    pipeline.route_frame_selection("make it black and white")
+    pipeline.route_frame_selection("something vague")
+    pipeline.route_frame_selection("something vague", use_llm=False)
+    assert pipeline.route_stats["embedding"]["count"] == 2
+    assert pipeline.route_stats["llm"]["count"] == 2
+    assert all(stats["seconds"] >= 0.0 for stats in pipeline.route_stats.values())
+
+
+def test_empty_catalog_loads_and_routes_to_the_llm(router, monkeypatch, tmp_path):
+    """Test the whole path from an empty descriptions CSV, without a saved
+    store, through get_catalog to the router"""
+    (tmp_path / "data").mkdir()
+    (tmp_path / "data" / "frame_descriptions.csv").write_text(
+        "frame_name,description\n"
+    )
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(llm, "_catalog", None)
+    monkeypatch.setattr(llm, "get_catalog", get_catalog)
+
+    catalog = llm.get_catalog()
+    assert len(catalog.index) == 0
+    assert catalog.prompt_context.full == ""
+    decision = pipeline.route_frame_selection("make it black and white")
+    assert decision.path == "llm" and decision.frame == "water_color"
+    assert llm.find_most_similar_frame("make it black and white") == ("normal", 0.0)
@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+import video.videoEffects as fxs
+from video.effects import get_effect, register_effect, resize_by, scale_detections
+from video.scaling import ScaleController
+
+
+@pytest.fixture
+def frame():
+    return np.random.default_rng(0).integers(0, 256, (90, 160, 3), dtype=np.uint8)
+
+
+def simulate(controller, full_seconds, frames=200):
+    """Feeds the controller frame times of an effect whose cost grows with
+    the pixel count."""
+    for _ in range(frames):
+        controller.record(full_seconds * controller.scale**2)
+    return controller.scale
+
+
+def test_controller_scales_down_to_hold_target():
+    controller = ScaleController(target_fps=25, min_scale=0.25)
+    # 100ms at full size, the budget is 40ms
+    scale = simulate(controller, 0.1)
+    assert 0.5 <= scale <= 0.7
+    assert 0.1 * scale**2 <= controller.budget * ScaleController.SLOW
+
+
+def test_controller_scales_back_up_and_respects_limits():
+    controller = ScaleController(target_fps=25, min_scale=0.25, start=0.25)
+    assert simulate(controller, 0.01) == 1.0
+    assert simulate(controller, 10.0) == 0.25
+
+
+def test_controller_ignores_single_slow_frame():
+    controller = ScaleController(target_fps=25, min_scale=0.25)
+    simulate(controller, 0.03)
+    controller.record(0.06)
+    assert controller.scale == 1.0
+
+
+def test_scale_detections():
+    detections = [("cup", 0.9, (5, 10, 20, 30))]
+    assert scale_detections(detections, 2.0) == [("cup", 0.9, (10, 20, 40, 60))]
+
+
+def test_image_mode_keeps_frame_size(frame):
+    dst = np.empty_like(frame)
+    out, _ = get_effect("water_color")(frame, dst=dst, scale=0.25)
+    assert out.shape == frame.shape
+    assert np.shares_memory(out, dst)
+
+
+def test_boxes_mode_maps_boxes_to_full_frame(monkeypatch, frame):
+    seen = []
+
+    def detect_objects(small):
+        seen.append(small.shape)
+        return [("cup", 0.9, (4, 4, 8, 8))]
+
+    monkeypatch.setattr(fxs, "detect_objects", detect_objects)
+    out, detections = get_effect("object_detection")(frame.copy(), scale=0.5)
+    assert seen == [resize_by(frame, 0.5).shape]
+    assert detections == [("cup", 0.9, (8, 8, 16, 16))]
+    assert out.shape == frame.shape
+
+
+def test_register_rejects_bad_scale_policy():
+    with pytest.raises(ValueError):
+        register_effect("sepia", "Old photo.", scale_mode="crop")
+    with pytest.raises(ValueError):
+        register_effect("sepia", "Old photo.", scale_mode="image", scale=1.5)
+    with pytest.raises(ValueError):
+        register_effect("sepia", "Old photo.", scale=0.5, min_scale=0.75)
@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+from data.search_index import ExactIndex, normalize_rows
+
+
+@pytest.fixture
+def index():
+    rng = np.random.default_rng(0)
+    return ExactIndex([f"frame_{i}" for i in range(50)], rng.normal(size=(50, 16)))
+
+
+def reference_scores(index, query):
+    matrix = index.matrix.astype(np.float64)
+    query = np.asarray(query, dtype=np.float64)
+    return matrix @ query / np.linalg.norm(query)
+
+
+def test_matrix_is_normalized_contiguous_float32(index):
+    assert index.matrix.dtype == np.float32
+    assert index.matrix.flags["C_CONTIGUOUS"]
+    np.testing.assert_allclose(np.linalg.norm(index.matrix, axis=1), 1, rtol=1e-5)
+
+
+def test_zero_rows_do_not_produce_nan():
+    assert not np.isnan(normalize_rows([[0.0, 0.0], [3.0, 4.0]])).any()
+
+
+def test_top_k_matches_brute_force(index):
+    """Test that top_k returns the same ranking as a full sort"""
+    query = np.random.default_rng(1).normal(size=16)
+    scores = reference_scores(index, query)
+    expected = [f"frame_{i}" for i in np.argsort(-scores)[:5]]
+
+    results = index.top_k(query, 5)
+    assert [label for label, _ in results] == expected
+    assert all(isinstance(score, float) for _, score in results)
+    np.testing.assert_allclose(
+        [score for _, score in results], np.sort(scores)[::-1][:5], rtol=1e-5
+    )
+
+
+def test_top_k_larger_than_index(index):
+    assert len(index.top_k(np.ones(16), 100)) == len(index)
+
+
+def test_top_k_many_matches_single_queries(index):
+    queries = np.random.default_rng(2).normal(size=(8, 16))
+    batched = index.top_k_many(queries, 3)
+    single = [index.top_k(query, 3) for query in queries]
+    for batch_results, single_results in zip(batched, single):
+        assert [label for label, _ in batch_results] == [
+            label for label, _ in single_results
+        ]
+        np.testing.assert_allclose(
+            [score for _, score in batch_results],
+            [score for _, score in single_results],
+            rtol=1e-5,
+        )
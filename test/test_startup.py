@@ -0,0 +1,146 @@
+import importlib.util
+import json
+import os
+import subprocess
+import sys
+import pandas as pd
+import pytest
+import startup
+import data.embeddings as llm
+import video.detectors as detectors
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Imports one module in a fresh interpreter where any network access or
+# detector weight load fails, then reports what was attempted and loaded
+IMPORT_SCRIPT = """
+import importlib, json, socket, sys
+import cv2, openai, requests
+
+attempts = []
+
+
+def refuse(name):
+    def stub(*args, **kwargs):
+        attempts.append(name)
+        raise RuntimeError(f"{name} while importing")
+
+    return stub
+
+
+socket.socket.connect = refuse("socket.connect")
+socket.create_connection = refuse("socket.create_connection")
+socket.getaddrinfo = refuse("socket.getaddrinfo")
+requests.Session.request = refuse("requests")
+openai.AzureOpenAI.__init__ = refuse("AzureOpenAI")
+openai.AsyncAzureOpenAI.__init__ = refuse("AsyncAzureOpenAI")
+for name in ("readNet", "readNetFromDarknet", "readNetFromONNX"):
+    setattr(cv2.dnn, name, refuse(f"cv2.dnn.{name}"))
+
+importlib.import_module(sys.argv[1])
+
+import startup
+import ai.clients as clients
+import ai.completion_cache as completion_cache
+import data.embeddings as llm
+import video.batching as batching
+import video.detectors as detectors
+
+loaded = {
+    "frame catalog": llm._catalog is not None,
+    "embedding cache": llm._query_cache_loaded,
+    "completion cache": completion_cache._cache_configured,
+    "API clients": clients._sync_client.cache_info().currsize > 0,
+    "detectors": bool(detectors._detectors),
+    "inference batcher": batching._batcher_configured,
+}
+print(json.dumps({
+    "attempts": attempts,
+    "loaded": [name for name, is_loaded in loaded.items() if is_loaded],
+    "startup_times": startup.startup_times,
+}))
+"""
+
+
+@pytest.mark.parametrize(
+    "module",
+    [
+        "data.embeddings",
+        "video.videoEffects",
+        pytest.param(
+            "app.app",
+            marks=pytest.mark.skipif(
+                not all(
+                    importlib.util.find_spec(name)
+                    for name in ("streamlit", "playwright")
+                ),
+                reason="App dependencies not installed",
+            ),
+        ),
+    ],
+)
+def test_import_loads_nothing(module):
+    """Test that importing the heavy modules does not load the catalog,
+    the API clients or the detector weights"""
+    env = dict(os.environ)
+    # The app imports its helpers the way streamlit run app/app.py finds them
+    env["PYTHONPATH"] = os.pathsep.join(
+        [ROOT, os.path.join(ROOT, "app"), env.get("PYTHONPATH", "")]
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", IMPORT_SCRIPT, module],
+        cwd=ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+        timeout=120,
+    )
+    assert result.returncode == 0, result.stderr
+    report = json.loads(result.stdout.strip().splitlines()[-1])
+    assert report == {"attempts": [], "loaded": [], "startup_times": {}}
+
+
+def test_timed_load_and_report(monkeypatch):
+    monkeypatch.setattr(startup, "startup_times", {})
+    assert startup.report() == "Nothing loaded yet"
+    with startup.timed_load("thing"):
+        pass
+    assert list(startup.startup_times) == ["thing"]
+    assert "thing" in startup.report()
+    assert "total" in startup.report()
+
+
+def test_catalog_is_loaded_once(monkeypatch):
+    calls = []
+
+    def fake_load():
+        calls.append(1)
+        return pd.DataFrame(
+            {
+                "frame_name": ["normal", "grayscale"],
+                "description": ["No effect.", "Black and white."],
+                "embedding": [[1.0, 0.0], [0.0, 1.0]],
+            }
+        )
+
+    monkeypatch.setattr(llm, "_catalog", None)
+    monkeypatch.setattr(llm, "load_and_generate_embeddings", fake_load)
+    monkeypatch.setattr(startup, "startup_times", {})
+
+    catalog = llm.get_catalog()
+    assert llm.get_catalog() is catalog
+    assert calls == [1]
+    assert catalog.index.top_k([0.1, 0.9], 1)[0][0] == "grayscale"
+    assert "grayscale: Black and white." in catalog.prompt_context.full
+    assert "frame catalog" in startup.startup_times
+
+
+def test_detector_load_failure_is_not_cached(monkeypatch):
+    def missing_weights(spec):
+        raise FileNotFoundError(spec.model)
+
+    monkeypatch.setattr(detectors, "_detectors", {})
+    monkeypatch.setitem(detectors.LOADERS, "darknet", missing_weights)
+    with pytest.raises(FileNotFoundError):
+        detectors.get_detector("yolov3")
+    assert detectors._detectors == {}
@@ -0,0 +1,70 @@
+import time
+import urllib.request
+import cv2
+import numpy as np
+import pytest
+from video.streaming import BOUNDARY, FrameStreamer
+
+
+@pytest.fixture
+def streamer():
+    with FrameStreamer(port=0, quality=90) as streamer:
+        yield streamer
+
+
+def frame(value):
+    return np.full((48, 64, 3), value, dtype=np.uint8)
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def test_single_frame_is_the_newest(streamer):
+    streamer.publish(frame(10))
+    wait_for(lambda: streamer.encoded >= 1)
+    streamer.publish(frame(200))
+    wait_for(lambda: streamer.encoded >= 2)
+    url = streamer.url.replace("/stream", "/frame.jpg")
+    with urllib.request.urlopen(url, timeout=5) as response:
+        assert response.headers["Content-Type"] == "image/jpeg"
+        image = cv2.imdecode(np.frombuffer(response.read(), np.uint8), 1)
+    assert image.shape == (48, 64, 3)
+    assert abs(int(image.mean()) - 200) <= 2
+
+
+def test_stream_sends_jpeg_parts(streamer):
+    streamer.publish(frame(50))
+    with urllib.request.urlopen(streamer.url, timeout=5) as response:
+        assert BOUNDARY in response.headers["Content-Type"]
+        assert response.readline() == f"--{BOUNDARY}\r\n".encode()
+        headers = {}
+        while (line := response.readline().strip()) != b"":
+            name, value = line.decode().split(": ")
+            headers[name] = value
+        assert headers["Content-Type"] == "image/jpeg"
+        jpeg = response.read(int(headers["Content-Length"]))
+    assert cv2.imdecode(np.frombuffer(jpeg, np.uint8), 1).shape == (48, 64, 3)
+    assert streamer.sent == 1
+
+
+def test_unencoded_frames_are_replaced():
+    # Not started, so nothing is encoded in between
+    streamer = FrameStreamer(port=0)
+    source = frame(1)
+    for value in range(3):
+        source[...] = value
+        streamer.publish(source)
+    assert (streamer.published, streamer.skipped) == (3, 2)
+    # The frame was copied, not kept
+    source[...] = 99
+    assert streamer._pending.max() == 2
+
+
+def test_unknown_path_is_404(streamer):
+    with pytest.raises(urllib.error.HTTPError) as error:
+        urllib.request.urlopen(streamer.url.replace("/stream", "/x"), timeout=5)
+    assert error.value.code == 404
@@ -0,0 +1,77 @@
+import threading
+import numpy as np
+from video.tracking import AsyncObjectDetector, OpticalFlowTracker
+
+
+def textured_frame(offset_x=0, offset_y=0, size=(240, 320)):
+    """Gray background with a textured square whose corner is at
+    (100 + offset_x, 80 + offset_y)."""
+    frame = np.full(size + (3,), 90, dtype=np.uint8)
+    patch = np.random.default_rng(0).integers(0, 256, (60, 60), dtype=np.uint8)
+    x, y = 100 + offset_x, 80 + offset_y
+    frame[y:, x:][:60, :60] = patch[..., None]
+    return frame
+
+
+def test_tracker_follows_moving_object():
+    tracker = OpticalFlowTracker()
+    tracker.reset(textured_frame(), [("cup", 0.9, (100, 80, 60, 60))])
+    for step in range(1, 6):
+        detections = tracker.update(textured_frame(3 * step, 2 * step))
+    label, confidence, box = detections[0]
+    assert (label, confidence) == ("cup", 0.9)
+    x, y, w, h = box
+    assert abs(x - 115) <= 1 and abs(y - 90) <= 1
+    assert (w, h) == (60, 60)
+
+
+def test_tracker_without_features_keeps_box():
+    tracker = OpticalFlowTracker()
+    flat = np.full((120, 160, 3), 90, dtype=np.uint8)
+    tracker.reset(flat, [("wall", 0.6, (10, 10, 40, 40))])
+    assert tracker.update(flat) == [("wall", 0.6, (10, 10, 40, 40))]
+
+
+class FakeDetector:
+    def __init__(self):
+        self.calls = 0
+        self.release = threading.Event()
+
+    def __call__(self, frame):
+        self.calls += 1
+        self.release.wait(5)
+        return [("cup", 0.9, (100, 80, 60, 60))]
+
+
+def draw(frame, detections):
+    return frame
+
+
+def test_detection_runs_in_background():
+    detect = FakeDetector()
+    detector = AsyncObjectDetector(detect, draw, interval=0)
+
+    # The detector is still busy: frames go through without boxes
+    for _ in range(3):
+        _, detections = detector(textured_frame())
+        assert detections == []
+    assert detect.calls == 1
+
+    detect.release.set()
+    detector._pending[0].result()
+    _, detections = detector(textured_frame(2, 0))
+    assert detections and detections[0][0] == "cup"
+    assert detector.detections_run == 1
+    detector.close()
+
+
+def test_detection_interval():
+    detect = FakeDetector()
+    detect.release.set()
+    detector = AsyncObjectDetector(detect, draw, interval=4)
+    for _ in range(12):
+        detector(textured_frame())
+        if detector._pending is not None:
+            detector._pending[0].result()
+    assert detect.calls == 3
+    detector.close()
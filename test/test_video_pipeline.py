@@ -0,0 +1,140 @@
+import queue
+import time
+import cv2
+import numpy as np
+import pytest
+from video.pipeline import DropOldestQueue, FramePipeline, StageStats, to_rgb
+
+
+class FakeCapture:
+    """Delivers ``count`` numbered frames at most every ``interval`` seconds."""
+
+    def __init__(self, count, interval=0.0):
+        self.count = count
+        self.interval = interval
+        self.reads = 0
+        self.released = False
+
+    def read(self):
+        if self.reads >= self.count:
+            return False, None
+        time.sleep(self.interval)
+        self.reads += 1
+        return True, np.full((4, 4, 3), self.reads, dtype=np.uint8)
+
+    def release(self):
+        self.released = True
+
+
+def test_drop_oldest_queue():
+    q = DropOldestQueue(2)
+    for item in range(5):
+        q.put(item)
+    assert q.dropped == 3
+    assert q.get() == 3
+    assert q.get() == 4
+    with pytest.raises(queue.Empty):
+        q.get(timeout=0.01)
+    q.close()
+    assert q.get() is None
+
+
+def test_drop_oldest_queue_reports_dropped_items():
+    dropped = []
+    q = DropOldestQueue(1, on_drop=dropped.append)
+    for item in range(3):
+        q.put(item)
+    assert dropped == [0, 1]
+
+
+def test_stage_stats():
+    stats = StageStats(window=10)
+    for _ in range(5):
+        stats.record(0.01, 0.02)
+    snapshot = stats.snapshot()
+    assert snapshot["frames"] == 5
+    assert snapshot["stage_ms"] == pytest.approx(10.0)
+    assert snapshot["latency_ms"] == pytest.approx(20.0)
+
+
+def test_to_rgb_handles_grayscale():
+    gray = np.zeros((4, 4), dtype=np.uint8)
+    assert to_rgb(gray).shape == (4, 4, 3)
+    bgr = np.zeros((4, 4, 3), dtype=np.uint8)
+    bgr[..., 0] = 255
+    assert to_rgb(bgr)[0, 0].tolist() == [0, 0, 255]
+
+
+def test_pipeline_processes_all_frames_from_fast_consumer():
+    source = FakeCapture(20, interval=0.002)
+    with FramePipeline(source, lambda frame: int(frame[0, 0, 0])) as frames:
+        results = [packet.result for packet in frames.results()]
+    assert results == sorted(results)
+    assert results[-1] == 20
+    assert source.released
+    assert frames.snapshot()["render"]["frames"] == len(results)
+
+
+def test_pipeline_drops_stale_frames_for_slow_processing():
+    """Test that a slow process stage works on the newest frames instead of
+    falling further and further behind"""
+    source = FakeCapture(100, interval=0.001)
+
+    def slow(frame):
+        time.sleep(0.02)
+        return int(frame[0, 0, 0])
+
+    with FramePipeline(source, slow) as frames:
+        results = [packet.result for packet in frames.results()]
+    assert len(results) < 100
+    assert frames.snapshot()["capture"]["dropped"] > 0
+    assert results[-1] == 100
+
+
+def test_pipeline_reraises_process_errors():
+    def broken(frame):
+        raise ValueError("bad frame")
+
+    with FramePipeline(FakeCapture(5), broken) as frames:
+        with pytest.raises(ValueError):
+            list(frames.results())
+
+
+def test_video_capture_decodes_into_reused_frames(tmp_path):
+    path = str(tmp_path / "clip.avi")
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), 10, (32, 24))
+    if not writer.isOpened():
+        pytest.skip("No MJPG writer in this OpenCV build")
+    for value in range(0, 200, 10):
+        writer.write(np.full((24, 32, 3), value, dtype=np.uint8))
+    writer.release()
+
+    # A slow consumer, so capture decodes many frames while one is shown
+    means = []
+    with FramePipeline(cv2.VideoCapture(path), lambda frame: frame) as pipeline:
+        for packet in pipeline.results():
+            shown = packet.result.copy()
+            time.sleep(0.01)
+            np.testing.assert_array_equal(packet.result, shown)
+            means.append(round(float(shown.mean()), -1))
+    assert means == sorted(means) and means
+    assert pipeline.frames.allocations <= pipeline.frames.keep
+
+
+def test_pipeline_releases_rendered_and_dropped_results():
+    released = []
+    source = FakeCapture(50, interval=0.001)
+
+    def slow(frame):
+        time.sleep(0.005)
+        return int(frame[0, 0, 0])
+
+    with FramePipeline(source, slow, release=released.append) as frames:
+        rendered = []
+        for packet in frames.results():
+            rendered.append(packet.result)
+            time.sleep(0.02)
+    dropped = frames.snapshot()["process"]["dropped"]
+    assert dropped > 0
+    assert set(rendered) <= set(released)
+    assert len(released) == len(rendered) + dropped
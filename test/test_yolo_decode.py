@@ -0,0 +1,31 @@
+import numpy as np
+import pytest
+from benchmarks.yolo_decode import decode_loop, synthetic_outputs
+from video.detectors import decode_yolo_outputs
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_matches_per_row_loop(seed):
+    """Test that the vectorized decode returns exactly what the original
+    per-row loop did"""
+    outs = synthetic_outputs(objects=6, seed=seed)
+    expected = decode_loop(outs, 640, 480)
+    assert expected
+    assert decode_yolo_outputs(outs, 640, 480) == expected
+
+
+def test_no_confident_rows():
+    outs = [np.zeros((10, 85), dtype=np.float32)]
+    assert decode_yolo_outputs(outs, 640, 480) == []
+
+
+def test_overlapping_boxes_are_suppressed():
+    out = np.zeros((3, 85), dtype=np.float32)
+    out[:, :4] = [0.5, 0.5, 0.2, 0.2]
+    out[:, 5 + 2] = [0.7, 0.9, 0.8]
+    detections = decode_yolo_outputs([out], 100, 100)
+    assert len(detections) == 1
+    class_id, confidence, box = detections[0]
+    assert class_id == 2
+    assert confidence == pytest.approx(0.9)
+    assert box == (40, 40, 20, 20)
@@ -0,0 +1,244 @@
+"""Applies effects and object detection to recorded footage, without a UI.
+
+The input is a video file, a directory of images (read in name order) or a
+stream URL such as rtsp://camera/stream. Every frame goes through the chain
+of effects, in order, and none are dropped: unlike the live pipeline this
+waits for slow effects. With --workers, frames are spread over an
+EffectExecutor with that many processes and written back in order. The
+output is a video and a JSONL file with one line per frame, in the format
+benchmarks.detectors reads as ground truth:
+    {"frame": 12, "detections": [{"label": "person", "confidence": 0.91, "box": [x, y, w, h]}]}
+Object detection uses config.detector.
+
+Run from the repository root:
+    python -m video.batch clips/street.mp4 --effects object_detection \\
+        --output street_boxes.mp4 --detections street.jsonl --workers 8
+"""
+
+import argparse
+import json
+import logging
+import os
+import time
+from typing import Iterator
+import cv2
+import numpy as np
+from video.buffers import BufferPool
+from video.effects import effects
+from video.executor import EffectExecutor, run_effect
+
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = (".bmp", ".jpeg", ".jpg", ".png", ".tif", ".tiff", ".webp")
+# Frame rate of the output video when the source has none (image directories)
+DEFAULT_FPS = 30.0
+
+
+class ImageDirectory:
+    """The images in a directory as a cv2.VideoCapture-like source."""
+
+    def __init__(self, path: str):
+        self.paths = sorted(
+            os.path.join(path, name)
+            for name in os.listdir(path)
+            if name.lower().endswith(IMAGE_EXTENSIONS)
+        )
+        self._next = 0
+
+    def isOpened(self) -> bool:
+        return bool(self.paths)
+
+    def read(self) -> tuple:
+        while self._next < len(self.paths):
+            path = self.paths[self._next]
+            self._next += 1
+            frame = cv2.imread(path)
+            if frame is not None:
+                return True, frame
+            logger.warning(f"Skipping unreadable image {path}")
+        return False, None
+
+    def get(self, prop: int) -> float:
+        if prop == cv2.CAP_PROP_FRAME_COUNT:
+            return float(len(self.paths))
+        return 0.0
+
+    def release(self) -> None:
+        pass
+
+
+def open_source(source: str):
+    """A cv2.VideoCapture for a video file or stream URL, or an
+    ImageDirectory for a directory."""
+    if os.path.isdir(source):
+        capture = ImageDirectory(source)
+    else:
+        capture = cv2.VideoCapture(source)
+    if not capture.isOpened():
+        raise ValueError(f"Could not open {source}")
+    return capture
+
+
+def read_frames(capture, max_frames: "int | None" = None) -> Iterator[np.ndarray]:
+    count = 0
+    while max_frames is None or count < max_frames:
+        ok, frame = capture.read()
+        if not ok:
+            break
+        yield frame
+        count += 1
+
+
+def process_frames(
+    frames: Iterator[np.ndarray],
+    chain: tuple,
+    workers: int = 0,
+    scale: "float | None" = None,
+) -> Iterator:
+    """EffectResults of the effect chain for every frame, in order, from
+    ``workers`` processes or, with 0, this one."""
+    if not workers:
+        pool = BufferPool()
+        for frame in frames:
+            yield run_effect(frame, chain, scale=scale, pool=pool)
+        return
+    with EffectExecutor(workers) as executor:
+        yield from executor.map(frames, chain, scale=scale)
+
+
+def detections_record(index: int, detections: list) -> dict:
+    return {
+        "frame": index,
+        "detections": [
+            {
+                "label": label,
+                "confidence": round(float(confidence), 4),
+                "box": [int(v) for v in box],
+            }
+            for label, confidence, box in detections
+        ],
+    }
+
+
+def run(
+    source: str,
+    chain: tuple,
+    output: "str | None" = None,
+    detections: "str | None" = None,
+    workers: int = 0,
+    scale: "float | None" = None,
+    max_frames: "int | None" = None,
+    fps: "float | None" = None,
+    progress_interval: float = 5.0,
+) -> dict:
+    """Processes ``source`` with the effect chain, writing the ``output``
+    video and ``detections`` JSONL when given. Returns the frame count,
+    seconds taken, throughput and the source's frame rate."""
+    unknown = [name for name in chain if name not in effects()]
+    if unknown:
+        raise ValueError(f"Unknown effects: {', '.join(unknown)}")
+    capture = open_source(source)
+    source_fps = capture.get(cv2.CAP_PROP_FPS) or 0.0
+    fps = fps or source_fps or DEFAULT_FPS
+    writer = None
+    size = None
+    jsonl = open(detections, "w") if detections else None
+    results = process_frames(read_frames(capture, max_frames), chain, workers, scale)
+    frames = 0
+    start = time.perf_counter()
+    last_report = start
+    try:
+        for index, (out, found) in enumerate(results):
+            if output:
+                if writer is None:
+                    size = (out.shape[1], out.shape[0])
+                    fourcc = cv2.VideoWriter_fourcc(*"mp4v")
+                    writer = cv2.VideoWriter(output, fourcc, fps, size)
+                    if not writer.isOpened():
+                        raise ValueError(f"Could not write {output}")
+                if (out.shape[1], out.shape[0]) != size:
+                    # Images in a directory can differ in size, a video can't
+                    out = cv2.resize(out, size)
+                writer.write(out)
+            if jsonl is not None:
+                jsonl.write(json.dumps(detections_record(index, found)) + "\n")
+            frames += 1
+            now = time.perf_counter()
+            if now - last_report >= progress_interval:
+                last_report = now
+                logger.info(f"{frames} frames, {frames / (now - start):.1f} fps")
+    except KeyboardInterrupt:
+        # Streams don't end, keep what was processed so far
+        logger.info(f"Interrupted after {frames} frames")
+    except Exception as e:
+        logger.error(f"Error processing {source}: {str(e)}")
+        raise
+    finally:
+        results.close()
+        capture.release()
+        if writer is not None:
+            writer.release()
+        if jsonl is not None:
+            jsonl.close()
+    seconds = time.perf_counter() - start
+    return {
+        "frames": frames,
+        "seconds": seconds,
+        "fps": frames / seconds if seconds else 0.0,
+        "source_fps": source_fps,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("source", help="video file, image directory or stream URL")
+    parser.add_argument(
+        "--effects",
+        nargs="+",
+        default=["object_detection"],
+        help="effects to apply, in order",
+    )
+    parser.add_argument("--output", help="output video (.mp4)")
+    parser.add_argument("--detections", help="output detections (.jsonl)")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="effect worker processes, 0 to process in this one",
+    )
+    parser.add_argument(
+        "--scale",
+        type=float,
+        help="processing scale for effects with a scale policy, "
+        "default the declared one, 1 for full resolution",
+    )
+    parser.add_argument("--max-frames", type=int)
+    parser.add_argument(
+        "--fps", type=float, help="output frame rate, default the source's"
+    )
+    args = parser.parse_args()
+
+    stats = run(
+        args.source,
+        tuple(args.effects),
+        args.output,
+        args.detections,
+        args.workers,
+        args.scale,
+        args.max_frames,
+        args.fps,
+    )
+    summary = (
+        f"Processed {stats['frames']} frames in {stats['seconds']:.1f}s: "
+        f"{stats['fps']:.1f} fps"
+    )
+    if stats["source_fps"]:
+        summary += f", {stats['fps'] / stats['source_fps']:.1f}x real time"
+    print(summary)
+
+
+if __name__ == "__main__":
+    main()
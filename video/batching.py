@@ -0,0 +1,152 @@
+"""Batched object detection for several video streams.
+
+Each stream calls InferenceBatcher.detect from its own thread. A single
+worker thread gathers the waiting frames into one blobFromImages batch, runs
+one forward pass and hands every stream back its own detections. A batch is
+sent when it is full, when every stream that is currently detecting has a
+frame in it, or when its oldest frame has waited ``max_latency`` seconds,
+whichever comes first. A lone stream is therefore never delayed."""
+
+import atexit
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+import numpy as np
+from config import Config
+from video.detectors import Detector, get_detector
+
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+
+class InferenceBatcher:
+    """Collects frames from any number of threads into batches for
+    ``detector.detect_batch`` (the configured detector by default).
+
+    Every thread that submitted a frame in the last ``idle`` seconds is a
+    caller the next batch waits for."""
+
+    def __init__(
+        self,
+        detector: "Detector | None" = None,
+        max_batch: int = 8,
+        max_latency: float = 0.01,
+        idle: float = 1.0,
+    ):
+        self.max_batch = max_batch
+        self.max_latency = max_latency
+        self.idle = idle
+        self.batches = 0
+        self.frames = 0
+        self._detector = detector
+        self._requests = queue.Queue()
+        # Thread id -> when it last submitted a frame
+        self._callers: dict[int, float] = {}
+        self._callers_lock = threading.Lock()
+        self._closed = False
+        self._thread = threading.Thread(
+            target=self._loop, name="detect-batcher", daemon=True
+        )
+        self._thread.start()
+
+    @property
+    def mean_batch_size(self) -> float:
+        return self.frames / self.batches if self.batches else 0.0
+
+    def submit(self, frame: np.ndarray) -> Future:
+        """Queues ``frame`` for the next batch; the future resolves to its
+        (label, confidence, (x, y, w, h)) detections."""
+        if self._closed:
+            raise RuntimeError("InferenceBatcher is closed")
+        future = Future()
+        now = time.perf_counter()
+        caller = threading.get_ident()
+        with self._callers_lock:
+            self._callers[caller] = now
+        self._requests.put((frame, future, now, caller))
+        return future
+
+    def detect(self, frame: np.ndarray) -> list:
+        """Detections for ``frame``, blocking until its batch has run."""
+        return self.submit(frame).result()
+
+    def _active_callers(self) -> set:
+        oldest = time.perf_counter() - self.idle
+        with self._callers_lock:
+            for caller in [c for c, last in self._callers.items() if last < oldest]:
+                del self._callers[caller]
+            return set(self._callers)
+
+    def _next_batch(self) -> list:
+        first = self._requests.get()
+        if first is None:
+            return []
+        batch = [first]
+        deadline = first[2] + self.max_latency
+        # No point waiting for callers that already have a frame in the batch
+        waiting_for = self._active_callers() - {first[3]}
+        while len(batch) < self.max_batch and waiting_for:
+            try:
+                request = self._requests.get(
+                    timeout=max(deadline - time.perf_counter(), 0)
+                )
+            except queue.Empty:
+                break
+            if request is None:
+                # Let close() see the sentinel once this batch has run
+                self._requests.put(None)
+                break
+            batch.append(request)
+            waiting_for.discard(request[3])
+        return batch
+
+    def _loop(self) -> None:
+        while True:
+            batch = self._next_batch()
+            if not batch:
+                break
+            frames = [request[0] for request in batch]
+            try:
+                detector = self._detector or get_detector()
+                results = detector.detect_batch(frames)
+            except Exception as e:
+                logger.error(f"Error detecting objects in a batch: {str(e)}")
+                for request in batch:
+                    request[1].set_exception(e)
+                continue
+            self.batches += 1
+            self.frames += len(batch)
+            for request, detections in zip(batch, results):
+                request[1].set_result(detections)
+
+    def close(self) -> None:
+        """Runs what is already queued and stops the worker thread."""
+        self._closed = True
+        self._requests.put(None)
+        self._thread.join()
+
+
+_batcher = None
+_batcher_configured = False
+_batcher_lock = threading.Lock()
+
+
+def get_inference_batcher() -> "InferenceBatcher | None":
+    """The process-wide batcher, or None when ``config.detection_batch_size``
+    is 1 and frames are detected one at a time."""
+    global _batcher, _batcher_configured
+    with _batcher_lock:
+        if not _batcher_configured:
+            config = Config()
+            if config.detection_batch_size > 1:
+                _batcher = InferenceBatcher(
+                    max_batch=config.detection_batch_size,
+                    max_latency=config.detection_batch_latency_ms / 1000,
+                )
+                atexit.register(_batcher.close)
+            _batcher_configured = True
+        return _batcher
@@ -0,0 +1,71 @@
+"""Reusable frame buffers, so steady-state video processing allocates no
+new arrays."""
+
+import threading
+import weakref
+import numpy as np
+
+
+class BufferPool:
+    """Arrays for one stream, kept between frames.
+
+    acquire(name, shape) hands out an array nobody is using and release()
+    gives it back once whatever used it is done with it: queued, processed,
+    rendered or dropped. Arrays are only allocated when every array of that
+    name is in use or the frame size changed. At most ``keep`` free arrays
+    are kept per name. An array that is never released is simply garbage
+    collected, the pool does not keep it alive."""
+
+    def __init__(self, keep: int = 4):
+        self.keep = keep
+        self.allocations = 0
+        self.allocated_bytes = 0
+        self._free: dict[str, list] = {}
+        # id -> (name, weak reference) of every array handed out
+        self._in_use: dict[int, tuple] = {}
+        # Reentrant: dropping the last reference to an array runs _forget
+        self._lock = threading.RLock()
+
+    def acquire(self, name: str, shape: tuple, dtype=np.uint8) -> np.ndarray:
+        shape = tuple(shape)
+        dtype = np.dtype(dtype)
+        with self._lock:
+            free = self._free.setdefault(name, [])
+            buffer = None
+            while free:
+                candidate = free.pop()
+                if candidate.shape == shape and candidate.dtype == dtype:
+                    buffer = candidate
+                    break
+            if buffer is None:
+                buffer = np.empty(shape, dtype=dtype)
+                self.allocations += 1
+                self.allocated_bytes += buffer.nbytes
+            key = id(buffer)
+            self._in_use[key] = (name, weakref.ref(buffer, lambda _: self._forget(key)))
+            return buffer
+
+    def release(self, buffer: "np.ndarray | None") -> None:
+        """Makes ``buffer`` available again. Arrays the pool did not hand
+        out, or that were already released, are ignored."""
+        if buffer is None:
+            return
+        with self._lock:
+            entry = self._in_use.get(id(buffer))
+            if entry is None or entry[1]() is not buffer:
+                return
+            del self._in_use[id(buffer)]
+            free = self._free.setdefault(entry[0], [])
+            if len(free) < self.keep:
+                free.append(buffer)
+
+    def _forget(self, key: int) -> None:
+        with self._lock:
+            entry = self._in_use.get(key)
+            if entry is not None and entry[1]() is None:
+                del self._in_use[key]
+
+    @property
+    def in_use(self) -> int:
+        with self._lock:
+            return len(self._in_use)
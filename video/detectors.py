@@ -0,0 +1,367 @@
+"""Object detectors loaded from config.
+
+A detector is described by a DetectorSpec: the model ``format`` picks the
+loader (Darknet, ONNX or any other model OpenCV DNN can read) and ``output``
+picks the decoder for the network's output layout. Specs live under
+"detectors" in config.json and "detector" names the one the app uses. New
+formats and layouts can be added with register_loader/register_decoder."""
+
+import logging
+import threading
+from dataclasses import dataclass, fields
+import cv2
+import numpy as np
+import startup
+from config import Config
+
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+LOADERS = {}
+DECODERS = {}
+
+BACKENDS = {
+    "default": cv2.dnn.DNN_BACKEND_DEFAULT,
+    "opencv": cv2.dnn.DNN_BACKEND_OPENCV,
+    "openvino": cv2.dnn.DNN_BACKEND_INFERENCE_ENGINE,
+}
+TARGETS = {
+    "cpu": cv2.dnn.DNN_TARGET_CPU,
+    "opencl": cv2.dnn.DNN_TARGET_OPENCL,
+    "opencl_fp16": cv2.dnn.DNN_TARGET_OPENCL_FP16,
+}
+
+
+def register_loader(name: str):
+    """Registers ``loader(spec) -> cv2.dnn.Net`` for models of format ``name``."""
+
+    def register(loader):
+        LOADERS[name] = loader
+        return loader
+
+    return register
+
+
+def register_decoder(name: str):
+    """Registers ``decoder(outs, spec, width, height)`` for output layout
+    ``name``. A decoder returns candidate class ids, confidences and
+    (x, y, w, h) pixel boxes above the confidence threshold, as arrays;
+    non-max suppression is applied afterwards."""
+
+    def register(decoder):
+        DECODERS[name] = decoder
+        return decoder
+
+    return register
+
+
+@dataclass
+class DetectorSpec:
+    """How to load and run one detector. ``input_size`` is (width, height)
+    of the network input; frames are resized to it without cropping."""
+
+    name: str
+    format: str
+    model: str
+    config: str = ""
+    classes: str = "video/coco.names"
+    output: str = "yolo"
+    input_size: tuple = (416, 416)
+    scale: float = 0.00392
+    mean: tuple = (0, 0, 0)
+    swap_rb: bool = True
+    confidence_threshold: float = 0.5
+    nms_threshold: float = 0.4
+    backend: str = "auto"
+    target: str = "cpu"
+
+    @classmethod
+    def from_dict(cls, name: str, values: dict) -> "DetectorSpec":
+        known = {f.name for f in fields(cls)} - {"name"}
+        unknown = set(values) - known
+        if unknown:
+            raise ValueError(f"Unknown settings for detector '{name}': {unknown}")
+        spec = cls(name=name, **values)
+        spec.input_size = tuple(spec.input_size)
+        spec.mean = tuple(spec.mean)
+        if spec.format not in LOADERS:
+            raise ValueError(
+                f"Unknown format '{spec.format}' for detector '{name}', "
+                f"expected one of {sorted(LOADERS)}"
+            )
+        if spec.output not in DECODERS:
+            raise ValueError(
+                f"Unknown output '{spec.output}' for detector '{name}', "
+                f"expected one of {sorted(DECODERS)}"
+            )
+        return spec
+
+
+@register_loader("darknet")
+def _load_darknet(spec: DetectorSpec):
+    return cv2.dnn.readNetFromDarknet(spec.config, spec.model)
+
+
+@register_loader("onnx")
+def _load_onnx(spec: DetectorSpec):
+    return cv2.dnn.readNetFromONNX(spec.model)
+
+
+@register_loader("dnn")
+def _load_dnn(spec: DetectorSpec):
+    # Caffe, TensorFlow, TFLite, ... picked by OpenCV from the file extensions
+    return cv2.dnn.readNet(spec.model, spec.config)
+
+
+def _rows(outs, columns=None) -> np.ndarray:
+    return np.concatenate([out.reshape(-1, columns or out.shape[-1]) for out in outs])
+
+
+def _yolo_candidates(rows, width, height, conf_threshold, class_scores=None):
+    """Candidates from YOLO rows with normalized center boxes, truncated to
+    ints the same way the original per-row loop did."""
+    scores = rows[:, 5:] if class_scores is None else class_scores
+    class_ids = scores.argmax(axis=1)
+    confidences = scores[np.arange(len(rows)), class_ids]
+
+    keep = confidences > conf_threshold
+    rows, class_ids, confidences = rows[keep], class_ids[keep], confidences[keep]
+    center_x = (rows[:, 0] * width).astype(np.int64)
+    center_y = (rows[:, 1] * height).astype(np.int64)
+    w = (rows[:, 2] * width).astype(np.int64)
+    h = (rows[:, 3] * height).astype(np.int64)
+    x = (center_x - w / 2).astype(np.int64)
+    y = (center_y - h / 2).astype(np.int64)
+    return class_ids, confidences, np.stack([x, y, w, h], axis=1)
+
+
+@register_decoder("yolo")
+def _decode_yolo(outs, spec, width, height):
+    """Darknet YOLO layers: rows of normalized (cx, cy, w, h), objectness and
+    class scores; the confidence is the best class score."""
+    return _yolo_candidates(_rows(outs), width, height, spec.confidence_threshold)
+
+
+@register_decoder("yolov5")
+def _decode_yolov5(outs, spec, width, height):
+    """YOLOv5-style ONNX exports: (1, N, 5 + classes) rows with boxes in
+    network input pixels; the confidence is objectness times class score."""
+    rows = _rows(outs).copy()
+    rows[:, [0, 2]] /= spec.input_size[0]
+    rows[:, [1, 3]] /= spec.input_size[1]
+    class_scores = rows[:, 5:] * rows[:, 4:5]
+    return _yolo_candidates(
+        rows, width, height, spec.confidence_threshold, class_scores
+    )
+
+
+@register_decoder("yolov8")
+def _decode_yolov8(outs, spec, width, height):
+    """YOLOv8-style ONNX exports: (1, 4 + classes, N), boxes in network input
+    pixels and no objectness column."""
+    rows = np.concatenate([out.reshape(out.shape[-2], -1).T for out in outs])
+    rows = rows.copy()
+    rows[:, [0, 2]] /= spec.input_size[0]
+    rows[:, [1, 3]] /= spec.input_size[1]
+    return _yolo_candidates(rows, width, height, spec.confidence_threshold, rows[:, 4:])
+
+
+@register_decoder("ssd")
+def _decode_ssd(outs, spec, width, height):
+    """SSD-style DetectionOutput: rows of (image, class_id, confidence,
+    x1, y1, x2, y2) with normalized corners."""
+    rows = _rows(outs, 7)
+    rows = rows[rows[:, 2] > spec.confidence_threshold]
+    x1 = (rows[:, 3] * width).astype(np.int64)
+    y1 = (rows[:, 4] * height).astype(np.int64)
+    x2 = (rows[:, 5] * width).astype(np.int64)
+    y2 = (rows[:, 6] * height).astype(np.int64)
+    boxes = np.stack([x1, y1, x2 - x1, y2 - y1], axis=1)
+    return rows[:, 1].astype(np.int64), rows[:, 2], boxes
+
+
+def non_max_suppression(
+    class_ids, confidences, boxes, conf_threshold, nms_threshold
+) -> list:
+    """(class_id, confidence, (x, y, w, h)) tuples that survive non-max
+    suppression, in candidate order."""
+    if not len(boxes):
+        return []
+    indexes = cv2.dnn.NMSBoxes(
+        boxes.tolist(), confidences.tolist(), conf_threshold, nms_threshold
+    )
+    indexes = np.sort(np.asarray(indexes, dtype=np.int64).reshape(-1))
+    return [
+        (int(class_ids[i]), float(confidences[i]), tuple(int(v) for v in boxes[i]))
+        for i in indexes
+    ]
+
+
+def split_batch(outs: list, batch: int, output: str) -> list:
+    """Per-image output layers of a batched forward pass. SSD detections are
+    told apart by their image id column, other layouts by the leading batch
+    axis; Darknet YOLO layers come back as (batch * rows, columns)."""
+    if output == "ssd":
+        rows = _rows(outs, 7)
+        return [[rows[rows[:, 0] == image]] for image in range(batch)]
+    if batch == 1:
+        return [outs]
+    per_image = [
+        out.reshape(batch, -1, out.shape[-1]) if out.ndim == 2 else out for out in outs
+    ]
+    return [[out[image] for out in per_image] for image in range(batch)]
+
+
+def decode_yolo_outputs(outs, width, height, conf_threshold=0.5, nms_threshold=0.4):
+    """Turns raw Darknet YOLO output layers into
+    (class_id, confidence, (x, y, w, h)) tuples in pixels, after non-max
+    suppression.
+
+    All rows of all layers are decoded at once: one argmax over the class
+    scores, one confidence mask and array arithmetic for the boxes."""
+    return non_max_suppression(
+        *_yolo_candidates(_rows(outs), width, height, conf_threshold),
+        conf_threshold,
+        nms_threshold,
+    )
+
+
+def openvino_available() -> bool:
+    """Whether this OpenCV build can run networks on OpenVINO's CPU plugin."""
+    try:
+        return cv2.dnn.DNN_TARGET_CPU in cv2.dnn.getAvailableTargets(
+            cv2.dnn.DNN_BACKEND_INFERENCE_ENGINE
+        )
+    except cv2.error:
+        return False
+
+
+def resolve_backend(backend: str) -> str:
+    """ "auto" is OpenVINO when available and OpenCV's own backend otherwise.
+    Asking for OpenVINO on a build without it falls back to OpenCV."""
+    if backend == "auto":
+        return "openvino" if openvino_available() else "opencv"
+    if backend not in BACKENDS:
+        raise ValueError(
+            f"Unknown DNN backend '{backend}', expected one of {sorted(BACKENDS)}"
+        )
+    if backend == "openvino" and not openvino_available():
+        logger.warning("OpenVINO is not available in this OpenCV build, using OpenCV")
+        return "opencv"
+    return backend
+
+
+def read_classes(path: str) -> list[str]:
+    with open(path, "r") as f:
+        return [line.strip() for line in f.readlines()]
+
+
+class Detector:
+    """A loaded network plus what is needed to run it on BGR frames and turn
+    its outputs into (label, confidence, (x, y, w, h)) detections."""
+
+    def __init__(self, spec: DetectorSpec):
+        self.spec = spec
+        self.net = LOADERS[spec.format](spec)
+        self.backend = resolve_backend(spec.backend)
+        self.net.setPreferableBackend(BACKENDS[self.backend])
+        if spec.target not in TARGETS:
+            raise ValueError(
+                f"Unknown DNN target '{spec.target}', expected one of {sorted(TARGETS)}"
+            )
+        if spec.target != "cpu":
+            self.net.setPreferableTarget(TARGETS[spec.target])
+        self.output_layers = list(self.net.getUnconnectedOutLayersNames())
+        self.classes = read_classes(spec.classes) if spec.classes else []
+        logger.info(
+            f"Loaded detector '{spec.name}' ({spec.format}, {spec.output} output, "
+            f"{spec.input_size[0]}x{spec.input_size[1]}, "
+            f"{self.backend}/{spec.target})"
+        )
+
+    @property
+    def input_size(self) -> tuple:
+        return self.spec.input_size
+
+    def label(self, class_id: int) -> str:
+        if 0 <= class_id < len(self.classes):
+            return self.classes[class_id]
+        return str(class_id)
+
+    def forward(self, frame: np.ndarray) -> list:
+        """Raw output layers for one frame."""
+        return self.forward_batch([frame])
+
+    def forward_batch(self, frames: list) -> list:
+        """Raw output layers for several frames, run as one batch."""
+        blob = cv2.dnn.blobFromImages(
+            frames,
+            self.spec.scale,
+            self.spec.input_size,
+            self.spec.mean,
+            self.spec.swap_rb,
+            crop=False,
+        )
+        self.net.setInput(blob)
+        return list(self.net.forward(self.output_layers))
+
+    def decode(self, outs: list, width: int, height: int) -> list:
+        candidates = DECODERS[self.spec.output](outs, self.spec, width, height)
+        return [
+            (self.label(class_id), confidence, box)
+            for class_id, confidence, box in non_max_suppression(
+                *candidates, self.spec.confidence_threshold, self.spec.nms_threshold
+            )
+        ]
+
+    def detect(self, frame: np.ndarray) -> list:
+        height, width = frame.shape[:2]
+        return self.decode(self.forward(frame), width, height)
+
+    def detect_batch(self, frames: list) -> list:
+        """Detections for each of ``frames`` from a single forward pass. The
+        network has to accept a batch dimension other than 1, which Darknet
+        models and ONNX exports with a dynamic batch axis do."""
+        outs = self.forward_batch(frames)
+        return [
+            self.decode(image_outs, frame.shape[1], frame.shape[0])
+            for image_outs, frame in zip(
+                split_batch(outs, len(frames), self.spec.output), frames
+            )
+        ]
+
+
+def detector_specs(config: "Config | None" = None) -> dict[str, DetectorSpec]:
+    """All detectors configured under "detectors" in config.json."""
+    config = config or Config()
+    return {
+        name: DetectorSpec.from_dict(name, values)
+        for name, values in config.detectors.items()
+    }
+
+
+_detectors: dict[str, Detector] = {}
+_default_name = None
+_detectors_lock = threading.Lock()
+
+
+def get_detector(name: "str | None" = None) -> Detector:
+    """The detector called ``name`` (``config.detector`` by default), loaded
+    on first use."""
+    global _default_name
+    with _detectors_lock:
+        if name is None:
+            if _default_name is None:
+                _default_name = Config().detector
+            name = _default_name
+        if name not in _detectors:
+            specs = detector_specs()
+            if name not in specs:
+                raise ValueError(
+                    f"Unknown detector '{name}', configured: {sorted(specs)}"
+                )
+            with startup.timed_load(f"{name} detector"):
+                _detectors[name] = Detector(specs[name])
+        return _detectors[name]
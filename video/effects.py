@@ -0,0 +1,253 @@
+"""Registry of the video effects.
+
+Every effect is registered once, with register_effect, together with what
+the rest of the app needs to know about it: the description the frame
+embeddings are built from, the kind of image it produces, how expensive it is
+and whether it keeps state between frames. Applying an effect always returns
+an EffectResult with a 3-channel BGR frame, whatever the effect produces, or
+an RGB one when the caller is going to display it. Effects write into a
+``dst`` array when given one (see video.buffers.BufferPool), so processing
+a stream does not allocate a new frame every time.
+
+Costly effects can also declare a scale policy. Image effects
+(scale_mode "image") run on a frame shrunk by ``scale`` and the output is
+resized back; detection effects ("boxes") look at a shrunk copy and map
+their boxes back onto the full frame. ``min_scale`` is how far
+video.scaling.ScaleController may go when it picks the scale to hold a
+target frame rate. ``quality_levels`` lists cheaper settings of the effect's
+own parameters, which video.quality.QualityController falls back on when
+the smallest scale is still too slow.
+
+The built-in effects live in video.videoEffects. To regenerate the
+descriptions file the embeddings are built from:
+    python -m video.effects --export data/frame_descriptions.csv
+"""
+
+import argparse
+import csv
+import logging
+from dataclasses import dataclass
+from typing import Callable, NamedTuple
+import cv2
+import numpy as np
+from video.buffers import BufferPool
+
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+DEFAULT_EFFECT = "normal"
+OUTPUTS = ("bgr", "gray")
+# Roughly: cheap is well under a millisecond per frame, moderate a few
+# milliseconds and expensive tens of milliseconds or more
+COSTS = ("cheap", "moderate", "expensive")
+SCALE_MODES = ("none", "image", "boxes")
+
+EFFECTS: dict[str, "Effect"] = {}
+
+
+class EffectResult(NamedTuple):
+    """What applying any effect returns: a 3-channel BGR (or, when asked
+    for, RGB) frame and the (label, confidence, (x, y, w, h)) detections,
+    empty for most effects."""
+
+    frame: np.ndarray
+    detections: list
+
+
+@dataclass(frozen=True)
+class Effect:
+    """A registered effect. ``apply(frame, dst=None, rgb=False)`` returns a
+    frame, written into ``dst`` when it can, or ``(frame, detections)`` for
+    effects that detect things. With ``rgb`` the frame comes back in RGB
+    order, converted as part of the effect rather than in a separate pass.
+    ``output`` is the kind of frame ``apply`` returns; grayscale frames are
+    expanded to three channels here. Effects with scale_mode "boxes" also
+    take ``scale`` and ``pool`` arguments. ``quality_levels`` are keyword arguments for
+    ``apply``, each cheaper than the one before; quality level 0 is the
+    effect with its defaults."""
+
+    name: str
+    description: str
+    apply: Callable
+    output: str = "bgr"
+    cost: str = "cheap"
+    stateful: bool = False
+    scale_mode: str = "none"
+    scale: float = 1.0
+    min_scale: float = 1.0
+    quality_levels: tuple = ()
+
+    def __call__(
+        self,
+        frame: np.ndarray,
+        dst: "np.ndarray | None" = None,
+        rgb: bool = False,
+        scale: "float | None" = None,
+        quality: int = 0,
+        pool: "BufferPool | None" = None,
+    ) -> EffectResult:
+        """Applies the effect at ``scale``, the declared one by default, and
+        at ``quality`` level. Effects with scale_mode "none" always see the
+        full frame. The downscaled frames of a reduced scale come from
+        ``pool`` when given, so a stream allocates them only once."""
+        scale = self.scale if scale is None else min(scale, 1.0)
+        params = self.quality_levels[quality - 1] if quality > 0 else {}
+        if self.scale_mode == "image" and scale < 1.0:
+            return self._apply_scaled(frame, dst, rgb, scale, params, pool)
+        if self.scale_mode == "boxes":
+            result = self.apply(
+                frame, dst=dst, rgb=rgb, scale=scale, pool=pool, **params
+            )
+        else:
+            result = self.apply(frame, dst=dst, rgb=rgb, **params)
+        return self._result(result, dst, rgb)
+
+    def _result(self, result, dst, rgb) -> EffectResult:
+        out, detections = result if isinstance(result, tuple) else (result, [])
+        if out.ndim == 2:
+            code = cv2.COLOR_GRAY2RGB if rgb else cv2.COLOR_GRAY2BGR
+            if dst is not None and dst.shape != out.shape + (3,):
+                dst = None
+            out = cv2.cvtColor(out, code, dst=dst)
+        return EffectResult(out, list(detections))
+
+    def _apply_scaled(self, frame, dst, rgb, scale, params, pool) -> EffectResult:
+        height, width = frame.shape[:2]
+        small = resize_by(frame, scale, pool)
+        small_out = None
+        if pool is not None:
+            small_out = pool.acquire("scaled_output", small.shape[:2] + (3,))
+        try:
+            result = self.apply(small, dst=small_out, rgb=rgb, **params)
+            out, detections = self._result(result, small_out, rgb)
+            if dst is not None and dst.shape != (height, width, 3):
+                dst = None
+            out = cv2.resize(
+                out, (width, height), dst=dst, interpolation=cv2.INTER_LINEAR
+            )
+        finally:
+            if pool is not None:
+                pool.release(small)
+                pool.release(small_out)
+        return EffectResult(out, scale_detections(detections, width / small.shape[1]))
+
+
+def resize_by(
+    frame: np.ndarray, scale: float, pool: "BufferPool | None" = None
+) -> np.ndarray:
+    """The frame shrunk by ``scale``, averaging pixels so edges don't alias.
+    With ``pool`` the result is a pool array, to release when done."""
+    height, width = frame.shape[:2]
+    size = (max(1, round(width * scale)), max(1, round(height * scale)))
+    dst = None
+    if pool is not None:
+        dst = pool.acquire(
+            "scaled_input", (size[1], size[0]) + frame.shape[2:], frame.dtype
+        )
+    return cv2.resize(frame, size, dst=dst, interpolation=cv2.INTER_AREA)
+
+
+def scale_detections(detections: list, factor: float) -> list:
+    """Detections with their boxes multiplied by ``factor``."""
+    return [
+        (label, confidence, tuple(int(round(v * factor)) for v in box))
+        for label, confidence, box in detections
+    ]
+
+
+def register_effect(
+    name: str,
+    description: str,
+    output: str = "bgr",
+    cost: str = "cheap",
+    stateful: bool = False,
+    scale_mode: str = "none",
+    scale: float = 1.0,
+    min_scale: "float | None" = None,
+    quality_levels: tuple = (),
+):
+    """Registers the decorated ``apply(frame, dst=None, rgb=False)`` function
+    as effect ``name``."""
+    if output not in OUTPUTS:
+        raise ValueError(f"Unknown output '{output}', expected one of {OUTPUTS}")
+    if cost not in COSTS:
+        raise ValueError(f"Unknown cost '{cost}', expected one of {COSTS}")
+    if scale_mode not in SCALE_MODES:
+        raise ValueError(
+            f"Unknown scale mode '{scale_mode}', expected one of {SCALE_MODES}"
+        )
+    min_scale = scale if min_scale is None else min_scale
+    if not 0 < min_scale <= scale <= 1:
+        raise ValueError(f"Expected 0 < min_scale <= scale <= 1 for effect '{name}'")
+
+    def register(apply):
+        EFFECTS[name] = Effect(
+            name,
+            description,
+            apply,
+            output,
+            cost,
+            stateful,
+            scale_mode,
+            scale,
+            min_scale,
+            tuple(quality_levels),
+        )
+        return apply
+
+    return register
+
+
+def _load_builtin_effects() -> None:
+    # Registered on import; imported here so the registry has no import cycle
+    import video.videoEffects  # noqa: F401
+
+
+def effects() -> dict[str, Effect]:
+    """All registered effects by name, in registration order."""
+    _load_builtin_effects()
+    return EFFECTS
+
+
+def get_effect(name: str) -> Effect:
+    """The effect called ``name``; unknown names get the default effect,
+    which leaves the frame as it is."""
+    registered = effects()
+    effect = registered.get(name)
+    if effect is None:
+        logger.debug(f"Unknown effect '{name}', using {DEFAULT_EFFECT}")
+        effect = registered[DEFAULT_EFFECT]
+    return effect
+
+
+def export_descriptions(path: str) -> None:
+    """Writes the frame_name,description CSV the frame embeddings are built
+    from."""
+    with open(path, "w", newline="", encoding="utf-8-sig") as f:
+        writer = csv.writer(f, lineterminator="\r\n")
+        writer.writerow(["frame_name", "description"])
+        for effect in effects().values():
+            writer.writerow([effect.name, effect.description])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="List or export the video effects")
+    parser.add_argument("--export", metavar="CSV", help="write the descriptions CSV")
+    args = parser.parse_args()
+    if args.export:
+        export_descriptions(args.export)
+        print(f"Wrote {len(effects())} effect descriptions to {args.export}")
+        return
+    for effect in effects().values():
+        flags = ", stateful" if effect.stateful else ""
+        print(f"{effect.name:<18} {effect.output:<5} {effect.cost}{flags}")
+
+
+if __name__ == "__main__":
+    # Built-in effects register with the importable video.effects module,
+    # not with this __main__ copy of it
+    from video.effects import main as registry_main
+
+    registry_main()
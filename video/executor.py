@@ -0,0 +1,438 @@
+import atexit
+import logging
+import multiprocessing
+import os
+import pickle
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from multiprocessing import shared_memory
+from typing import Iterable, Iterator
+import numpy as np
+from config import Config
+from video.buffers import BufferPool
+from video.effects import EffectResult, get_effect
+from video.quality import QualityController, quality_controller
+
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+
+def run_effect(
+    frame: np.ndarray,
+    effect_name: "str | tuple",
+    trigger: bool = False,
+    rgb: bool = False,
+    dst: "np.ndarray | None" = None,
+    scale: "float | None" = None,
+    quality: int = 0,
+    pool: "BufferPool | None" = None,
+) -> EffectResult:
+    """apply_effect, in RGB for display with ``rgb``, written into ``dst``
+    when the effect can, at processing ``scale`` when given and at
+    ``quality`` level, with scratch frames from ``pool``. A tuple of effect
+    names applies them in turn, each to the output of the one before, and
+    collects all their detections."""
+    from video.videoEffects import apply_effect
+
+    if isinstance(effect_name, str):
+        effect_name = (effect_name,)
+    detections = []
+    for name in effect_name[:-1]:
+        frame, found = apply_effect(
+            frame, name, trigger, scale=scale, quality=quality, pool=pool
+        )
+        detections.extend(found)
+    out, found = apply_effect(
+        frame,
+        effect_name[-1],
+        trigger,
+        dst=dst,
+        rgb=rgb,
+        scale=scale,
+        quality=quality,
+        pool=pool,
+    )
+    return EffectResult(out, detections + found)
+
+
+def _worker(tasks, results) -> None:
+    """Worker process loop: reads frames from shared memory, applies the
+    effect and writes the result back into the second half of the block."""
+    attached = {}
+    # Scratch frames of scaled effects, reused from task to task
+    pool = BufferPool()
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+        seq, slot, name, capacity, shape, dtype = task[:6]
+        effect_name, trigger, rgb, scale, quality = task[6:]
+        # Views into a block must be gone before it can be closed
+        frame = out = target = None
+        try:
+            if slot not in attached or attached[slot].name != name:
+                if slot in attached:
+                    attached[slot].close()
+                # Workers share the parent's resource tracker, so attaching
+                # does not make a worker unlink the block when it exits
+                attached[slot] = shared_memory.SharedMemory(name=name)
+            buf = attached[slot].buf
+
+            # The effect may draw on the frame in place, which is fine here
+            frame = np.ndarray(shape, dtype=dtype, buffer=buf)
+            # Effects write their output straight into the second half
+            target = np.ndarray(shape, dtype=dtype, buffer=buf, offset=capacity)
+            out, detections = run_effect(
+                frame, effect_name, trigger, rgb, target, scale, quality, pool
+            )
+
+            if np.shares_memory(out, target):
+                results.put((seq, out.shape, out.dtype.str, detections, None, None))
+            elif out.nbytes <= capacity:
+                target = np.ndarray(out.shape, out.dtype, buffer=buf, offset=capacity)
+                target[...] = out
+                results.put((seq, out.shape, out.dtype.str, detections, None, None))
+            else:
+                # Larger than the input frame, send it the slow way
+                results.put((seq, out.shape, out.dtype.str, detections, out, None))
+        except Exception as e:
+            try:
+                pickle.dumps(e)
+            except Exception:
+                e = RuntimeError(f"{type(e).__name__}: {str(e)}")
+            results.put((seq, None, None, None, None, e))
+    frame = out = target = None
+    for shm in attached.values():
+        shm.close()
+
+
+class EffectExecutor:
+    """Runs apply_effect in a pool of worker processes.
+
+    Frames travel through shared memory blocks instead of being pickled: each
+    of ``slots`` blocks holds one input frame and the effected output. Only
+    the frame's shape, the effect name and the detections go through the
+    queues. submit() returns a Future of an EffectResult; map()
+    yields results in input order. Results are copied out of shared memory
+    into the ``dst`` array given to submit(), or a new one. Each worker
+    loads its own copy of the detector on its first object_detection
+    frame."""
+
+    def __init__(self, workers: "int | None" = None, slots: "int | None" = None):
+        self.workers = workers or os.cpu_count() or 1
+        # Enough slots to keep every worker busy while results are collected
+        self.slots = slots or 2 * self.workers
+        # Spawned workers don't inherit the parent's threads and OpenCV state
+        context = multiprocessing.get_context("spawn")
+        self._tasks = context.Queue()
+        self._results = context.Queue()
+        self._processes = [
+            context.Process(
+                target=_worker,
+                args=(self._tasks, self._results),
+                name=f"effect-worker-{i}",
+                daemon=True,
+            )
+            for i in range(self.workers)
+        ]
+        for process in self._processes:
+            process.start()
+
+        self._blocks: list["shared_memory.SharedMemory | None"] = [None] * self.slots
+        self._free = queue.Queue()
+        for slot in range(self.slots):
+            self._free.put(slot)
+        self._pending: dict[int, tuple[Future, int, int, "np.ndarray | None"]] = {}
+        self._pending_lock = threading.Lock()
+        self._seq = 0
+        self._closed = False
+        self._collector = threading.Thread(
+            target=self._collect, name="effect-results", daemon=True
+        )
+        self._collector.start()
+        logger.info(
+            f"Started effect executor with {self.workers} workers, {self.slots} slots"
+        )
+
+    def _block(self, slot: int, capacity: int) -> shared_memory.SharedMemory:
+        block = self._blocks[slot]
+        if block is None or block.size < 2 * capacity:
+            if block is not None:
+                block.close()
+                block.unlink()
+            block = shared_memory.SharedMemory(create=True, size=2 * capacity)
+            self._blocks[slot] = block
+        return block
+
+    def submit(
+        self,
+        frame: np.ndarray,
+        effect_name: "str | tuple",
+        trigger: bool = False,
+        rgb: bool = False,
+        dst: "np.ndarray | None" = None,
+        scale: "float | None" = None,
+        quality: int = 0,
+    ) -> Future:
+        """Queues ``run_effect(frame, effect_name, trigger)``. Blocks while
+        all slots are in use. With ``rgb`` the worker also converts the
+        result to RGB for display. The result is copied into ``dst`` when it
+        has the result's shape and dtype. ``scale`` overrides the effect's
+        processing scale, ``quality`` picks a cheaper quality level."""
+        if self._closed:
+            raise RuntimeError("Effect executor is closed")
+        slot = self._free.get()
+        frame = np.ascontiguousarray(frame)
+        capacity = frame.nbytes
+        block = self._block(slot, capacity)
+        np.ndarray(frame.shape, dtype=frame.dtype, buffer=block.buf)[...] = frame
+
+        future = Future()
+        with self._pending_lock:
+            seq = self._seq
+            self._seq += 1
+            self._pending[seq] = (future, slot, capacity, dst)
+        self._tasks.put(
+            (
+                seq,
+                slot,
+                block.name,
+                capacity,
+                frame.shape,
+                frame.dtype.str,
+                effect_name,
+                trigger,
+                rgb,
+                scale,
+                quality,
+            )
+        )
+        return future
+
+    def _collect(self) -> None:
+        while True:
+            message = self._results.get()
+            if message is None:
+                break
+            seq, shape, dtype, detections, out, error = message
+            with self._pending_lock:
+                future, slot, capacity, dst = self._pending.pop(seq)
+            if error is not None:
+                future.set_exception(error)
+            else:
+                if out is None:
+                    result = np.ndarray(
+                        shape,
+                        dtype=dtype,
+                        buffer=self._blocks[slot].buf,
+                        offset=capacity,
+                    )
+                    if dst is None or (dst.shape, dst.dtype) != (shape, result.dtype):
+                        dst = np.empty_like(result)
+                    np.copyto(dst, result)
+                    out, result = dst, None
+                future.set_result(EffectResult(out, detections))
+            self._free.put(slot)
+
+    def map(
+        self,
+        frames: Iterable[np.ndarray],
+        effect_name: "str | tuple",
+        trigger: bool = False,
+        scale: "float | None" = None,
+    ) -> Iterator[EffectResult]:
+        """Applies the effect to every frame, yielding EffectResults in input
+        order while up to ``slots`` frames are in flight."""
+        in_flight = []
+        for frame in frames:
+            if len(in_flight) == self.slots:
+                yield in_flight.pop(0).result()
+            in_flight.append(self.submit(frame, effect_name, trigger, scale=scale))
+        for future in in_flight:
+            yield future.result()
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        for _ in self._processes:
+            self._tasks.put(None)
+        for process in self._processes:
+            process.join(5)
+            if process.is_alive():
+                process.terminate()
+        self._results.put(None)
+        self._collector.join(5)
+        with self._pending_lock:
+            for future, _, _, _ in self._pending.values():
+                future.cancel()
+            self._pending.clear()
+        for block in self._blocks:
+            if block is not None:
+                block.close()
+                block.unlink()
+        logger.info("Effect executor closed")
+
+    def __enter__(self) -> "EffectExecutor":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+class FrameProcessor:
+    """Process function for video.pipeline.FramePipeline, see
+    make_processor(). Results are written into arrays of ``pool``; pass
+    release() to the pipeline so an array is only reused once the frame
+    showing it has been rendered or dropped. close() stops what the
+    processor started, such as a background detector thread; use as a
+    context manager or call it when the stream ends."""
+
+    def __init__(self, process, in_flight: int, pool: BufferPool, close=None):
+        self.process = process
+        self.in_flight = in_flight
+        self.pool = pool
+        self._close = close
+
+    def __enter__(self) -> "FrameProcessor":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def __call__(self, frame: np.ndarray):
+        return self.process(frame)
+
+    def release(self, result: EffectResult) -> None:
+        self.pool.release(result.frame)
+
+    def close(self) -> None:
+        if self._close is not None:
+            self._close()
+            self._close = None
+
+
+def make_processor(
+    effect_name: str,
+    trigger: bool = False,
+    rgb: bool = False,
+    quality: "QualityController | None" = None,
+) -> FrameProcessor:
+    """FrameProcessor for the effect: expensive and moderate effects run in
+    the shared executor when ``config.effect_workers`` is set, cheap ones
+    (cheaper than the trip to a worker) and stateful ones (which need every
+    frame, in order) in the calling thread, and ``in_flight`` is set to
+    match. With ``config.detection_async``, object detection runs in the
+    background and boxes are tracked in between (see
+    video.tracking.AsyncObjectDetector). Either way the result is an
+    EffectResult, written into an array that stays in use until released.
+    With ``config.effect_target_fps`` set, a QualityController (``quality``,
+    or a new one) times every frame and picks the scale, quality level and
+    detection interval."""
+    config = Config()
+    effect = get_effect(effect_name)
+    controller = quality or quality_controller(effect_name, config.effect_target_fps)
+    pool = BufferPool(keep=config.video_queue_size + 2)
+    if effect_name == "object_detection" and config.detection_async:
+        from video.pipeline import to_rgb
+        from video.tracking import AsyncObjectDetector
+
+        detector = AsyncObjectDetector(
+            interval=config.detection_interval, trigger=trigger
+        )
+
+        if controller is not None:
+            controller.track_detector(detector)
+
+        def track(frame):
+            start = time.perf_counter()
+            out, detections = detector(frame)
+            if rgb:
+                out = to_rgb(out, pool.acquire("out", out.shape, out.dtype))
+            if controller is not None:
+                controller.record(time.perf_counter() - start)
+            return EffectResult(out, detections)
+
+        return FrameProcessor(track, 1, pool, close=detector.close)
+
+    executor = None
+    if effect.cost != "cheap" and not effect.stateful:
+        executor = get_effect_executor()
+    if executor is None:
+
+        def process(frame):
+            dst = pool.acquire("out", frame.shape, frame.dtype)
+            if controller is None:
+                result = run_effect(frame, effect_name, trigger, rgb, dst, pool=pool)
+            else:
+                start = time.perf_counter()
+                result = run_effect(
+                    frame,
+                    effect_name,
+                    trigger,
+                    rgb,
+                    dst,
+                    controller.scale,
+                    controller.quality,
+                    pool,
+                )
+                controller.record(time.perf_counter() - start)
+            if result.frame is not dst:
+                pool.release(dst)
+            return result
+
+        return FrameProcessor(process, 1, pool)
+
+    # Results are queued and rendered behind the frames still in flight
+    pool = BufferPool(keep=executor.slots + config.video_queue_size + 2)
+
+    def submit(frame):
+        dst = pool.acquire("out", frame.shape, frame.dtype)
+        start = time.perf_counter()
+        if controller is None:
+            future = executor.submit(frame, effect_name, trigger, rgb, dst)
+        else:
+            future = executor.submit(
+                frame,
+                effect_name,
+                trigger,
+                rgb,
+                dst,
+                controller.scale,
+                controller.quality,
+            )
+
+        def done(future):
+            if future.exception() is not None or future.result().frame is not dst:
+                pool.release(dst)
+            # With every slot busy a frame's latency, waiting for a free
+            # slot included, spans ``slots`` frame intervals
+            if controller is not None:
+                controller.record((time.perf_counter() - start) / executor.slots)
+
+        future.add_done_callback(done)
+        return future
+
+    return FrameProcessor(submit, executor.slots, pool)
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_effect_executor() -> "EffectExecutor | None":
+    """The process-wide executor with ``config.effect_workers`` workers, or
+    None when effects should run in the calling thread (effect_workers 0)."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            workers = Config().effect_workers
+            if not workers:
+                return None
+            _executor = EffectExecutor(workers)
+            atexit.register(_executor.close)
+        return _executor
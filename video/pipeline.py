@@ -0,0 +1,340 @@
+import collections
+import logging
+import queue
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Iterator
+import cv2
+import numpy as np
+from video.buffers import BufferPool
+
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+
+class DropOldestQueue:
+    """Bounded queue whose put never blocks: when full, the oldest item is
+    discarded to make room, so a slow consumer always gets the newest items.
+
+    After close(), get() drains what is left and then returns None.
+    ``on_drop`` is called with every discarded item."""
+
+    def __init__(self, maxsize: int = 1, on_drop: "Callable | None" = None):
+        self._items = collections.deque(maxlen=maxsize)
+        self._not_empty = threading.Condition()
+        self._closed = False
+        self.on_drop = on_drop
+        self.dropped = 0
+
+    def put(self, item) -> None:
+        dropped = None
+        with self._not_empty:
+            if len(self._items) == self._items.maxlen:
+                self.dropped += 1
+                dropped = self._items[0]
+            self._items.append(item)
+            self._not_empty.notify()
+        if dropped is not None and self.on_drop is not None:
+            self.on_drop(dropped)
+
+    def get(self, timeout: "float | None" = None):
+        """Returns the oldest item, or None once the queue is closed and
+        empty. Raises queue.Empty when nothing arrives within ``timeout``."""
+        with self._not_empty:
+            if not self._not_empty.wait_for(
+                lambda: self._items or self._closed, timeout
+            ):
+                raise queue.Empty
+            if self._items:
+                return self._items.popleft()
+            return None
+
+    def close(self) -> None:
+        with self._not_empty:
+            self._closed = True
+            self._not_empty.notify_all()
+
+
+class StageStats:
+    """Throughput and latency of one pipeline stage over the last ``window``
+    frames. ``seconds`` is the time spent in the stage itself, ``latency``
+    the age of the frame (since capture) when the stage finished with it."""
+
+    def __init__(self, window: int = 60):
+        self._finished = collections.deque(maxlen=window)
+        self._seconds = collections.deque(maxlen=window)
+        self._latency = collections.deque(maxlen=window)
+        self._lock = threading.Lock()
+        self.frames = 0
+
+    def record(self, seconds: float, latency: float) -> None:
+        with self._lock:
+            self._finished.append(time.perf_counter())
+            self._seconds.append(seconds)
+            self._latency.append(latency)
+            self.frames += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            finished = list(self._finished)
+            seconds = list(self._seconds)
+            latency = list(self._latency)
+            frames = self.frames
+        fps = 0.0
+        if len(finished) > 1 and finished[-1] > finished[0]:
+            fps = (len(finished) - 1) / (finished[-1] - finished[0])
+        return {
+            "frames": frames,
+            "fps": fps,
+            "stage_ms": 1000 * float(np.mean(seconds)) if seconds else 0.0,
+            "latency_ms": 1000 * float(np.mean(latency)) if latency else 0.0,
+        }
+
+
+@dataclass
+class FramePacket:
+    """A captured frame on its way through the pipeline. ``result`` is what
+    the process function returned for it."""
+
+    index: int
+    captured_at: float
+    frame: np.ndarray
+    result: Any = None
+
+
+def to_rgb(frame: np.ndarray, dst: "np.ndarray | None" = None) -> np.ndarray:
+    """BGR (or single channel grayscale) frame to RGB for display, written
+    into ``dst`` when given one of the right shape."""
+    if dst is not None and dst.shape != frame.shape[:2] + (3,):
+        dst = None
+    if frame.ndim == 2:
+        return cv2.cvtColor(frame, cv2.COLOR_GRAY2RGB, dst=dst)
+    return cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=dst)
+
+
+class FramePipeline:
+    """Capture, process and render stages connected by drop-oldest queues.
+
+    A capture thread reads ``source`` (a cv2.VideoCapture or anything with
+    read() and release()) as fast as it delivers frames and keeps only the
+    newest ones, so the driver buffer never fills up with stale frames. A
+    processing thread runs ``process(frame)`` on the newest captured frame.
+    Rendering happens on the caller's thread (Streamlit can only draw from
+    the script thread) by iterating over results(); the time until the
+    caller asks for the next frame counts as render time.
+
+    With ``in_flight`` above 1, ``process`` must return a future (see
+    video.executor.EffectExecutor.submit) and up to that many frames are
+    processed at once; a collector thread waits for them in capture order.
+
+    Captured frames are decoded into buffers of a BufferPool, which get
+    reused once their packet has been rendered or dropped; ``release`` is
+    called with the result of every such packet, so the process function
+    can take its output buffer back too (see
+    video.executor.FrameProcessor.release). The caller must be done with a
+    packet when it asks results() for the next one.
+
+    With queues of size 1 a displayed frame is at most one frame behind
+    the camera plus processing time. The stats include those of the
+    ``quality`` controller (see video.quality.QualityController) the
+    process function reports to, when given one. Use as a context manager,
+    or call start() and stop()."""
+
+    STAGES = ("capture", "process", "render")
+
+    def __init__(
+        self,
+        source,
+        process: Callable[[np.ndarray], Any],
+        queue_size: int = 1,
+        stats_window: int = 60,
+        in_flight: int = 1,
+        quality=None,
+        release: "Callable[[Any], None] | None" = None,
+    ):
+        self.source = source
+        self.process = process
+        self.in_flight = in_flight
+        self.quality = quality
+        self.release = release
+        self._submitted = queue.Queue(maxsize=in_flight)
+        self.captured = DropOldestQueue(queue_size, on_drop=self._release)
+        self.processed = DropOldestQueue(queue_size, on_drop=self._release)
+        self.stats = {stage: StageStats(stats_window) for stage in self.STAGES}
+        # cv2.VideoCapture decodes into a frame it is given; enough are kept
+        # for every frame that can be queued, processed or rendered at once
+        self.frames = BufferPool(keep=2 * queue_size + in_flight + 2)
+        self.error = None
+        self._stop = threading.Event()
+        self._threads = []
+
+    def __enter__(self) -> "FramePipeline":
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+    def start(self) -> None:
+        if hasattr(self.source, "set"):
+            # Keep as little as possible queued inside the capture driver
+            self.source.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        self._threads = [
+            threading.Thread(target=self._capture_loop, name="capture", daemon=True),
+            threading.Thread(target=self._process_loop, name="process", daemon=True),
+        ]
+        if self.in_flight > 1:
+            self._threads.append(
+                threading.Thread(target=self._collect_loop, name="collect", daemon=True)
+            )
+        for thread in self._threads:
+            thread.start()
+        logger.info("Frame pipeline started")
+
+    def stop(self, timeout: float = 2.0) -> None:
+        self._stop.set()
+        self.captured.close()
+        self.processed.close()
+        for thread in self._threads:
+            thread.join(timeout)
+        if hasattr(self.source, "release"):
+            self.source.release()
+        logger.info(f"Frame pipeline stopped\n{self.format_stats()}")
+
+    def _capture_loop(self) -> None:
+        index = 0
+        reuse = isinstance(self.source, cv2.VideoCapture)
+        frame = None
+        try:
+            while not self._stop.is_set():
+                start = time.perf_counter()
+                if reuse and frame is not None:
+                    buffer = self.frames.acquire("capture", frame.shape, frame.dtype)
+                    ok, frame = self.source.read(buffer)
+                    if frame is not buffer:
+                        self.frames.release(buffer)
+                else:
+                    ok, frame = self.source.read()
+                if not ok:
+                    if not self._stop.is_set():
+                        logger.info("Capture source returned no frame")
+                    break
+                now = time.perf_counter()
+                self.captured.put(FramePacket(index, now, frame))
+                self.stats["capture"].record(now - start, 0.0)
+                index += 1
+        except Exception as e:
+            logger.error(f"Error capturing frame: {str(e)}")
+            self.error = e
+        finally:
+            self.captured.close()
+
+    def _release(self, packet: FramePacket) -> None:
+        """Gives the packet's buffers back, once nothing uses it anymore."""
+        if self.release is not None and packet.result is not None:
+            self.release(packet.result)
+        packet.result = None
+        self.frames.release(packet.frame)
+
+    def _finish(self, packet: FramePacket, start: float) -> None:
+        now = time.perf_counter()
+        self.stats["process"].record(now - start, now - packet.captured_at)
+        self.processed.put(packet)
+
+    def _process_loop(self) -> None:
+        try:
+            while not self._stop.is_set():
+                try:
+                    packet = self.captured.get(timeout=0.5)
+                except queue.Empty:
+                    continue
+                if packet is None:
+                    break
+                start = time.perf_counter()
+                packet.result = self.process(packet.frame)
+                if self.in_flight > 1:
+                    self._put_submitted((packet, start))
+                else:
+                    self._finish(packet, start)
+        except Exception as e:
+            logger.error(f"Error processing frame: {str(e)}")
+            self.error = e
+            self._stop.set()
+        finally:
+            if self.in_flight > 1:
+                self._put_submitted(None)
+            else:
+                self.processed.close()
+
+    def _put_submitted(self, item) -> None:
+        # The collector stops early on errors, so don't wait on it forever
+        while True:
+            try:
+                self._submitted.put(item, timeout=0.5)
+                return
+            except queue.Full:
+                if self._stop.is_set():
+                    return
+
+    def _collect_loop(self) -> None:
+        try:
+            while True:
+                try:
+                    item = self._submitted.get(timeout=0.5)
+                except queue.Empty:
+                    if self._stop.is_set():
+                        break
+                    continue
+                if item is None:
+                    break
+                packet, start = item
+                packet.result = packet.result.result()
+                self._finish(packet, start)
+        except Exception as e:
+            logger.error(f"Error processing frame: {str(e)}")
+            self.error = e
+            self._stop.set()
+        finally:
+            self.processed.close()
+
+    def results(self, timeout: float = 0.5) -> Iterator[FramePacket]:
+        """Yields processed frames in capture order until the source runs out
+        or the pipeline is stopped. Raises the error of a failed stage."""
+        while not self._stop.is_set():
+            try:
+                packet = self.processed.get(timeout)
+            except queue.Empty:
+                continue
+            if packet is None:
+                break
+            start = time.perf_counter()
+            yield packet
+            now = time.perf_counter()
+            self.stats["render"].record(now - start, now - packet.captured_at)
+            self._release(packet)
+        if self.error is not None:
+            raise self.error
+
+    def snapshot(self) -> dict:
+        """Per-stage stats plus the number of frames dropped between stages."""
+        stats = {stage: self.stats[stage].snapshot() for stage in self.STAGES}
+        stats["capture"]["dropped"] = self.captured.dropped
+        stats["process"]["dropped"] = self.processed.dropped
+        return stats
+
+    def format_stats(self) -> str:
+        lines = []
+        for stage, s in self.snapshot().items():
+            line = (
+                f"{stage}: {s['fps']:.1f} fps, {s['stage_ms']:.1f} ms/frame, "
+                f"{s['latency_ms']:.1f} ms since capture"
+            )
+            if "dropped" in s:
+                line += f", {s['dropped']} dropped"
+            lines.append(line)
+        if self.quality is not None:
+            lines.append(self.quality.format_stats())
+        return "\n".join(lines)
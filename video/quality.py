@@ -0,0 +1,221 @@
+"""Holds a video stream at a target frame rate by trading quality for time.
+
+One QualityController per stream measures how long each frame takes and,
+when the moving average leaves the budget (1 / config.effect_target_fps),
+turns one knob at a time, in this order when frames are too slow and the
+reverse when there is time to spare:
+
+- scale: the processing scale of effects with a scale policy
+  (video.scaling.ScaleController)
+- quality: the effect's next cheaper quality level, e.g. draft stylization
+- interval: how many frames the background detector waits between runs
+  (video.tracking.AsyncObjectDetector), doubled each time
+
+Scale changes in both directions, in small steps. Quality and interval
+steps are big and only taken back once the time they saved, measured after
+taking them, fits in the budget; otherwise a stream just over budget would
+flip between the two settings.
+
+Every change is logged and kept in ``decisions``; snapshot() and
+format_stats() report them next to the pipeline stats.
+"""
+
+import collections
+import logging
+import threading
+import time
+from config import Config
+from video.effects import Effect, get_effect
+from video.scaling import ScaleController
+
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+
+class QualityController:
+    """Quality settings for one stream of ``effect`` at ``target_fps``.
+
+    Read ``scale`` and ``quality`` before processing a frame and record()
+    the time it took. A detector attached with track_detector() gets its
+    interval changed directly. After any change the controller waits
+    ``settle`` frames and restarts the average from the second half of
+    them, the frames that surely ran with the new settings."""
+
+    SLOW = ScaleController.SLOW
+    FAST = ScaleController.FAST
+
+    def __init__(
+        self,
+        effect: Effect,
+        target_fps: float,
+        max_interval: int = 8,
+        smoothing: float = 0.2,
+        settle: int = 10,
+        window: int = 100,
+    ):
+        self.effect = effect
+        self.target_fps = target_fps
+        self.budget = 1.0 / target_fps
+        self.max_interval = max_interval
+        self.smoothing = smoothing
+        self.settle = settle
+        self.scaler = None
+        if effect.scale_mode != "none":
+            self.scaler = ScaleController(
+                target_fps, effect.min_scale, start=effect.scale
+            )
+        self.quality = 0
+        self.detector = None
+        self.min_interval = 0
+        self.seconds = None
+        self.frames = 0
+        self.over_budget = 0
+        self.decisions = collections.deque(maxlen=window)
+        self.changes = 0
+        self._settling = None
+        # Quality and interval steps taken: [knob, old value, frame time
+        # before, how much faster frames got], most recent last
+        self._steps = []
+        self._lock = threading.Lock()
+
+    @property
+    def scale(self) -> "float | None":
+        """Processing scale for the next frame, None for effects without a
+        scale policy."""
+        return None if self.scaler is None else self.scaler.scale
+
+    def track_detector(self, detector) -> None:
+        """Lets the controller raise ``detector.interval`` above its
+        configured value when frames are too slow."""
+        self.detector = detector
+        self.min_interval = detector.interval
+
+    def record(self, seconds: float) -> None:
+        """Records the time one frame took and adjusts the settings for the
+        next ones."""
+        with self._lock:
+            self.frames += 1
+            if seconds > self.budget:
+                self.over_budget += 1
+            if self.seconds is None:
+                self.seconds = seconds
+            else:
+                self.seconds += self.smoothing * (seconds - self.seconds)
+            if self._settling is not None:
+                self._settling.append(seconds)
+                if len(self._settling) < self.settle:
+                    return
+                half = len(self._settling) // 2
+                recent = self._settling[half:]
+                self.seconds = sum(recent) / len(recent)
+                self._settling = None
+                if self._steps and self._steps[-1][3] is None:
+                    self._steps[-1][3] = max(1.0, self._steps[-1][2] / self.seconds)
+            ratio = self.seconds / self.budget
+            if ratio > self.SLOW:
+                self._degrade(ratio)
+            elif ratio < self.FAST:
+                self._improve(ratio)
+
+    def _degrade(self, ratio: float) -> None:
+        if self.scaler is not None and self.scaler.scale > self.scaler.min_scale:
+            self._adjust_scale(ratio)
+        elif self.quality < len(self.effect.quality_levels):
+            self._step("quality", self.quality + 1)
+        elif self.detector is not None and self.detector.interval < self.max_interval:
+            self._step(
+                "interval", min(self.max_interval, max(1, 2 * self.detector.interval))
+            )
+
+    def _improve(self, ratio: float) -> None:
+        if self._steps:
+            knob, old, _, speedup = self._steps[-1]
+            if speedup is None or self.seconds * speedup > self.budget:
+                return
+            self._steps.pop()
+            self._set(knob, old)
+        elif self.scaler is not None and self.scaler.scale < self.scaler.max_scale:
+            self._adjust_scale(ratio)
+
+    def _get(self, knob: str):
+        return self.quality if knob == "quality" else self.detector.interval
+
+    def _set(self, knob: str, value) -> None:
+        self._decide(knob, self._get(knob), value)
+        if knob == "quality":
+            self.quality = value
+        else:
+            self.detector.interval = value
+
+    def _step(self, knob: str, value) -> None:
+        self._steps.append([knob, self._get(knob), self.seconds, None])
+        self._set(knob, value)
+
+    def _adjust_scale(self, ratio: float) -> None:
+        old = self.scaler.scale
+        if self.scaler.adjust(ratio):
+            self._decide("scale", old, self.scaler.scale)
+            # Frame time follows the pixel count, no need to measure again
+            self.seconds *= (self.scaler.scale / old) ** 2
+            self._settling = None
+
+    def _decide(self, knob: str, old, new) -> None:
+        logger.info(
+            f"{self.effect.name}: {knob} {old} -> {new} "
+            f"({self.seconds * 1000:.1f}ms per frame, "
+            f"budget {self.budget * 1000:.1f}ms)"
+        )
+        self.decisions.append(
+            {
+                "time": time.time(),
+                "frame": self.frames,
+                "knob": knob,
+                "from": old,
+                "to": new,
+                "frame_ms": self.seconds * 1000,
+            }
+        )
+        self.changes += 1
+        self._settling = []
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "target_fps": self.target_fps,
+                "frame_ms": 1000 * self.seconds if self.seconds else 0.0,
+                "frames": self.frames,
+                "over_budget": self.over_budget,
+                "scale": self.scale,
+                "quality": self.quality,
+                "interval": None if self.detector is None else self.detector.interval,
+                "changes": self.changes,
+                "last": self.decisions[-1] if self.decisions else None,
+            }
+
+    def format_stats(self) -> str:
+        s = self.snapshot()
+        line = (
+            f"quality: {s['frame_ms']:.1f} ms/frame for {s['target_fps']} fps, "
+            f"{s['over_budget']}/{s['frames']} over budget"
+        )
+        for knob in ("scale", "quality", "interval"):
+            if s[knob] is not None:
+                line += f", {knob} {s[knob]}"
+        if s["last"] is not None:
+            last = s["last"]
+            line += f", last: {last['knob']} {last['from']} -> {last['to']}"
+        return line
+
+
+def quality_controller(
+    effect_name: str, target_fps: "float | None" = None
+) -> "QualityController | None":
+    """A QualityController for the effect at ``target_fps``, by default
+    config.effect_target_fps; None when no target is set."""
+    if target_fps is None:
+        target_fps = Config().effect_target_fps
+    if not target_fps:
+        return None
+    return QualityController(get_effect(effect_name), target_fps)
@@ -0,0 +1,84 @@
+"""Picks the processing scale of a costly effect to hold a target frame rate."""
+
+import logging
+import math
+import threading
+
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+
+class ScaleController:
+    """Processing scale for one stream, between ``min_scale`` and
+    ``max_scale``.
+
+    record() takes the time spent on each frame and keeps a moving average.
+    When the average leaves a band around the frame budget (1 / target_fps),
+    the scale moves towards the one expected to hit the budget: effect cost
+    is taken to grow with the pixel count, so with the square root of the
+    time ratio. Steps are limited, and rounded to ``step``, so that a single
+    slow frame or a small change doesn't make the output size flicker."""
+
+    # Only frames more than 30% over budget make the scale drop, and only
+    # ones under 90% of it let the scale grow again
+    SLOW = 1.3
+    FAST = 0.9
+    MAX_DOWN = 0.7
+    MAX_UP = 1.15
+
+    def __init__(
+        self,
+        target_fps: float,
+        min_scale: float,
+        max_scale: float = 1.0,
+        start: "float | None" = None,
+        step: float = 0.05,
+        smoothing: float = 0.2,
+    ):
+        self.budget = 1.0 / target_fps
+        self.min_scale = min_scale
+        self.max_scale = max_scale
+        self.step = step
+        self.smoothing = smoothing
+        self.scale = self._clamp(max_scale if start is None else start)
+        self.seconds = None
+        self._lock = threading.Lock()
+
+    def _clamp(self, scale: float) -> float:
+        return min(self.max_scale, max(self.min_scale, scale))
+
+    def record(self, seconds: float) -> float:
+        """Records the time one frame took at the current scale and returns
+        the scale for the next frame."""
+        with self._lock:
+            if self.seconds is None:
+                self.seconds = seconds
+            else:
+                self.seconds += self.smoothing * (seconds - self.seconds)
+            old = self.scale
+            if self.adjust(self.seconds / self.budget):
+                # The average was measured at the old size
+                self.seconds *= (self.scale / old) ** 2
+            return self.scale
+
+    def adjust(self, ratio: float) -> bool:
+        """Moves the scale for frames taking ``ratio`` times the budget.
+        Returns whether it changed."""
+        if self.FAST <= ratio <= self.SLOW:
+            return False
+        change = min(self.MAX_UP, max(self.MAX_DOWN, math.sqrt(1.0 / ratio)))
+        steps = round(self.scale * change / self.step)
+        if round(steps * self.step, 6) == self.scale:
+            # Out of the band but less than half a step away: move one
+            steps += 1 if ratio < 1 else -1
+        scale = self._clamp(round(steps * self.step, 6))
+        if scale == self.scale:
+            return False
+        logger.debug(
+            f"Processing scale {self.scale:.2f} -> {scale:.2f} "
+            f"({ratio * self.budget * 1000:.1f}ms per frame)"
+        )
+        self.scale = scale
+        return True
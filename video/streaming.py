@@ -0,0 +1,274 @@
+"""MJPEG stream of the processed video, for the browser to display directly.
+
+Sending every frame through st.image costs an image encode and a websocket
+message on the Streamlit script thread. Instead the script publishes frames
+to a FrameStreamer: a background thread JPEG-encodes the newest one and a
+small HTTP server sends it to every connected browser as a
+multipart/x-mixed-replace stream, which an <img> tag plays as video.
+
+Nothing queues up when something is slow. A frame published before the
+previous one was encoded replaces it, and a client that is still receiving
+one JPEG gets the newest one next, skipping those in between.
+"""
+
+import atexit
+import collections
+import logging
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import cv2
+import numpy as np
+from config import Config
+
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+BOUNDARY = "frame"
+
+
+class FrameStreamer:
+    """Serves the newest published BGR frame at ``/stream`` (MJPEG) and
+    ``/frame.jpg`` (a single JPEG) on ``host``:``port``.
+
+    publish() only copies the frame; encoding at JPEG ``quality`` happens on
+    the encoder thread. ``url`` is the address the browser loads the stream
+    from, by default built from the host and port. Port 0 picks a free
+    port. Use as a context manager, or call start() and close()."""
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 8765,
+        quality: int = 80,
+        url: str = "",
+        stats_window: int = 60,
+    ):
+        self.host = host
+        self.port = port
+        self.quality = quality
+        self._url = url
+        self.published = 0
+        self.skipped = 0
+        self.encoded = 0
+        self.sent = 0
+        self.client_skipped = 0
+        self.clients = 0
+        self._encode_seconds = collections.deque(maxlen=stats_window)
+        # publish() writes the pending frame, the encoder swaps it with the
+        # one it encodes, so neither waits for the other's copy or encode
+        self._pending = None
+        self._encoding = None
+        self._ready = False
+        self._jpeg = None
+        self._jpeg_seq = 0
+        self._changed = threading.Condition()
+        self._closed = False
+        self._server = None
+        self._threads = []
+
+    def __enter__(self) -> "FrameStreamer":
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    @property
+    def url(self) -> str:
+        if self._url:
+            return self._url
+        host = "localhost" if self.host in ("", "0.0.0.0") else self.host
+        return f"http://{host}:{self.port}/stream"
+
+    def html(self) -> str:
+        """An <img> tag playing the stream, for st.markdown."""
+        return f'<img src="{self.url}" style="width: 100%;" alt="Video stream">'
+
+    def start(self) -> None:
+        handler = type("StreamHandler", (_StreamHandler,), {"streamer": self})
+        self._server = ThreadingHTTPServer((self.host, self.port), handler)
+        self.port = self._server.server_address[1]
+        self._threads = [
+            threading.Thread(
+                target=self._server.serve_forever, name="mjpeg-server", daemon=True
+            ),
+            threading.Thread(
+                target=self._encode_loop, name="mjpeg-encoder", daemon=True
+            ),
+        ]
+        for thread in self._threads:
+            thread.start()
+        logger.info(f"Streaming video at {self.url}")
+
+    def close(self) -> None:
+        with self._changed:
+            if self._closed:
+                return
+            self._closed = True
+            self._changed.notify_all()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+        for thread in self._threads:
+            thread.join(2.0)
+        logger.info(f"Video stream closed\n{self.format_stats()}")
+
+    def publish(self, frame: np.ndarray) -> None:
+        """Makes ``frame`` (BGR or grayscale) the next one to encode. It is
+        copied, so the caller can reuse it right away."""
+        with self._changed:
+            if self._ready:
+                self.skipped += 1
+            if self._pending is None or self._pending.shape != frame.shape:
+                self._pending = np.empty_like(frame)
+            np.copyto(self._pending, frame)
+            self._ready = True
+            self.published += 1
+            self._changed.notify_all()
+
+    def _encode_loop(self) -> None:
+        params = [cv2.IMWRITE_JPEG_QUALITY, self.quality]
+        while True:
+            with self._changed:
+                self._changed.wait_for(lambda: self._ready or self._closed)
+                if self._closed:
+                    break
+                self._pending, self._encoding = self._encoding, self._pending
+                self._ready = False
+            try:
+                start = time.perf_counter()
+                ok, jpeg = cv2.imencode(".jpg", self._encoding, params)
+                if not ok:
+                    raise ValueError("JPEG encoding failed")
+                self._encode_seconds.append(time.perf_counter() - start)
+            except Exception as e:
+                logger.error(f"Error encoding frame: {str(e)}")
+                continue
+            with self._changed:
+                self._jpeg = jpeg.tobytes()
+                self._jpeg_seq += 1
+                self.encoded += 1
+                self._changed.notify_all()
+
+    def next_jpeg(self, after: int, timeout: float = 1.0) -> tuple:
+        """The newest JPEG and its sequence number once there is one newer
+        than ``after``; (None, after) on timeout or when closed."""
+        with self._changed:
+            self._changed.wait_for(
+                lambda: self._jpeg_seq > after or self._closed, timeout
+            )
+            if self._closed or self._jpeg_seq <= after:
+                return None, after
+            return self._jpeg, self._jpeg_seq
+
+    def _serve_stream(self, handler: BaseHTTPRequestHandler) -> None:
+        handler.send_response(200)
+        handler.send_header(
+            "Content-Type", f"multipart/x-mixed-replace; boundary={BOUNDARY}"
+        )
+        handler.send_header("Cache-Control", "no-cache, no-store")
+        handler.send_header("Connection", "close")
+        handler.end_headers()
+        with self._changed:
+            self.clients += 1
+        seq = 0
+        try:
+            while not self._closed:
+                jpeg, latest = self.next_jpeg(seq)
+                if jpeg is None:
+                    continue
+                with self._changed:
+                    if seq:
+                        self.client_skipped += latest - seq - 1
+                    self.sent += 1
+                seq = latest
+                handler.wfile.write(
+                    f"--{BOUNDARY}\r\nContent-Type: image/jpeg\r\n"
+                    f"Content-Length: {len(jpeg)}\r\n\r\n".encode()
+                )
+                handler.wfile.write(jpeg)
+                handler.wfile.write(b"\r\n")
+                handler.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            logger.debug("Stream client disconnected")
+        finally:
+            with self._changed:
+                self.clients -= 1
+
+    def _serve_frame(self, handler: BaseHTTPRequestHandler) -> None:
+        with self._changed:
+            jpeg = self._jpeg
+        if jpeg is None:
+            handler.send_error(503, "No frame yet")
+            return
+        handler.send_response(200)
+        handler.send_header("Content-Type", "image/jpeg")
+        handler.send_header("Content-Length", str(len(jpeg)))
+        handler.send_header("Cache-Control", "no-cache, no-store")
+        handler.end_headers()
+        handler.wfile.write(jpeg)
+
+    def snapshot(self) -> dict:
+        seconds = list(self._encode_seconds)
+        return {
+            "published": self.published,
+            "skipped": self.skipped,
+            "encoded": self.encoded,
+            "encode_ms": 1000 * float(np.mean(seconds)) if seconds else 0.0,
+            "clients": self.clients,
+            "sent": self.sent,
+            "client_skipped": self.client_skipped,
+        }
+
+    def format_stats(self) -> str:
+        s = self.snapshot()
+        return (
+            f"mjpeg: {s['encoded']}/{s['published']} frames encoded, "
+            f"{s['encode_ms']:.1f} ms/frame, {s['clients']} clients, "
+            f"{s['client_skipped']} skipped by slow clients"
+        )
+
+
+class _StreamHandler(BaseHTTPRequestHandler):
+    streamer: FrameStreamer = None
+
+    def do_GET(self):
+        path = self.path.split("?", 1)[0]
+        if path == "/stream":
+            self.streamer._serve_stream(self)
+        elif path == "/frame.jpg":
+            self.streamer._serve_frame(self)
+        else:
+            self.send_error(404)
+
+    def log_message(self, format, *args):
+        logger.debug(f"{self.address_string()} {format % args}")
+
+
+_streamer = None
+_streamer_lock = threading.Lock()
+
+
+def get_frame_streamer() -> "FrameStreamer | None":
+    """The process-wide, started FrameStreamer when ``config.video_output``
+    is "mjpeg", or None when frames should go through st.image. Streamlit
+    reruns the script on every interaction; the stream keeps its port and
+    its connected browsers across reruns."""
+    global _streamer
+    with _streamer_lock:
+        if _streamer is None:
+            config = Config()
+            if config.video_output != "mjpeg":
+                return None
+            _streamer = FrameStreamer(
+                config.mjpeg_host,
+                config.mjpeg_port,
+                config.mjpeg_quality,
+                config.mjpeg_url,
+            )
+            _streamer.start()
+            atexit.register(_streamer.close)
+        return _streamer
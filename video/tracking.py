@@ -0,0 +1,165 @@
+import logging
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable
+import cv2
+import numpy as np
+
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+
+def to_gray(frame: np.ndarray) -> np.ndarray:
+    return frame if frame.ndim == 2 else cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+
+
+class OpticalFlowTracker:
+    """Carries detection boxes from frame to frame with sparse Lucas-Kanade
+    optical flow.
+
+    A few corner features are picked inside every box when it is detected.
+    On each new frame the features are tracked and the box moves by their
+    median displacement; box size is kept. A box whose features are all lost
+    stays where it was until the next detection."""
+
+    def __init__(self, max_corners: int = 20, min_distance: int = 5):
+        self.max_corners = max_corners
+        self.min_distance = min_distance
+        self.detections = []
+        self._gray = None
+        self._points = []
+
+    def _features(self, gray: np.ndarray, box) -> np.ndarray:
+        x, y, w, h = box
+        x0, y0 = max(x, 0), max(y, 0)
+        x1, y1 = x + w, y + h
+        roi = gray[y0:y1, x0:x1]
+        points = None
+        if roi.shape[0] > 2 and roi.shape[1] > 2:
+            points = cv2.goodFeaturesToTrack(
+                roi, self.max_corners, 0.01, self.min_distance
+            )
+        if points is None:
+            # Nothing to latch onto, follow the box center instead
+            return np.array([[[x + w / 2, y + h / 2]]], dtype=np.float32)
+        return points.astype(np.float32) + np.array([x0, y0], dtype=np.float32)
+
+    def reset(self, frame: np.ndarray, detections: list) -> None:
+        """Starts tracking ``detections``, which were found in ``frame``."""
+        self._gray = to_gray(frame)
+        self.detections = list(detections)
+        self._points = [self._features(self._gray, box) for _, _, box in detections]
+
+    def update(self, frame: np.ndarray) -> list:
+        """Moves the boxes to where they are in ``frame`` and returns them."""
+        gray = to_gray(frame)
+        if not self.detections or self._gray is None:
+            self._gray = gray
+            return self.detections
+
+        previous = np.concatenate(self._points)
+        current, status, _ = cv2.calcOpticalFlowPyrLK(
+            self._gray,
+            gray,
+            previous,
+            None,
+            winSize=(21, 21),
+            maxLevel=3,
+        )
+        status = status.ravel().astype(bool)
+
+        detections = []
+        points = []
+        start = 0
+        for (label, confidence, (x, y, w, h)), old in zip(
+            self.detections, self._points
+        ):
+            end = start + len(old)
+            found = status[start:end]
+            if found.any():
+                new = current[start:end][found]
+                dx, dy = np.median(new - old[found], axis=0).ravel()
+                x, y = int(round(x + dx)), int(round(y + dy))
+                old = new.reshape(-1, 1, 2)
+            detections.append((label, confidence, (x, y, w, h)))
+            points.append(old)
+            start = end
+
+        self._gray = gray
+        self.detections = detections
+        self._points = points
+        return detections
+
+
+class AsyncObjectDetector:
+    """Object detection that does not hold up the video.
+
+    ``detect(frame)`` runs on a background thread, on every ``interval``-th
+    frame or, with ``interval`` 0, as soon as the previous detection has
+    finished. Frames in between get the last detections carried forward by
+    an OpticalFlowTracker, so the frame rate follows the capture rate rather
+    than the detector latency. Calling the object returns
+    ``(frame, detections)`` with the boxes drawn, like
+    apply_object_detection_theme."""
+
+    def __init__(
+        self,
+        detect: "Callable | None" = None,
+        draw: "Callable | None" = None,
+        interval: int = 0,
+        tracker: "OpticalFlowTracker | None" = None,
+        trigger: bool = False,
+    ):
+        if detect is None or draw is None:
+            from video.videoEffects import detect_objects, draw_detections
+
+            detect = detect or detect_objects
+            draw = draw or draw_detections
+        self.detect = detect
+        self.draw = draw
+        self.interval = interval
+        self.tracker = tracker or OpticalFlowTracker()
+        self.trigger = trigger
+        self.detections_run = 0
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="detect")
+        self._pending: "tuple[Future, np.ndarray, float] | None" = None
+        self._frames_since_submit = None
+
+    def _due(self) -> bool:
+        if self._pending is not None:
+            return False
+        if self._frames_since_submit is None or self.interval <= 0:
+            return True
+        return self._frames_since_submit >= self.interval
+
+    def __call__(self, frame: np.ndarray) -> tuple:
+        if self._pending is not None and self._pending[0].done():
+            future, detected_frame, submitted = self._pending
+            self._pending = None
+            # Boxes found in an older frame, brought up to date below
+            self.tracker.reset(detected_frame, future.result())
+            self.detections_run += 1
+            logger.debug(
+                f"Detection finished in {time.perf_counter() - submitted:.3f}s"
+            )
+            if self.trigger:
+                logger.debug(f"Detected objects: {self.tracker.detections}")
+
+        if self._due():
+            # The detector gets its own copy, boxes are drawn on the frame
+            snapshot = frame.copy()
+            self._pending = (
+                self._executor.submit(self.detect, snapshot),
+                snapshot,
+                time.perf_counter(),
+            )
+            self._frames_since_submit = 0
+        self._frames_since_submit += 1
+
+        detections = self.tracker.update(frame)
+        return self.draw(frame, detections), detections
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -1,126 +1,212 @@
 import cv2
+import logging
 import re
 import numpy as np
-import logging
 import requests
 import base64
+from video.batching import get_inference_batcher
+from video.detectors import get_detector
+from video.effects import (
+    EffectResult,
+    get_effect,
+    register_effect,
+    resize_by,
+    scale_detections,
+)
+
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+
+def warmup() -> None:
+    """Loads the detector now rather than on the first object detection frame."""
+    get_detector()
+
+
+# Each output channel is the BGR luma sum, so the gray frame comes out with
+# three equal channels in one pass, ready for BGR or RGB display
+GRAY_WEIGHTS = np.tile(np.array([[0.114, 0.587, 0.299]], dtype=np.float32), (3, 1))
+# JET with red and blue swapped, for heat maps rendered straight to RGB
+JET_RGB = cv2.applyColorMap(
+    np.arange(256, dtype=np.uint8).reshape(256, 1), cv2.COLORMAP_JET
+)[..., ::-1].copy()
+
+
+def apply_effect(
+    frame,
+    effect_name,
+    trigger=False,
+    dst=None,
+    rgb=False,
+    scale=None,
+    quality=0,
+    pool=None,
+) -> EffectResult:
+    """Applies the registered effect called ``effect_name`` to the frame.
+    The name comes from the interpretation of a prompt sent to OpenAI, so
+    unknown names fall back to the normal effect. The result is written
+    into ``dst`` when the effect can, in RGB order with ``rgb``. ``scale``
+    overrides the effect's processing scale and ``quality`` picks one of its
+    cheaper quality levels; the downscaled frames come from ``pool``. With ``trigger`` the detections are logged, at
+    debug level since this runs for every frame."""
+    effect = get_effect(effect_name)
+    result = effect(frame, dst=dst, rgb=rgb, scale=scale, quality=quality, pool=pool)
+    if trigger and result.detections:
+        # Here you can save the detections to a file or database
+        logger.debug(f"Detected objects: {result.detections}")
+    return result
+
+
+@register_effect(
+    "normal",
+    "This frame restores the video to its original state. removing any "
+    "applied effects or filters. It is ideal for users who wish to reset "
+    "their video to a standard. unaltered appearance. ensuring a clean and "
+    "natural look.",
+)
+def apply_default_effect(frame, dst=None, rgb=False):
+    """Applies no effect, returning the original frame. OCR leaves the
+    frame as it is too; the text is read from it separately."""
+    if rgb and frame.ndim == 3:
+        return cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=dst)
+    return frame
 
 
-net = cv2.dnn.readNet("video/yolov3.weights", "video/yolov3.cfg")
-layer_names = net.getLayerNames()
-output_layers = [layer_names[i - 1] for i in net.getUnconnectedOutLayers()]
-
-with open("video/coco.names", "r") as f:
-    classes = [line.strip() for line in f.readlines()]
-
-
-def apply_effect(frame, effect_name, trigger=False):
-    """Applies an effect to the frame based on the effect name.
-    This is a response that comes from the interpretation of a
-    prompt sent to OpenAI. We will need to verify that the
-    effect name is valid before applying the effect name returned
-    is deterministic"""
-    logger = logging.getLogger(__name__)
-
-    if effect_name == "water_color":
-        logger.debug("Applying water color effect")
-        return apply_water_color_effect(frame)
-    elif effect_name == "heat_map":
-        logger.debug("Applying heat map effect")
-        return apply_heat_map_effect(frame)
-    elif effect_name == "grayscale":
-        logger.debug("Applying grayscale effect")
-        return apply_grayscale_effect(frame)
-    elif effect_name == "object_detection":
-        return apply_object_detection_theme(frame, trigger)
-    elif effect_name == "ocr":
-        return apply_default_effect(frame)
+@register_effect(
+    "grayscale",
+    "This frame transforms the video into shades of gray. reminiscent of "
+    "classic black-and-white films. It is perfect for users aiming to evoke "
+    "a vintage or noir aesthetic. or to simulate low-light conditions akin "
+    "to old horror movies.",
+)
+def apply_grayscale_effect(frame, dst=None, rgb=False):
+    """Converts the frame to grayscale (black and white image)."""
+    return cv2.transform(frame, GRAY_WEIGHTS, dst=dst)
+
+
+@register_effect(
+    "water_color",
+    "This frame applies a watercolor effect to the video. creating a soft "
+    "and hand drawn appearance making it look like a hand-painted "
+    "masterpiece with gentle brush strokes.",
+    cost="expensive",
+    # Brush strokes survive the downscale, and stylization cost grows with
+    # the pixel count
+    scale_mode="image",
+    scale=0.5,
+    min_scale=0.25,
+    # stylization takes as long whatever its sigmas, only a cheaper filter
+    # makes it faster
+    quality_levels=({"detail": "draft"},),
+)
+def apply_water_color_effect(frame, dst=None, rgb=False, detail="full"):
+    """Creates a hand-drawn watercolor effect on the frame. The "draft"
+    detail approximates it with the faster recursive edge-preserving filter."""
+    if detail == "draft":
+        out = draft_stylization(frame, dst)
     else:
-        logger.debug("Applying default effect")
-        return apply_default_effect(frame)
-
+        out = cv2.stylization(frame, dst, sigma_s=60, sigma_r=0.07)
+    if rgb:
+        out = cv2.cvtColor(out, cv2.COLOR_BGR2RGB, dst=out)
+    return out
 
-def apply_water_color_effect(frame):
-    """Creates a hand-drawn watercolor effect on the frame."""
-    return cv2.stylization(frame, sigma_s=60, sigma_r=0.07)
 
-
-def apply_heat_map_effect(frame):
+def draft_stylization(frame, dst=None):
+    """Smooths the frame like cv2.stylization, with the recursive instead of
+    the normalized convolution filter, and darkens its edges."""
+    smooth = cv2.edgePreservingFilter(
+        frame, flags=cv2.RECURS_FILTER, sigma_s=60, sigma_r=0.07
+    )
+    gray = cv2.cvtColor(smooth, cv2.COLOR_BGR2GRAY)
+    edges = cv2.magnitude(
+        cv2.Sobel(gray, cv2.CV_32F, 1, 0), cv2.Sobel(gray, cv2.CV_32F, 0, 1)
+    )
+    shade = 1.0 - cv2.normalize(edges, None, 0.0, 1.0, cv2.NORM_MINMAX)
+    if dst is not None and dst.shape != frame.shape:
+        dst = None
+    return cv2.multiply(smooth, cv2.merge([shade] * 3), dst=dst, dtype=cv2.CV_8U)
+
+
+@register_effect(
+    "heat_map",
+    "This frame visualizes light intensity as a spectrum of colors similar "
+    "to a thermal imaging camera. It is perfect for users who want to "
+    "represent temperature variations visually conveying sensations of heat "
+    "and cold through color gradients.",
+)
+def apply_heat_map_effect(frame, dst=None, rgb=False):
     """applies a color mapping effect to the frame that makes it seems as if we are
     measuring temperature."""
-    return cv2.applyColorMap(frame, cv2.COLORMAP_JET)
+    if rgb:
+        return cv2.applyColorMap(frame, JET_RGB, dst=dst)
+    return cv2.applyColorMap(frame, cv2.COLORMAP_JET, dst=dst)
 
 
-def apply_grayscale_effect(frame):
-    """Converts the frame to grayscale (black and white image)."""
-    return cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+def detect_objects(frame):
+    """Runs the configured detector on the frame and returns the detections
+    after non-max suppression as (label, confidence, (x, y, w, h)) tuples.
+    With ``config.detection_batch_size`` above 1, frames from concurrent
+    callers are batched into one forward pass."""
+    batcher = get_inference_batcher()
+    if batcher is not None:
+        return batcher.detect(frame)
+    return get_detector().detect(frame)
 
 
-def apply_default_effect(frame):
-    """Applies no effect, returning the original frame."""
+def draw_detections(frame, detected_objects):
+    """Draws the boxes and labels of detections onto the frame in place."""
+    font = cv2.FONT_HERSHEY_PLAIN
+    color = (0, 255, 0)
+    for label, confidence, (x, y, w, h) in detected_objects:
+        cv2.rectangle(frame, (x, y), (x + w, y + h), color, 2)
+        cv2.putText(
+            frame, f"{label} {round(confidence, 2)}", (x, y - 10), font, 1, color, 2
+        )
     return frame
 
 
-def apply_object_detection_theme(frame, button_trigger=False):
-    height, width, channels = frame.shape
-
-    # Detect objects
-    blob = cv2.dnn.blobFromImage(
-        frame, 0.00392, (416, 416), (0, 0, 0), True, crop=False
-    )
-    net.setInput(blob)
-    outs = net.forward(output_layers)
-
-    # Information to store detected objects
-    class_ids = []
-    confidences = []
-    boxes = []
-
-    # Process detected objects
-    for out in outs:
-        for detection in out:
-            scores = detection[5:]
-            class_id = np.argmax(scores)
-            confidence = scores[class_id]
-            if confidence > 0.5:
-                # Object detected
-                center_x = int(detection[0] * width)
-                center_y = int(detection[1] * height)
-                w = int(detection[2] * width)
-                h = int(detection[3] * height)
-
-                # Rectangle coordinates
-                x = int(center_x - w / 2)
-                y = int(center_y - h / 2)
-
-                boxes.append([x, y, w, h])
-                confidences.append(float(confidence))
-                class_ids.append(class_id)
-
-    # Apply non-max suppression to eliminate redundant overlapping boxes with lower confidences
-    indexes = cv2.dnn.NMSBoxes(boxes, confidences, 0.5, 0.4)
-
-    detected_objects = []
-    font = cv2.FONT_HERSHEY_PLAIN
-
-    for i in range(len(boxes)):
-        if i in indexes:
-            x, y, w, h = boxes[i]
-            label = str(classes[class_ids[i]])
-            confidence = confidences[i]
-            color = (0, 255, 0)
-            cv2.rectangle(frame, (x, y), (x + w, y + h), color, 2)
-            cv2.putText(
-                frame, f"{label} {round(confidence, 2)}", (x, y - 10), font, 1, color, 2
+@register_effect(
+    "object_detection",
+    "This frame highlights and identifies objects within the video feed "
+    "using bounding boxes and labels. It is ideal for users interested in "
+    "analyzing their environment generating ideas based on detected objects "
+    "or enhancing video content with real-time object recognition. Keep in "
+    "mind that only the items detected in the video can be used for object "
+    "detection.",
+    cost="expensive",
+    # The network sees a fixed input size anyway, shrinking the frame first
+    # only makes the blob cheaper; boxes are drawn on the full frame
+    scale_mode="boxes",
+    min_scale=0.5,
+)
+def apply_object_detection_theme(frame, dst=None, rgb=False, scale=1.0, pool=None):
+    if scale < 1.0:
+        small = resize_by(frame, scale, pool)
+        try:
+            detected_objects = scale_detections(
+                detect_objects(small), frame.shape[1] / small.shape[1]
             )
-            detected_objects.append((label, confidence, (x, y, w, h)))
+        finally:
+            if pool is not None:
+                pool.release(small)
+    else:
+        detected_objects = detect_objects(frame)
+    # Boxes are drawn on the frame itself, only RGB needs a second array
+    draw_detections(frame, detected_objects)
+    if rgb:
+        frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=dst)
+    return frame, detected_objects
 
-    # If the button is triggered, save the detected objects
-    if button_trigger:
-        # Here you can save detected_objects to a file or database
-        print("Detected objects:", detected_objects)
 
-    return frame, detected_objects
+register_effect(
+    "ocr",
+    "This frame applies OCR to the video feed. This is useful for user who "
+    "want to extract text from the video feed. This feature is implemented "
+    "so that we can extract parking ticket information for ticket "
+    "validation.",
+)(apply_default_effect)
 
 
 def get_ocr_text(frame, api_key):